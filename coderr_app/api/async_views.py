@@ -0,0 +1,73 @@
+"""
+Async-native GET path for the hottest read endpoints (ASYNC_READ_VIEWS).
+
+AsyncReadView serves GET for a DRF view by awaiting one of its coroutine
+methods (`read_method`, e.g. alist/aretrieve). Authentication, counts,
+rows and cache lookups go through the async ORM and cache APIs; filters,
+ordering, search, permissions and rendering reuse the DRF view, since they
+only compose SQL or work on data in memory, so responses are the same as
+the sync view's. Every other method runs the DRF view in a thread.
+Under ASGI a request waiting for the database or a slow client then holds
+no worker thread; DB calls themselves still run in Django's async ORM
+executor.
+"""
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.utils.decorators import classonlymethod
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework.request import ForcedAuthentication
+from user_auth_app.api.authentication import CachedTokenAuthentication
+
+
+class AsyncReadView(View):
+    """Async GET through `sync_view_class.<read_method>`, other methods through the DRF view."""
+    sync_view_class = None
+    read_method = None
+    sync_view = None
+
+    @classonlymethod
+    def as_view(cls, **initkwargs):
+        view_class = initkwargs.get('sync_view_class', cls.sync_view_class)
+        initkwargs.setdefault('sync_view', sync_to_async(view_class.as_view()))
+        view = csrf_exempt(super().as_view(**initkwargs))
+        view.replica_reads = getattr(view_class, 'replica_reads', False)
+        return view
+
+    def drf_view(self, request, *args, **kwargs):
+        """The DRF view instance as its dispatch() would set it up."""
+        view = self.sync_view_class()
+        view.setup(request, *args, **kwargs)
+        view.request = view.initialize_request(request, *args, **kwargs)
+        view.headers = view.default_response_headers
+        return view
+
+    async def authenticate(self, view):
+        """Resolve the token with the async ORM, so DRF finds the user without a query."""
+        user_auth = await CachedTokenAuthentication().aauthenticate(view.request._request)
+        if user_auth is not None:
+            view.request.authenticators = (ForcedAuthentication(*user_auth),)
+
+    async def get(self, request, *args, **kwargs):
+        view = self.drf_view(request, *args, **kwargs)
+        try:
+            await self.authenticate(view)
+            view.initial(view.request, *args, **kwargs)
+            response = await getattr(view, self.read_method)(view.request, *args, **kwargs)
+        except Exception as exc:
+            response = view.handle_exception(exc)
+        response = view.finalize_response(view.request, response, *args, **kwargs)
+        # 304 responses are plain HttpResponses and need no rendering.
+        return response.render() if hasattr(response, 'render') else response
+
+    async def delegate(self, request, *args, **kwargs):
+        return await self.sync_view(request, *args, **kwargs)
+
+    post = put = patch = delete = options = delegate
+
+
+def read_view(view_class, read_method):
+    """URL view of a DRF view: the async read path when ASYNC_READ_VIEWS is set, else the DRF view."""
+    if getattr(settings, 'ASYNC_READ_VIEWS', False):
+        return AsyncReadView.as_view(sync_view_class=view_class, read_method=read_method)
+    return view_class.as_view()
@@ -0,0 +1,47 @@
+from django.conf import settings
+from core.renderers import FastJSONRenderer
+
+
+EXPORT_OUTPUTS = {
+    'ndjson': 'application/x-ndjson',
+    'json': 'application/json',
+}
+
+
+_renderer = FastJSONRenderer()
+
+
+def dump(data):
+    """JSON bytes exactly as the API renders them."""
+    return _renderer.render(data)
+
+
+def stream_rows(queryset, serializer, output, chunk_size=None):
+    """
+    Yield the export of a values() queryset, serialized row by row with a
+    ValuesSerializer, in chunks of rows. The queryset is read with
+    iterator(), so neither the database rows nor the output are held in
+    memory beyond one chunk.
+    """
+    chunk_size = chunk_size or getattr(settings, 'EXPORT_CHUNK_SIZE', 2000)
+    separator = b'\n' if output == 'ndjson' else b','
+    lines = []
+    first_chunk = True
+    if output == 'json':
+        yield b'['
+    for row in queryset.iterator(chunk_size=chunk_size):
+        lines.append(dump(serializer.to_representation(row)))
+        if len(lines) >= chunk_size:
+            yield chunk_text(lines, separator, output, first_chunk)
+            lines, first_chunk = [], False
+    if lines:
+        yield chunk_text(lines, separator, output, first_chunk)
+    if output == 'json':
+        yield b']'
+
+
+def chunk_text(lines, separator, output, first_chunk):
+    text = separator.join(lines)
+    if output == 'ndjson':
+        return text + b'\n'
+    return text if first_chunk else b',' + text
@@ -0,0 +1,205 @@
+"""
+Read-only serializers for the hot list endpoints.
+
+They build the API representation straight from values() rows with a field
+plan compiled once per serializer instead of instantiating models and
+running ModelSerializer field by field. The output is identical to
+OfferSerializer, OrderSerializer and ReviewSerializer on GET list requests.
+"""
+from asgiref.sync import sync_to_async
+from rest_framework import serializers
+from rest_framework.response import Response
+from coderr_app.models import OfferDetail
+from core.performance import timed
+from upload_app.images import LIST_VARIANT, variant_url
+
+
+_datetime = serializers.DateTimeField()
+_price = serializers.DecimalField(max_digits=10, decimal_places=2)
+
+
+class ValuesSerializer:
+    """
+    Serializes values() rows with a field plan: (output key, column, converter)
+    in output order. A converter of None copies the value, a string names a
+    method of the serializer. A column of None passes the whole row to the
+    converter. None values are never converted, like in DRF serializers.
+    """
+    fields = ()
+    extra_columns = ()
+
+    def __init__(self, context=None):
+        self.context = context or {}
+        self.plan = [
+            (key, column, getattr(self, converter) if isinstance(converter, str) else converter)
+            for key, column, converter in self.fields
+        ]
+
+    @classmethod
+    def columns(cls):
+        return tuple(dict.fromkeys(
+            column for _, column, _ in cls.fields if column is not None
+        )) + cls.extra_columns
+
+    def prepare(self, rows):
+        """Load data shared by all rows (e.g. related ids) before serialization."""
+
+    def to_representation(self, row):
+        data = {}
+        for key, column, convert in self.plan:
+            if column is None:
+                data[key] = convert(row)
+                continue
+            value = row[column]
+            data[key] = value if convert is None or value is None else convert(value)
+        return data
+
+    def serialize(self, rows):
+        rows = list(rows)
+        self.prepare(rows)
+        return self.represent(rows)
+
+    async def aserialize(self, rows):
+        """serialize() for async views: rows are fetched and prepared with the async ORM."""
+        if not isinstance(rows, list):
+            rows = [row async for row in rows]
+        await self.aprepare(rows)
+        return self.represent(rows)
+
+    async def aprepare(self, rows):
+        """Async prepare(); subclasses that prepare with queries override it."""
+        if type(self).prepare is not ValuesSerializer.prepare:
+            await sync_to_async(self.prepare)(rows)
+
+    @timed('serialize_time')
+    def represent(self, rows):
+        return [self.to_representation(row) for row in rows]
+
+
+class OfferValuesSerializer(ValuesSerializer):
+    """OfferSerializer output of GET /api/offers/."""
+    fields = (
+        ('id', 'id', None),
+        ('user', 'user_id', None),
+        ('title', 'title', None),
+        ('image', 'image', 'image_url'),
+        ('description', 'description', None),
+        ('created_at', 'created_at', _datetime.to_representation),
+        ('updated_at', 'updated_at', _datetime.to_representation),
+        ('details', None, 'detail_links'),
+        ('min_price', 'min_price', _price.to_representation),
+        ('min_delivery_time', 'min_delivery_time', None),
+        ('user_details', None, 'user_details'),
+    )
+    extra_columns = ('user__first_name', 'user__last_name', 'user__username')
+
+    def prepare(self, rows):
+        self.detail_ids = {}
+        offer_ids = [row['id'] for row in rows]
+        if not offer_ids:
+            return
+        for offer_id, detail_id in self.detail_id_rows(offer_ids):
+            self.detail_ids.setdefault(offer_id, []).append(detail_id)
+
+    async def aprepare(self, rows):
+        self.detail_ids = {}
+        offer_ids = [row['id'] for row in rows]
+        if not offer_ids:
+            return
+        async for offer_id, detail_id in self.detail_id_rows(offer_ids):
+            self.detail_ids.setdefault(offer_id, []).append(detail_id)
+
+    def detail_id_rows(self, offer_ids):
+        return OfferDetail.objects.filter(offer__in=offer_ids).values_list('offer_id', 'id')
+
+    def image_url(self, name):
+        return variant_url(name, LIST_VARIANT, self.context.get('request'))
+
+    def detail_links(self, row):
+        return [
+            {"id": detail_id, "url": f"/offerdetails/{detail_id}/"}
+            for detail_id in self.detail_ids.get(row['id'], [])
+        ]
+
+    def user_details(self, row):
+        return {
+            "first_name": row['user__first_name'],
+            "last_name": row['user__last_name'],
+            "username": row['user__username'],
+        }
+
+
+class OrderValuesSerializer(ValuesSerializer):
+    """OrderSerializer output of GET /api/orders/."""
+    fields = (
+        ('id', 'id', None),
+        ('customer_user', 'customer_id', None),
+        ('business_user', 'offer_detail__offer__user_id', None),
+        ('title', 'offer_detail__title', None),
+        ('revisions', 'offer_detail__revisions', None),
+        ('delivery_time_in_days', 'offer_detail__delivery_time_in_days', None),
+        ('price', 'offer_detail__price', _price.to_representation),
+        ('features', 'offer_detail__features', None),
+        ('offer_type', 'offer_detail__offer_type', None),
+        ('status', 'status', None),
+        ('created_at', 'created_at', _datetime.to_representation),
+        ('updated_at', 'updated_at', _datetime.to_representation),
+    )
+
+
+class ReviewValuesSerializer(ValuesSerializer):
+    """ReviewSerializer output of GET /api/reviews/ (business_user is renamed and moved last)."""
+    fields = (
+        ('id', 'id', None),
+        ('reviewer', 'reviewer_id', None),
+        ('rating', 'rating', None),
+        ('description', 'description', None),
+        ('created_at', 'created_at', _datetime.to_representation),
+        ('updated_at', 'updated_at', _datetime.to_representation),
+        ('business_user', 'business_user_id', None),
+    )
+
+
+class ValuesListMixin:
+    """
+    List GET through a ValuesSerializer: filters and pagination run on a
+    values() queryset, so no model instances are built for the page.
+    A queryset the view filtered already (`list_queryset`, see
+    ConditionalGetMixin) is not filtered again.
+    alist() is the same for async views.
+    """
+    values_serializer_class = None
+    list_queryset = None
+
+    def list(self, request, *args, **kwargs):
+        serializer = self.values_serializer_class(context=self.get_serializer_context())
+        queryset = self.list_queryset
+        if queryset is None:
+            queryset = self.filter_queryset(self.get_queryset())
+        queryset = queryset.prefetch_related(None)
+        rows = queryset.values(*serializer.columns())
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(serializer.serialize(page))
+        return Response(serializer.serialize(rows))
+
+    async def afilter_queryset(self, queryset):
+        # Filter fields may validate their values with queries (ModelChoiceFilter).
+        return await sync_to_async(self.filter_queryset)(queryset)
+
+    async def apaginate_queryset(self, queryset):
+        if self.paginator is None:
+            return None
+        return await self.paginator.apaginate_queryset(queryset, self.request, view=self)
+
+    async def alist(self, request, *args, **kwargs):
+        serializer = self.values_serializer_class(context=self.get_serializer_context())
+        queryset = self.list_queryset
+        if queryset is None:
+            queryset = await self.afilter_queryset(self.get_queryset())
+        queryset = queryset.prefetch_related(None)
+        rows = queryset.values(*serializer.columns())
+        page = await self.apaginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(await serializer.aserialize(page))
+        return Response(await serializer.aserialize(rows))
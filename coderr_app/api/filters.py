@@ -1,5 +1,8 @@
 import django_filters
+from rest_framework.filters import SearchFilter
+from rest_framework.settings import api_settings
 from coderr_app.models import Offer
+from coderr_app.search import get_search_backend
 
 class OfferFilter(django_filters.FilterSet):
     """
@@ -13,4 +16,17 @@ class OfferFilter(django_filters.FilterSet):
     
     class Meta:
         model = Offer
-        fields = ['creator_id', 'min_price', 'max_delivery_time']
\ No newline at end of file
+        fields = ['creator_id', 'min_price', 'max_delivery_time']
+
+
+class OfferSearchFilter(SearchFilter):
+    """
+    Full-text search for offers on the database search backend.
+    Results are relevance-ranked unless an explicit ordering is requested.
+    """
+    def filter_queryset(self, request, queryset, view):
+        term = request.query_params.get(self.search_param, '')
+        if not term.strip():
+            return queryset
+        rank = not request.query_params.get(api_settings.ORDERING_PARAM)
+        return get_search_backend().search(queryset, term, rank=rank)
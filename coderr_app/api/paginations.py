@@ -1,10 +1,224 @@
-from rest_framework.pagination import PageNumberPagination
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from collections.abc import Mapping
+from functools import partial
+from django.core.paginator import InvalidPage, Paginator as DjangoPaginator
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import F, Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class CountedPaginator(DjangoPaginator):
+    """
+    Django paginator that uses an already known row count instead of COUNT(*).
+    """
+    def __init__(self, *args, count, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.count = count
+
 
 class PagePagination(PageNumberPagination):
     """
     Custom pagination class to handle the pagination of API responses.
+    Reuses the row count a view computed already (view.list_count).
+    apaginate_queryset() is paginate_queryset() for async views.
     """
     page_size = 10
     page_size_query_param = 'page_size'
     max_page_size = 100
-    page_query_param = 'page'
\ No newline at end of file
+    page_query_param = 'page'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        count = getattr(view, 'list_count', None)
+        if count is not None:
+            self.django_paginator_class = partial(CountedPaginator, count=count)
+        return super().paginate_queryset(queryset, request, view)
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        page_size = self.get_page_size(request)
+        if not page_size:
+            return None
+        count = getattr(view, 'list_count', None)
+        if count is None:
+            count = await queryset.acount()
+        paginator = CountedPaginator(queryset, page_size, count=count)
+        page_number = self.get_page_number(request, paginator)
+        try:
+            self.page = paginator.page(page_number)
+        except InvalidPage as exc:
+            raise NotFound(self.invalid_page_message.format(page_number=page_number, message=str(exc)))
+        self.page.object_list = [row async for row in self.page.object_list]
+        if paginator.num_pages > 1 and self.template is not None:
+            self.display_page_controls = True
+        self.request = request
+        return list(self.page)
+
+
+def positive_int(value, cutoff=None):
+    """Parse a positive integer, capped at `cutoff`; ValueError for anything else."""
+    number = int(value)
+    if number <= 0:
+        raise ValueError(value)
+    return min(number, cutoff) if cutoff else number
+
+
+class KeysetPagination(BasePagination):
+    """
+    Opt-in keyset pagination on (ordering field, id).
+    Active when the request carries the `cursor` parameter (empty for the
+    first page), otherwise `fallback_class` paginates the request, or the
+    list stays unpaginated if there is none. Pages continue after the last
+    row instead of using OFFSET, and no COUNT(*) is run.
+    The ordering field is the first plain model field of the queryset
+    ordering (as set by OrderingFilter), else `default_ordering`.
+    """
+    cursor_query_param = 'cursor'
+    page_size = 10
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    default_ordering = '-created_at'
+    fallback_class = None
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.fallback = None
+        if self.cursor_query_param not in request.query_params:
+            if self.fallback_class is None:
+                return None
+            self.fallback = self.fallback_class()
+            return self.fallback.paginate_queryset(queryset, request, view)
+        return self.build_page(list(self.get_page_queryset(queryset, request)))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        self.fallback = None
+        if self.cursor_query_param not in request.query_params:
+            if self.fallback_class is None:
+                return None
+            self.fallback = self.fallback_class()
+            return await self.fallback.apaginate_queryset(queryset, request, view)
+        return self.build_page([row async for row in self.get_page_queryset(queryset, request)])
+
+    def get_page_size(self, request):
+        try:
+            return positive_int(request.query_params[self.page_size_query_param], cutoff=self.max_page_size)
+        except (KeyError, ValueError):
+            return self.page_size
+
+    def get_ordering(self, queryset):
+        """Return (field name, descending) of the keyset ordering."""
+        ordering = list(queryset.query.order_by) or list(queryset.model._meta.ordering)
+        for name in ordering + [self.default_ordering]:
+            if not isinstance(name, str):
+                continue
+            field_name = name.lstrip('-')
+            try:
+                field = queryset.model._meta.get_field(field_name)
+            except FieldDoesNotExist:
+                continue
+            if field.concrete and not field.is_relation:
+                return field_name, name.startswith('-')
+        return 'id', True
+
+    def get_page_queryset(self, queryset, request):
+        """
+        Lazy queryset of the requested page plus one row to detect a next page.
+        Stores the state build_page needs, so it can be evaluated sync or async.
+        """
+        self.request = request
+        self.page_size_value = self.get_page_size(request)
+        self.field_name, self.descending = self.get_ordering(queryset)
+        self.field = queryset.model._meta.get_field(self.field_name)
+        position = self.decode_cursor(request)
+        if position is not None:
+            queryset = queryset.filter(self.position_filter(*position))
+        order = F(self.field_name).desc(nulls_last=True) if self.descending else F(self.field_name).asc(nulls_last=True)
+        queryset = queryset.order_by(order, '-id' if self.descending else 'id')
+        return queryset[:self.page_size_value + 1]
+
+    def position_filter(self, value, last_id):
+        """Rows after (value, last_id) in the keyset order, NULLs last."""
+        after = 'lt' if self.descending else 'gt'
+        if value is None:
+            return Q(**{f'{self.field_name}__isnull': True, f'id__{after}': last_id})
+        condition = Q(**{f'{self.field_name}__{after}': value}) | Q(**{self.field_name: value, f'id__{after}': last_id})
+        if self.field.null:
+            condition |= Q(**{f'{self.field_name}__isnull': True})
+        return condition
+
+    def build_page(self, rows):
+        self.has_next = len(rows) > self.page_size_value
+        self.page = rows[:self.page_size_value]
+        return self.page
+
+    def get_position(self, item):
+        if isinstance(item, Mapping):
+            return item[self.field.attname], item['id']
+        return getattr(item, self.field.attname), item.id
+
+    def encode_cursor(self, item):
+        value, last_id = self.get_position(item)
+        if value is not None and not isinstance(value, (int, float)):
+            value = value.isoformat() if hasattr(value, 'isoformat') else str(value)
+        ordering = f"{'-' if self.descending else ''}{self.field_name}"
+        payload = json.dumps([ordering, value, last_id], separators=(',', ':'))
+        return urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param, '')
+        if not encoded:
+            return None
+        try:
+            padded = encoded + '=' * (-len(encoded) % 4)
+            ordering, value, last_id = json.loads(urlsafe_b64decode(padded.encode()))
+            if ordering != f"{'-' if self.descending else ''}{self.field_name}":
+                raise ValueError(ordering)
+            if value is not None:
+                value = self.field.to_python(value)
+            return value, int(last_id)
+        except (TypeError, ValueError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.page[-1]))
+
+    def get_first_link(self):
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, '')
+
+    def get_paginated_response(self, data):
+        if self.fallback is not None:
+            return self.fallback.get_paginated_response(data)
+        return Response({
+            'next': self.get_next_link(),
+            'first': self.get_first_link(),
+            'results': data,
+        })
+
+
+class OfferPagination(KeysetPagination):
+    """
+    Page numbers by default, keyset pages on (created_at, id) with ?cursor=.
+    """
+    default_ordering = '-created_at'
+    fallback_class = PagePagination
+
+
+class ReviewPagination(KeysetPagination):
+    """
+    Unpaginated by default, keyset pages on (updated_at, id) with ?cursor=.
+    """
+    default_ordering = '-updated_at'
+
+
+class ProfilePagination(KeysetPagination):
+    """
+    Page numbers by default, keyset pages on (created_at, id) with ?cursor=.
+    """
+    default_ordering = '-created_at'
+    fallback_class = PagePagination
@@ -1,10 +1,16 @@
 from django.contrib.auth.models import User
+from django.db import transaction
 from rest_framework import serializers
 from coderr_app.models import Offer, OfferDetail, Order, Review
+from coderr_app.response_cache import offer_list_cache
+from coderr_app.search import get_search_backend
+from coderr_app.stats import adjust_business_rating, adjust_stat
+from core.performance import TimedSerializerMixin, timed
 from user_auth_app.models import UserProfile
+from upload_app.images import DETAIL_VARIANT, LIST_VARIANT, variant_url
 
 
-class OfferDetailSerializer(serializers.ModelSerializer):
+class OfferDetailSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """
     Serializer for the OfferDetail model.
     Args:
@@ -16,6 +22,28 @@ class OfferDetailSerializer(serializers.ModelSerializer):
         read_only_fields = ['id']
         
 
+class OfferListSerializer(TimedSerializerMixin, serializers.ListSerializer):
+    """
+    Creates many offers with two bulk inserts (offers, then all their tiers).
+    """
+    def create(self, validated_data):
+        details_per_offer = [attrs.pop('details', []) for attrs in validated_data]
+        with transaction.atomic():
+            offers = Offer.objects.bulk_create([
+                Offer(**attrs, **OfferSerializer.min_values(details_data))
+                for attrs, details_data in zip(validated_data, details_per_offer)
+            ])
+            OfferDetail.objects.bulk_create([
+                OfferDetail(offer=offer, **detail_data)
+                for offer, details_data in zip(offers, details_per_offer)
+                for detail_data in details_data
+            ])
+            get_search_backend().index_offers(offer.id for offer in offers)
+            adjust_stat('offer_count', len(offers))
+            offer_list_cache.bump(offer.user_id for offer in offers)
+        return offers
+
+
 class OfferSerializer(serializers.ModelSerializer):
     """
     OfferSerializer is a serializer for the Offer model.
@@ -28,6 +56,7 @@ class OfferSerializer(serializers.ModelSerializer):
         model = Offer
         fields = ['id', 'user', 'title', 'image', 'description', 'created_at', 'updated_at', 'details', 'min_price', 'min_delivery_time', 'user_details']
         read_only_fields = ['user', 'created_at', 'updated_at', 'min_price', 'min_delivery_time']
+        list_serializer_class = OfferListSerializer
         
     def create_detail_urls(self, instance, request, absolute=True):
         """create URLs for Details"""
@@ -69,7 +98,10 @@ class OfferSerializer(serializers.ModelSerializer):
             data.pop('user_details', None)
         else:
             data['details'] = self.create_detail_urls(instance, request, absolute=False)
+        if 'image' in data:
+            data['image'] = variant_url(instance.image.name, DETAIL_VARIANT if is_detail_view else LIST_VARIANT, request)
 
+    @timed('serialize_time')
     def to_representation(self, instance):
         """Adjust the response based on the request method"""
         data = super().to_representation(instance)
@@ -105,71 +137,75 @@ class OfferSerializer(serializers.ModelSerializer):
         if self.instance is not None:
             return value
         if len(value) != 3:
-            raise serializers.ValidationError("must provide exactly 3 details.", status_code=403)
+            raise serializers.ValidationError("must provide exactly 3 details.")
         offer_types = [detail['offer_type'] for detail in value]
         required_types = ['basic', 'standard', 'premium']
         if set(offer_types) != set(required_types):
-            raise serializers.ValidationError("Details must include the types 'basic', 'standard', and 'premium'.", status_code=403)
+            raise serializers.ValidationError("Details must include the types 'basic', 'standard', and 'premium'.")
         return value
     
+    @staticmethod
+    def min_values(details):
+        """min_price and min_delivery_time of tier dicts or OfferDetail objects, computed in memory."""
+        if not details:
+            return {}
+
+        def value(detail, field):
+            return detail[field] if isinstance(detail, dict) else getattr(detail, field)
+        return {
+            'min_price': min(value(detail, 'price') for detail in details),
+            'min_delivery_time': min(value(detail, 'delivery_time_in_days') for detail in details),
+        }
+
     def create(self, validated_data):
-        """Create a new Offer instance with its details."""
+        """Create a new Offer instance with its details in one transaction."""
         details_data = validated_data.pop('details', [])
-        offer = Offer.objects.create(**validated_data)
-        for detail_data in details_data:
-            OfferDetail.objects.create(offer=offer, **detail_data)
-        details = offer.details.all()
-        if details:
-            offer.min_price = min(detail.price for detail in details)
-            offer.min_delivery_time = min(detail.delivery_time_in_days for detail in details)
-            offer.save()
+        with transaction.atomic():
+            offer = Offer.objects.create(**validated_data, **self.min_values(details_data))
+            OfferDetail.objects.bulk_create([OfferDetail(offer=offer, **detail_data) for detail_data in details_data])
+            get_search_backend().index_offers([offer.id])
         return offer
     
     def update_offer_fields(self, instance, validated_data):
         """Update the main fields of the offer"""
         for attr, value in validated_data.items():
             setattr(instance, attr, value)
-        instance.save()
-
-    def update_existing_detail(self, existing_detail, detail_data):
-        """Update an existing OfferDetail"""
-        for attr, value in detail_data.items():
-            setattr(existing_detail, attr, value)
-        existing_detail.save()
-
-    def create_new_detail(self, instance, detail_data):
-        """create a new OfferDetail"""
-        OfferDetail.objects.create(offer=instance, **detail_data)
-
-    def update_min_values(self, instance):
-        """Update min_price and min_delivery_time"""
-        details = instance.details.all()
-        if details:
-            instance.min_price = min(detail.price for detail in details)
-            instance.min_delivery_time = min(detail.delivery_time_in_days for detail in details)
-            instance.save()
 
     def update_offer_details(self, instance, details_data):
-        """Update all OfferDetails"""
+        """
+        Patch existing tiers with one bulk_update, create missing ones with one
+        bulk_create and return all tiers of the offer.
+        """
+        details = {detail.offer_type: detail for detail in instance.details.all()}
+        changed_fields, changed, created = set(), [], []
         for detail_data in details_data:
-            offer_type = detail_data.get('offer_type')
-            existing_detail = instance.details.filter(offer_type=offer_type).first()
-            if existing_detail:
-                self.update_existing_detail(existing_detail, detail_data)
-            else:
-                self.create_new_detail(instance, detail_data)
+            existing_detail = details.get(detail_data.get('offer_type'))
+            if existing_detail is None:
+                created.append(OfferDetail(offer=instance, **detail_data))
+                continue
+            for attr, value in detail_data.items():
+                setattr(existing_detail, attr, value)
+            changed_fields.update(detail_data)
+            changed.append(existing_detail)
+        if changed:
+            OfferDetail.objects.bulk_update(changed, sorted(changed_fields))
+        OfferDetail.objects.bulk_create(created)
+        getattr(instance, '_prefetched_objects_cache', {}).pop('details', None)
+        return list(details.values()) + created
 
     def update(self, instance, validated_data):
-        """Update an existing Offer instance."""
+        """Update an existing Offer instance and its details in one transaction."""
         details_data = validated_data.pop('details', None)
-        self.update_offer_fields(instance, validated_data)
-        if details_data is not None:
-            self.update_offer_details(instance, details_data)
-            self.update_min_values(instance)
+        with transaction.atomic():
+            self.update_offer_fields(instance, validated_data)
+            if details_data is not None:
+                details = self.update_offer_details(instance, details_data)
+                self.update_offer_fields(instance, self.min_values(details))
+            instance.save()
         return instance
-         
 
-class OrderSerializer(serializers.ModelSerializer):
+
+class OrderSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """
     Serializer for the Order model.
     Args:
@@ -180,8 +216,8 @@ class OrderSerializer(serializers.ModelSerializer):
         _type_: _description_
     """
     offer_detail_id = serializers.IntegerField(write_only=True)
-    customer_user = serializers.IntegerField(source='customer.id', read_only=True)
-    business_user = serializers.IntegerField(source='offer_detail.offer.user.id', read_only=True)
+    customer_user = serializers.IntegerField(source='customer_id', read_only=True)
+    business_user = serializers.IntegerField(source='offer_detail.offer.user_id', read_only=True)
     title = serializers.CharField(source='offer_detail.title', read_only=True)
     revisions = serializers.IntegerField(source='offer_detail.revisions', read_only=True)
     delivery_time_in_days = serializers.IntegerField(source='offer_detail.delivery_time_in_days', read_only=True)
@@ -218,18 +254,20 @@ class OrderSerializer(serializers.ModelSerializer):
         if 'offer_detail_id' not in validated_data:
             raise serializers.ValidationError("offer id is required.")
         offer_detail_id = validated_data['offer_detail_id']
-        offer_detail = OfferDetail.objects.get(id=offer_detail_id)
-        return Order.objects.create(
-            customer=self.context['request'].user,
-            offer_detail=offer_detail,
-            status=validated_data.get('status', 'in_progress')
-        )
+        offer_detail = OfferDetail.objects.select_related('offer').get(id=offer_detail_id)
+        with transaction.atomic():
+            return Order.objects.create(
+                customer=self.context['request'].user,
+                offer_detail=offer_detail,
+                status=validated_data.get('status', 'in_progress')
+            )
         
     def update(self, instance, validated_data):
         validated_data.pop('offer_detail_id', None)
         if 'status' in validated_data:
             instance.status = validated_data['status']
-            instance.save()
+            with transaction.atomic():
+                instance.save()
         return instance
     
         
@@ -245,8 +283,9 @@ class ReviewSerializer(serializers.ModelSerializer):
         _type_: _description_
     """
     business_user = serializers.IntegerField(write_only=True)
-    business_user_id = serializers.IntegerField(source='business_user.id', read_only=True)
-    reviewer = serializers.IntegerField(source='reviewer.id', read_only=True)
+    business_user_id = serializers.IntegerField(read_only=True)
+    reviewer = serializers.IntegerField(source='reviewer_id', read_only=True)
+    rating = serializers.IntegerField(min_value=1, max_value=5)
 
     class Meta:
         model = Review
@@ -283,13 +322,17 @@ class ReviewSerializer(serializers.ModelSerializer):
     def create(self, validated_data):
         business_user_id = validated_data.pop('business_user')
         business_user = User.objects.get(id=business_user_id)
-        return Review.objects.create(
-            business_user=business_user,
-            reviewer=self.context['request'].user,
-            rating=validated_data['rating'],
-            description=validated_data['description']
-        )
+        with transaction.atomic():
+            review = Review.objects.create(
+                business_user=business_user,
+                reviewer=self.context['request'].user,
+                rating=validated_data['rating'],
+                description=validated_data['description']
+            )
+            adjust_business_rating(business_user.id, added=review.rating, reviewed_at=review.created_at)
+        return review
     
+    @timed('serialize_time')
     def to_representation(self, instance):
         data = super().to_representation(instance)
         data.pop('business_user', None)
@@ -299,7 +342,10 @@ class ReviewSerializer(serializers.ModelSerializer):
     
     def update(self, instance, validated_data):
         validated_data.pop('business_user', None)
+        previous_rating = instance.rating
         for attr, value in validated_data.items():
             setattr(instance, attr, value)
-        instance.save()
+        with transaction.atomic():
+            instance.save()
+            adjust_business_rating(instance.business_user_id, added=instance.rating, removed=previous_rating)
         return instance
\ No newline at end of file
@@ -1,15 +1,21 @@
 from django.urls import path
-from .views import BaseInfoView, OfferListView, OfferDetailView, OfferDetailDetailView, OrderListView, OrderDetailView, OrderCountView, CompletedOrderCountView, ReviewDetailView, ReviewListView
+from .async_views import read_view
+from .views import BaseInfoView, OfferListView, OfferBatchView, OfferDetailView, OfferDetailDetailView, OrderListView, OrderExportView, OrderDetailView, OrderCountView, CompletedOrderCountView, OrderStatusCountView, BusinessStatsView, ReviewDetailView, ReviewExportView, ReviewListView
 
 urlpatterns = [
-    path('offers/', OfferListView.as_view(), name="offer-list"),
-    path('offers/<int:pk>/', OfferDetailView.as_view(), name="offer-detail"),
+    path('offers/', read_view(OfferListView, 'alist'), name="offer-list"),
+    path('offers/batch/', OfferBatchView.as_view(), name="offer-batch"),
+    path('offers/<int:pk>/', read_view(OfferDetailView, 'aretrieve'), name="offer-detail"),
     path('offerdetails/<int:pk>/', OfferDetailDetailView.as_view(), name="offer-detail-view"),
     path('orders/', OrderListView.as_view(), name="order-list"),
+    path('orders/export/', OrderExportView.as_view(), name="order-export"),
     path('orders/<int:pk>/', OrderDetailView.as_view(), name="order-detail"),
-    path('order-count/<int:business_user_id>/', OrderCountView.as_view(), name="order-count"),
-    path('completed-order-count/<int:business_user_id>/', CompletedOrderCountView.as_view(), name="completed-order-count"),
-    path('reviews/', ReviewListView.as_view(), name="review-list"),
+    path('order-count/<int:business_user_id>/', read_view(OrderCountView, 'aget'), name="order-count"),
+    path('completed-order-count/<int:business_user_id>/', read_view(CompletedOrderCountView, 'aget'), name="completed-order-count"),
+    path('order-counts/<int:business_user_id>/', read_view(OrderStatusCountView, 'aget'), name="order-status-count"),
+    path('business-stats/', BusinessStatsView.as_view(), name="business-stats"),
+    path('reviews/', read_view(ReviewListView, 'alist'), name="review-list"),
+    path('reviews/export/', ReviewExportView.as_view(), name="review-export"),
     path('reviews/<int:pk>/', ReviewDetailView.as_view(), name="review-detail"),
-    path('base-info/', BaseInfoView.as_view(), name="base-info"),
+    path('base-info/', read_view(BaseInfoView, 'aget'), name="base-info"),
 ]
\ No newline at end of file
@@ -1,18 +1,28 @@
 from django_filters.rest_framework import DjangoFilterBackend
-from django.db import models
-from django.shortcuts import get_object_or_404
+from django.shortcuts import aget_object_or_404, get_object_or_404
+from django.conf import settings
+from django.db import transaction
+from django.http import StreamingHttpResponse
 from django.contrib.auth.models import User
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status, generics
 from rest_framework.permissions import AllowAny, IsAuthenticated
-from rest_framework.filters import OrderingFilter, SearchFilter
+from rest_framework.filters import OrderingFilter
+from rest_framework.exceptions import ValidationError
+from core.conditional import ConditionalGetMixin, not_modified_response, set_validators
+from core.db_routing import read_from_primary
+from user_auth_app.api.authentication import get_user_profile
 from user_auth_app.api.permissions import IsBusinessUser, IsOfferOwner, IsCustomerUser, IsOrderBusinessOwner, IsStaffOrAdmin, IsReviewOwner
 from user_auth_app.models import UserProfile
-from ..models import Offer, OfferDetail, Order, Review
+from ..response_cache import offer_list_cache
+from ..models import BusinessOrderCount, Offer, OfferDetail, Order, Review
+from ..stats import adjust_business_rating, aget_stats, average_rating, get_stats
 from .serializers import OfferDetailSerializer, OrderSerializer, ReviewSerializer, OfferSerializer
-from .paginations import PagePagination
-from .filters import OfferFilter
+from .paginations import OfferPagination, PagePagination, ReviewPagination
+from .filters import OfferFilter, OfferSearchFilter
+from .exports import EXPORT_OUTPUTS, stream_rows
+from .fast_serializers import OfferValuesSerializer, OrderValuesSerializer, ReviewValuesSerializer, ValuesListMixin
 
 
 class BaseInfoView(APIView):
@@ -28,49 +38,116 @@ class BaseInfoView(APIView):
         _type_: _description_
     """
     permission_classes = [AllowAny] 
+    replica_reads = True
 
     def get(self, request):
-        review_count = Review.objects.count()
-        average_rating = Review.objects.aggregate(avg=models.Avg('rating'))['avg'] or 0
-        business_profile_count = UserProfile.objects.filter(type='business').count()
-        offer_count = Offer.objects.count()
+        return self.stats_response(get_stats())
+
+    async def aget(self, request):
+        return self.stats_response(await aget_stats())
+
+    def stats_response(self, stats):
         return Response({
-            "review_count": review_count,
-            "average_rating": round(average_rating, 1),
-            "business_profile_count": business_profile_count,
-            "offer_count": offer_count
+            "review_count": stats['review_count'],
+            "average_rating": average_rating(stats),
+            "business_profile_count": stats['business_profile_count'],
+            "offer_count": stats['offer_count']
         })
 
 
-class OfferListView(generics.ListCreateAPIView):
+class OfferListView(ConditionalGetMixin, ValuesListMixin, generics.ListCreateAPIView):
     """
-    GET: all offers visible to everyone
+    GET: all offers visible to everyone, served from the versioned offer list
+    cache (the response does not depend on the requesting user)
     POST: only authenticated Business users can create offers
     """
-    queryset = Offer.objects.all()
+    queryset = Offer.objects.select_related('user').prefetch_related('details')
     serializer_class = OfferSerializer
-    pagination_class = PagePagination
+    values_serializer_class = OfferValuesSerializer
+    pagination_class = OfferPagination
     filterset_class = OfferFilter
-    filter_backends = [DjangoFilterBackend, OrderingFilter, SearchFilter]
+    filter_backends = [DjangoFilterBackend, OrderingFilter, OfferSearchFilter]
     ordering_fields = ['updated_at', 'min_price']
     search_fields = ['title', 'description']
+    replica_reads = True
     
     def get_permissions(self):
         if self.request.method == 'GET':
             return [AllowAny()]
         return [IsAuthenticated(), IsBusinessUser()]
     
+    def list_version(self):
+        # The rows embed their creator's names and image URLs, whose changes bump the version.
+        return offer_list_cache.get_version()
+
+    async def alist_version(self):
+        return await offer_list_cache.aget_version()
+
+    def list(self, request, *args, **kwargs):
+        key = offer_list_cache.key(request)
+        if key is None:
+            return super().list(request, *args, **kwargs)
+        entry = offer_list_cache.get(key)
+        if entry is not None:
+            not_modified = not_modified_response(request, etag=entry['etag'])
+            if not_modified is not None:
+                return not_modified
+            return set_validators(Response(entry['data']), etag=entry['etag'])
+        read_from_primary()
+        response = super().list(request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK:
+            offer_list_cache.set(key, {'data': response.data, 'etag': response.get('ETag')})
+        return response
+
+    async def alist(self, request, *args, **kwargs):
+        key = await offer_list_cache.akey(request)
+        if key is None:
+            return await super().alist(request, *args, **kwargs)
+        entry = await offer_list_cache.aget(key)
+        if entry is not None:
+            not_modified = not_modified_response(request, etag=entry['etag'])
+            if not_modified is not None:
+                return not_modified
+            return set_validators(Response(entry['data']), etag=entry['etag'])
+        read_from_primary()
+        response = await super().alist(request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK:
+            await offer_list_cache.aset(key, {'data': response.data, 'etag': response.get('ETag')})
+        return response
+
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
     
     
-class OfferDetailView(generics.RetrieveUpdateDestroyAPIView):
+class OfferBatchView(generics.CreateAPIView):
+    """
+    POST: Business users import many offers in one request (list of offers),
+    written with bulk inserts in one transaction.
+    """
+    serializer_class = OfferSerializer
+    permission_classes = [IsAuthenticated, IsBusinessUser]
+
+    def create(self, request, *args, **kwargs):
+        max_size = getattr(settings, 'OFFER_BATCH_MAX_SIZE', 100)
+        if not isinstance(request.data, list):
+            return Response({'error': 'Expected a list of offers.'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(request.data) > max_size:
+            return Response({'error': f'A batch can contain at most {max_size} offers.'}, status=status.HTTP_400_BAD_REQUEST)
+        serializer = self.get_serializer(data=request.data, many=True)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        offers = serializer.save(user=request.user)
+        created = Offer.objects.filter(id__in=[offer.id for offer in offers]).prefetch_related('details').order_by('id')
+        return Response(self.get_serializer(created, many=True).data, status=status.HTTP_201_CREATED)
+    
+    
+class OfferDetailView(ConditionalGetMixin, generics.RetrieveUpdateDestroyAPIView):
     """
     GET: Everyone can see a single offer
     PATCH/PUT: Only the creator can change their offer
     DELETE: Only the creator can delete their offer
     """
-    queryset = Offer.objects.all()
+    queryset = Offer.objects.select_related('user').prefetch_related('details')
     serializer_class = OfferSerializer
     lookup_field = 'pk'
     
@@ -131,7 +208,21 @@ class OfferDetailDetailView(generics.RetrieveAPIView):
     lookup_field = 'pk'
     
     
-class OrderListView(generics.ListCreateAPIView):
+def order_queryset():
+    """
+    Orders joined with their offer detail and offer in a single query,
+    restricted to the columns OrderSerializer reads.
+    """
+    return Order.objects.select_related('offer_detail__offer').only(
+        'id', 'customer_id', 'status', 'created_at', 'updated_at',
+        'offer_detail__id', 'offer_detail__title', 'offer_detail__revisions',
+        'offer_detail__delivery_time_in_days', 'offer_detail__price',
+        'offer_detail__features', 'offer_detail__offer_type',
+        'offer_detail__offer__id', 'offer_detail__offer__user_id',
+    ).order_by('-created_at', '-id')
+
+
+class OrderListView(ValuesListMixin, generics.ListCreateAPIView):
     """
     List and create orders for authenticated users.
     Args:
@@ -140,18 +231,17 @@ class OrderListView(generics.ListCreateAPIView):
         _type_: _description_
     """
     serializer_class = OrderSerializer
+    values_serializer_class = OrderValuesSerializer
+    pagination_class = PagePagination
     
     def get_queryset(self):
         user = self.request.user
-        if user.is_authenticated:
-            try:
-                profile = UserProfile.objects.get(user=user)
-                if profile.type == 'customer':
-                    return Order.objects.filter(customer=user)
-                elif profile.type == 'business':
-                    return Order.objects.filter(offer_detail__offer__user=user)
-            except UserProfile.DoesNotExist:
-                return Order.objects.none()
+        profile = get_user_profile(self.request)
+        if profile is not None:
+            if profile.type == 'customer':
+                return order_queryset().filter(customer=user)
+            elif profile.type == 'business':
+                return order_queryset().filter(offer_detail__offer__user=user)
         return Order.objects.none()
     
     def get_permissions(self):
@@ -171,9 +261,11 @@ class OrderDetailView(generics.RetrieveUpdateDestroyAPIView):
     Returns:
         _type_: _description_
     """
-    queryset = Order.objects.all()
     serializer_class = OrderSerializer
     lookup_field = 'pk'
+
+    def get_queryset(self):
+        return order_queryset()
     
     def get_permissions(self):
         if self.request.method == 'GET':
@@ -194,78 +286,135 @@ class OrderDetailView(generics.RetrieveUpdateDestroyAPIView):
         return super().patch(request, *args, **kwargs)
     
     
-class OrderCountView(APIView):
+class BusinessOrderCountView(APIView):
     """
-    GET: gives the number of in-progress orders for a Business User
+    Base view for the order counters of a Business User.
+    Reads the denormalized counters together with the profile in one query;
+    subclasses pick the counters of the response in counts_response().
     """
-    permission_classes = [IsAuthenticated] 
+    permission_classes = [IsAuthenticated]
+
+    def business_users(self):
+        return User.objects.select_related('userprofile', 'order_counts')
+
+    def get(self, request, business_user_id):
+        return self.order_counts_response(get_object_or_404(self.business_users(), id=business_user_id))
+
+    async def aget(self, request, business_user_id):
+        return self.order_counts_response(await aget_object_or_404(self.business_users(), id=business_user_id))
 
-    def check_business_user(self, business_user):
+    def order_counts_response(self, business_user):
         try:
-            profile = UserProfile.objects.get(user=business_user)
-            if profile.type != 'business':
-                return Response(
-                    {'error': 'user-profile is not a business user.'}, 
-                    status=status.HTTP_400_BAD_REQUEST
-                )
+            profile = business_user.userprofile
         except UserProfile.DoesNotExist:
             return Response(
-                {'error': 'user-profile not found.'}, 
+                {'error': 'user-profile not found.'},
                 status=status.HTTP_404_NOT_FOUND
             )
-    
-    def get(self, request, business_user_id):
-        business_user = get_object_or_404(User, id=business_user_id)
-        self.check_business_user(business_user)
-        order_count = Order.objects.filter(
-            offer_detail__offer__user=business_user,
-            status='in_progress'
-        ).count()
-        return Response({
-            'order_count': order_count
-        }, status=status.HTTP_200_OK)
+        if profile.type != 'business':
+            return Response(
+                {'error': 'user-profile is not a business user.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            counts = business_user.order_counts
+        except BusinessOrderCount.DoesNotExist:
+            counts = BusinessOrderCount(business_user=business_user)
+        return Response(self.counts_response(counts), status=status.HTTP_200_OK)
+
+
+class OrderCountView(BusinessOrderCountView):
+    """
+    GET: gives the number of in-progress orders for a Business User
+    """
+
+    def counts_response(self, counts):
+        return {
+            'order_count': counts.in_progress
+        }
         
 
-class CompletedOrderCountView(APIView):
+class CompletedOrderCountView(BusinessOrderCountView):
     """
     GET: gives the number of completed orders for a Business User
     """
-    permission_classes = [IsAuthenticated] 
-    
-    def check_business_user(self, business_user):
+
+    def counts_response(self, counts):
+        return {
+            'completed_order_count': counts.completed
+        }
+
+
+class OrderStatusCountView(BusinessOrderCountView):
+    """
+    GET: gives the number of orders per status for a Business User
+    """
+
+    def counts_response(self, counts):
+        return {
+            'order_count': counts.in_progress,
+            'completed_order_count': counts.completed,
+            'cancelled_order_count': counts.cancelled
+        }
+        
+
+class BusinessStatsView(APIView):
+    """
+    GET: order counts by status and review count/average rating for several
+    Business Users at once, e.g. ?business_user_ids=1,2,3. Reads the
+    denormalized counters of all of them in one query; ids that are not
+    Business Users are listed in "not_found".
+    """
+    permission_classes = [IsAuthenticated]
+    max_ids = 100
+
+    def get(self, request):
         try:
-            profile = UserProfile.objects.get(user=business_user)
-            if profile.type != 'business':
-                return Response(
-                    {'error': 'user-profile is not a business user.'},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-        except UserProfile.DoesNotExist:
+            ids = list(dict.fromkeys(
+                int(value) for value in request.query_params.get('business_user_ids', '').split(',') if value.strip()
+            ))
+        except ValueError:
             return Response(
-                {'error': 'user-profile not found.'}, 
-                status=status.HTTP_404_NOT_FOUND
+                {'error': 'business_user_ids must be a comma-separated list of ids.'},
+                status=status.HTTP_400_BAD_REQUEST
             )
-    
-    def get(self, request, business_user_id):
-        business_user = get_object_or_404(User, id=business_user_id)
-        self.check_business_user(business_user)
-        completed_order_count = Order.objects.filter(
-            offer_detail__offer__user=business_user,
-            status='completed'
-        ).count()
+        if not ids or len(ids) > self.max_ids:
+            return Response(
+                {'error': f'business_user_ids must list between 1 and {self.max_ids} ids.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        rows = UserProfile.objects.filter(user_id__in=ids, type='business').values(
+            'user_id', 'rating_count', 'rating_sum', 'user__order_counts__in_progress',
+            'user__order_counts__completed', 'user__order_counts__cancelled',
+        )
+        stats = {row['user_id']: row for row in rows}
         return Response({
-            'completed_order_count': completed_order_count
+            'results': [self.business_stats(stats[user_id]) for user_id in ids if user_id in stats],
+            'not_found': [user_id for user_id in ids if user_id not in stats],
         }, status=status.HTTP_200_OK)
-        
 
-class ReviewListView(generics.ListCreateAPIView):
+    def business_stats(self, row):
+        return {
+            'business_user_id': row['user_id'],
+            'order_count': row['user__order_counts__in_progress'] or 0,
+            'completed_order_count': row['user__order_counts__completed'] or 0,
+            'cancelled_order_count': row['user__order_counts__cancelled'] or 0,
+            'review_count': row['rating_count'],
+            'average_rating': round(row['rating_sum'] / row['rating_count'], 1) if row['rating_count'] else None,
+        }
+
+
+class ReviewListView(ConditionalGetMixin, ValuesListMixin, generics.ListCreateAPIView):
     """
     GET: all reviews visible to authenticated users
     POST: create a new review (only Customer)
     """
     queryset = Review.objects.all()
     serializer_class = ReviewSerializer
+    values_serializer_class = ReviewValuesSerializer
     permission_classes = [IsAuthenticated]
+    replica_reads = True
+    pagination_class = ReviewPagination
     filter_backends = [DjangoFilterBackend, OrderingFilter]
     filterset_fields = ['business_user_id', 'reviewer_id']
     ordering_fields = ['updated_at', 'rating']
@@ -281,6 +430,77 @@ class ReviewListView(generics.ListCreateAPIView):
         serializer.save()
 
 
+class ExportView(APIView):
+    """
+    Base view for streaming exports: ?output=ndjson (default) or ?output=json.
+    Subclasses set the queryset to export, which get_queryset() may narrow
+    for the request, and the ValuesSerializer building the API
+    representation of one row.
+    """
+    permission_classes = [IsAuthenticated]
+    export_name = 'export'
+    queryset = None
+    values_serializer_class = None
+
+    def get_queryset(self):
+        assert self.queryset is not None, f'{type(self).__name__} must set `queryset`.'
+        return self.queryset.all()
+
+    def get(self, request, *args, **kwargs):
+        output = request.query_params.get('output', 'ndjson')
+        if output not in EXPORT_OUTPUTS:
+            return Response(
+                {'error': f'output must be one of: {", ".join(EXPORT_OUTPUTS)}.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        serializer = self.values_serializer_class(context={'request': request, 'view': self})
+        rows = self.get_queryset().values(*serializer.columns())
+        response = StreamingHttpResponse(
+            stream_rows(rows, serializer, output), content_type=EXPORT_OUTPUTS[output]
+        )
+        response['Content-Disposition'] = f'attachment; filename="{self.export_name}.{output}"'
+        return response
+
+
+class OrderExportView(ExportView):
+    """
+    GET: stream all orders of the requesting user (same scope as the order list)
+    """
+    export_name = 'orders'
+    queryset = Order.objects.order_by('-created_at', '-id')
+    values_serializer_class = OrderValuesSerializer
+
+    def get_queryset(self):
+        profile = get_user_profile(self.request)
+        orders = super().get_queryset()
+        if profile is not None:
+            if profile.type == 'customer':
+                return orders.filter(customer=self.request.user)
+            elif profile.type == 'business':
+                return orders.filter(offer_detail__offer__user=self.request.user)
+        return orders.none()
+
+
+class ReviewExportView(ExportView):
+    """
+    GET: stream all reviews, optionally filtered by business_user_id / reviewer_id
+    """
+    export_name = 'reviews'
+    queryset = Review.objects.order_by('-updated_at', '-id')
+    values_serializer_class = ReviewValuesSerializer
+    filter_params = ('business_user_id', 'reviewer_id')
+
+    def get_queryset(self):
+        reviews = super().get_queryset()
+        for param in self.filter_params:
+            value = self.request.query_params.get(param)
+            if value:
+                if not value.isdigit():
+                    raise ValidationError({'error': f'{param} must be a whole number.'})
+                reviews = reviews.filter(**{param: int(value)})
+        return reviews
+
+
 class ReviewDetailView(generics.RetrieveUpdateDestroyAPIView):
     """
     GET: all reviews visible to authenticated users
@@ -303,5 +523,7 @@ class ReviewDetailView(generics.RetrieveUpdateDestroyAPIView):
     def delete(self, request, *args, **kwargs):
         """delete review with 204 response"""
         instance = self.get_object()
-        self.perform_destroy(instance)
+        with transaction.atomic():
+            self.perform_destroy(instance)
+            adjust_business_rating(instance.business_user_id, removed=instance.rating)
         return Response(status=status.HTTP_204_NO_CONTENT)
\ No newline at end of file
@@ -1,6 +1,13 @@
 from django.apps import AppConfig
+from django.db.backends.signals import connection_created
 
 
 class CoderrAppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'coderr_app'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+        from core.performance import profile_connection
+        # Every connection reports its queries to the profile of sampled requests.
+        connection_created.connect(profile_connection, dispatch_uid='core.performance.profile_connection')
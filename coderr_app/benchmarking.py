@@ -0,0 +1,341 @@
+import asyncio
+import http.client
+import importlib
+import re
+import sys
+import statistics
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from io import BytesIO
+from types import SimpleNamespace
+from urllib.parse import urlencode
+from django.conf import settings
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.servers.basehttp import WSGIRequestHandler, WSGIServer
+from django.core.wsgi import get_wsgi_application
+from django.db import connection, connections
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.test.utils import override_settings
+from django.urls import clear_url_caches, reverse
+from rest_framework.authtoken.models import Token
+from coderr_app.response_cache import offer_list_cache
+from coderr_app.stats import clear_stats
+
+
+BENCHMARK_HOST = '127.0.0.1'
+FULL_SCAN_PATTERNS = {
+    'sqlite': re.compile(r'^SCAN (\w+)$'),
+    'postgresql': re.compile(r'Seq Scan on (\w+)'),
+}
+
+
+def percentile(values, percent):
+    """Nearest-rank percentile of a list of numbers."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, round(percent / 100 * len(ordered) + 0.5) - 1))
+    return ordered[rank]
+
+
+def api_client(user=None):
+    """Test client for the real URLconf, authenticated with the user's token."""
+    headers = {f"HTTP_{name.upper()}": value for name, value in auth_headers(user).items()}
+    return Client(HTTP_HOST=BENCHMARK_HOST, **headers)
+
+
+@contextmanager
+def async_read_views(enabled):
+    """
+    Route the read endpoints to the async (or the sync) views while the block
+    runs, by re-importing the URLconf with ASYNC_READ_VIEWS overridden.
+    """
+    try:
+        with override_settings(ASYNC_READ_VIEWS=enabled):
+            reload_api_urls()
+            yield
+    finally:
+        reload_api_urls()
+
+
+def reload_api_urls():
+    # The root URLconf is reloaded too: its include() resolvers cache the old patterns.
+    import coderr_app.api.urls
+    importlib.reload(coderr_app.api.urls)
+    importlib.reload(importlib.import_module(settings.ROOT_URLCONF))
+    clear_url_caches()
+
+
+def auth_headers(user):
+    if user is None:
+        return {}
+    token, _ = Token.objects.get_or_create(user=user)
+    return {'Authorization': f"Token {token.key}"}
+
+
+class QuietWSGIRequestHandler(WSGIRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+class LocalServer:
+    """
+    The WSGI application served by Django's threaded development server on
+    a free local port, for benchmarks that include the HTTP round trip.
+    """
+
+    def __init__(self):
+        self.server = WSGIServer((BENCHMARK_HOST, 0), QuietWSGIRequestHandler)
+        self.server.set_app(get_wsgi_application())
+        self.port = self.server.server_address[1]
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def client(self, user=None):
+        return HTTPClient(self.port, auth_headers(user))
+
+
+class HTTPClient:
+    """GET requests over HTTP with the `client.get(url, params)` interface of the test client."""
+
+    def __init__(self, port, headers):
+        self.port = port
+        self.headers = headers
+
+    def get(self, url, params=None):
+        connection = http.client.HTTPConnection(BENCHMARK_HOST, self.port)
+        try:
+            connection.request('GET', f"{url}?{urlencode(params)}" if params else url, headers=self.headers)
+            response = connection.getresponse()
+            return SimpleNamespace(status_code=response.status, content=response.read())
+        finally:
+            connection.close()
+
+
+def read_endpoints(business, customer, offer):
+    """(name, requesting user, url, params) of the read endpoints benchmarks exercise."""
+    return [
+        ('offers', None, reverse('offer-list'), {}),
+        ('offers by creator', None, reverse('offer-list'), {'creator_id': business.id}),
+        ('offers by min_price', None, reverse('offer-list'), {'min_price': 60, 'ordering': 'min_price'}),
+        ('offers by delivery time', None, reverse('offer-list'), {'max_delivery_time': 3}),
+        ('offers by updated_at', None, reverse('offer-list'), {'ordering': '-updated_at'}),
+        ('offers search', None, reverse('offer-list'), {'search': business.username}),
+        ('offers cursor', None, reverse('offer-list'), {'cursor': ''}),
+        ('offer detail', customer, reverse('offer-detail', args=[offer.id]), {}),
+        ('orders as customer', customer, reverse('order-list'), {}),
+        ('orders as business', business, reverse('order-list'), {}),
+        ('order counts', customer, reverse('order-status-count', args=[business.id]), {}),
+        ('business stats', customer, reverse('business-stats'), {'business_user_ids': business.id}),
+        ('reviews by business', customer, reverse('review-list'), {'business_user_id': business.id}),
+        ('reviews by reviewer', customer, reverse('review-list'), {'reviewer_id': customer.id}),
+        ('reviews by rating', customer, reverse('review-list'), {'ordering': '-rating', 'cursor': ''}),
+        ('business profiles', customer, reverse('userprofile-list-business'), {}),
+        ('business profiles stats', customer, reverse('userprofile-list-business'), {'with_stats': 1, 'cursor': ''}),
+        ('base info', None, reverse('base-info'), {}),
+    ]
+
+
+def explain_sql(sql):
+    """Query plan lines of a captured SQL statement on the default database."""
+    prefix = 'EXPLAIN QUERY PLAN ' if connection.vendor == 'sqlite' else 'EXPLAIN '
+    with connection.cursor() as cursor:
+        cursor.execute(prefix + sql)
+        return [str(row[-1]) for row in cursor.fetchall()]
+
+
+def full_scans(plan):
+    """Tables read with a full table scan according to a query plan."""
+    pattern = FULL_SCAN_PATTERNS.get(connection.vendor)
+    if pattern is None:
+        return []
+    return [match.group(1) for line in plan for match in [pattern.search(line.strip())] if match]
+
+
+def clear_response_caches():
+    """
+    Drop the cached offer list responses and base info counters, so the next
+    request runs the database queries they would otherwise skip.
+    """
+    offer_list_cache.clear()
+    clear_stats()
+
+
+def measure_endpoint(client, url, params=None, repeat=20):
+    """
+    Request an endpoint `repeat` times with cold response caches and return
+    latency percentiles, the queries of the last request and the response
+    status.
+    """
+    timings = []
+    for _ in range(repeat):
+        clear_response_caches()
+        start = time.perf_counter()
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(url, params or {})
+        timings.append(time.perf_counter() - start)
+    return {
+        'status': response.status_code,
+        'median_ms': statistics.median(timings) * 1000,
+        'p95_ms': percentile(timings, 95) * 1000,
+        'queries': [query['sql'] for query in queries.captured_queries],
+        'bytes': len(response.content),
+    }
+
+
+def run_scenario(client, url, params=None, repeat=50, warmup=5, in_process=True, cold=False):
+    """
+    Request an endpoint `warmup` times untimed, then `repeat` times timed.
+    Returns throughput, latency percentiles, the response size and status,
+    and for in-process clients the query count and the peak of memory
+    allocated by one request (measured in an extra request with cold response
+    caches, since tracing allocations slows everything down). With `cold`
+    the response caches are also cleared before every timed request, which
+    times the database path instead of the cache hits.
+    """
+    for _ in range(warmup):
+        client.get(url, params or {})
+    timings = []
+    elapsed = 0.0
+    for _ in range(repeat):
+        if cold:
+            clear_response_caches()
+        start = time.perf_counter()
+        response = client.get(url, params or {})
+        timings.append(time.perf_counter() - start)
+        elapsed += timings[-1]
+    result = {
+        'status': response.status_code,
+        'requests': repeat,
+        'throughput_rps': repeat / elapsed if elapsed else 0.0,
+        'p50_ms': percentile(timings, 50) * 1000,
+        'p95_ms': percentile(timings, 95) * 1000,
+        'p99_ms': percentile(timings, 99) * 1000,
+        'bytes': len(response.content),
+        'queries': None,
+        'peak_alloc_kb': None,
+    }
+    if in_process:
+        clear_response_caches()
+        with CaptureQueriesContext(connection) as queries:
+            tracemalloc.start()
+            try:
+                client.get(url, params or {})
+                result['peak_alloc_kb'] = tracemalloc.get_traced_memory()[1] / 1024
+            finally:
+                tracemalloc.stop()
+        result['queries'] = len(queries.captured_queries)
+    return result
+
+
+def wsgi_environ(url, params, headers):
+    environ = {
+        'REQUEST_METHOD': 'GET', 'PATH_INFO': url, 'QUERY_STRING': urlencode(params or {}),
+        'SERVER_NAME': BENCHMARK_HOST, 'SERVER_PORT': '80', 'SERVER_PROTOCOL': 'HTTP/1.1',
+        'REMOTE_ADDR': BENCHMARK_HOST, 'HTTP_HOST': BENCHMARK_HOST,
+        'wsgi.input': BytesIO(), 'wsgi.errors': sys.stderr, 'wsgi.url_scheme': 'http',
+    }
+    environ.update({f"HTTP_{name.upper().replace('-', '_')}": value for name, value in headers.items()})
+    return environ
+
+
+def asgi_scope(url, params, headers):
+    return {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET', 'scheme': 'http',
+        'path': url, 'raw_path': url.encode(), 'query_string': urlencode(params or {}).encode(), 'root_path': '',
+        'headers': [(b'host', BENCHMARK_HOST.encode())] + [
+            (name.lower().encode(), value.encode()) for name, value in headers.items()
+        ],
+        'client': (BENCHMARK_HOST, 0), 'server': (BENCHMARK_HOST, 80),
+    }
+
+
+def run_wsgi_clients(plans, threads, delay):
+    """
+    Every plan is a client sending its (url, params, headers) requests one
+    after another to a WSGI handler with `threads` worker threads; a worker
+    is held until its client has read the body, which takes `delay` seconds.
+    Returns the latencies (including the wait for a worker) and statuses.
+    """
+    handler = WSGIHandler()
+    workers = threading.BoundedSemaphore(threads)
+    latencies, statuses = [], []
+
+    def client(plan):
+        try:
+            for url, params, headers in plan:
+                started = time.perf_counter()
+                with workers:
+                    start_response = []
+                    body = handler(wsgi_environ(url, params, headers), lambda status, *args: start_response.append(status))
+                    try:
+                        b''.join(body)
+                        time.sleep(delay)
+                    finally:
+                        body.close()
+                latencies.append(time.perf_counter() - started)
+                statuses.append(int(start_response[0].split()[0]))
+        finally:
+            connections.close_all()
+
+    clients = [threading.Thread(target=client, args=(plan,)) for plan in plans]
+    for thread in clients:
+        thread.start()
+    for thread in clients:
+        thread.join()
+    return latencies, statuses
+
+
+def run_asgi_clients(plans, delay):
+    """
+    run_wsgi_clients for the ASGI handler: every client is a task on one
+    event loop, and sending the final body chunk takes `delay` seconds.
+    """
+    handler = ASGIHandler()
+    latencies, statuses = [], []
+
+    async def request(url, params, headers):
+        received = False
+        status = None
+
+        async def receive():
+            nonlocal received
+            if received:
+                # No disconnect; the handler cancels this wait when the response is sent.
+                await asyncio.Future()
+            received = True
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+        async def send(message):
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+            elif not message.get('more_body'):
+                await asyncio.sleep(delay)
+
+        await handler(asgi_scope(url, params, headers), receive, send)
+        return status
+
+    async def client(plan):
+        for url, params, headers in plan:
+            started = time.perf_counter()
+            status = await request(url, params, headers)
+            latencies.append(time.perf_counter() - started)
+            statuses.append(status)
+
+    async def main():
+        await asyncio.gather(*(client(plan) for plan in plans))
+
+    asyncio.run(main())
+    return latencies, statuses
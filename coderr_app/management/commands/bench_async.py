@@ -0,0 +1,90 @@
+import json
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from coderr_app.benchmarking import (
+    async_read_views, auth_headers, percentile, read_endpoints, run_asgi_clients, run_wsgi_clients,
+)
+from coderr_app.models import Offer, Order
+
+
+ASYNC_ENDPOINTS = ('offers', 'offer detail', 'order counts', 'reviews by business', 'base info')
+MODES = ('wsgi', 'asgi-sync', 'asgi-async')
+
+
+class Command(BaseCommand):
+    """
+    Compare the sync and the async read path under concurrent slow clients.
+    Every client sends --requests requests one after another and needs
+    --client-delay seconds to read each response. Modes:
+    wsgi: the sync views in a WSGI server with --threads worker threads;
+    asgi-sync: the sync views under ASGI, each request run in a thread;
+    asgi-async: the async read views (ASYNC_READ_VIEWS) under ASGI.
+    The handlers are driven in-process, without sockets, against the data in
+    the database (see seed_dataset).
+    """
+    help = 'Benchmark the async read views against the sync views under concurrent slow clients.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clients', type=int, default=50)
+        parser.add_argument('--requests', type=int, default=10, help='Requests per client.')
+        parser.add_argument('--client-delay', type=float, default=0.05,
+                            help='Seconds a client needs to read a response.')
+        parser.add_argument('--threads', type=int, default=8, help='Worker threads of the WSGI server.')
+        parser.add_argument('--mode', action='append', choices=MODES, default=[],
+                            help='Only this mode (repeatable).')
+        parser.add_argument('--only', action='append', default=[],
+                            help='Only endpoints whose name contains this text (repeatable).')
+        parser.add_argument('--output', help='Write the JSON report to this file.')
+
+    def handle(self, *args, **options):
+        endpoints = self.endpoints(options['only'])
+        plans = [
+            [endpoints[(client + index) % len(endpoints)][1:] for index in range(options['requests'])]
+            for client in range(options['clients'])
+        ]
+        results = []
+        for mode in options['mode'] or MODES:
+            with async_read_views(mode == 'asgi-async'):
+                started = time.perf_counter()
+                if mode == 'wsgi':
+                    latencies, statuses = run_wsgi_clients(plans, options['threads'], options['client_delay'])
+                else:
+                    latencies, statuses = run_asgi_clients(plans, options['client_delay'])
+                elapsed = time.perf_counter() - started
+            results.append({
+                'mode': mode,
+                'requests': len(latencies),
+                'errors': sum(status != 200 for status in statuses),
+                'throughput_rps': len(latencies) / elapsed if elapsed else 0.0,
+                'p50_ms': percentile(latencies, 50) * 1000,
+                'p95_ms': percentile(latencies, 95) * 1000,
+                'p99_ms': percentile(latencies, 99) * 1000,
+            })
+        if options['output']:
+            meta = {
+                key: options[key] for key in ('clients', 'requests', 'client_delay', 'threads')
+            }
+            meta.update(database=connection.vendor, endpoints=[endpoint[0] for endpoint in endpoints])
+            with open(options['output'], 'w') as output:
+                json.dump({'meta': meta, 'results': results}, output, indent=2)
+        for row in results:
+            self.stdout.write(
+                f"{row['mode']:<11} {row['throughput_rps']:8.1f} req/s  p50 {row['p50_ms']:8.2f} ms  "
+                f"p95 {row['p95_ms']:8.2f} ms  p99 {row['p99_ms']:8.2f} ms  {row['errors']} errors"
+            )
+
+    def endpoints(self, only):
+        """(name, url, params, headers) of the endpoints that have an async read view."""
+        offer = Offer.objects.filter(user__userprofile__type='business').order_by('id').first()
+        order = Order.objects.select_related('customer').order_by('id').first()
+        if offer is None or order is None:
+            raise CommandError('No offers or orders to benchmark; run seed_dataset first.')
+        endpoints = [
+            (name, url, params, auth_headers(user))
+            for name, user, url, params in read_endpoints(offer.user, order.customer, offer)
+            if name in ASYNC_ENDPOINTS and (not only or any(text in name for text in only))
+        ]
+        if not endpoints:
+            raise CommandError('No endpoint matches --only.')
+        return endpoints
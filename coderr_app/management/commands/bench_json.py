@@ -0,0 +1,87 @@
+import json
+import time
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+from core.renderers import FastJSONRenderer, fast_json_available
+from coderr_app.api.fast_serializers import OfferValuesSerializer, OrderValuesSerializer, ReviewValuesSerializer
+from coderr_app.api.views import order_queryset
+from coderr_app.benchmarking import BENCHMARK_HOST
+from coderr_app.models import Offer, Review
+from coderr_app.seeding import seed_dataset
+
+
+class Command(BaseCommand):
+    """
+    Render throughput of DRF's JSONRenderer against FastJSONRenderer on list
+    pages of a dataset seeded inside a rolled-back transaction. Both outputs
+    are compared byte for byte.
+    """
+    help = 'Compare render throughput of the stock and the fast JSON renderer.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--page-size', type=int, default=100)
+        parser.add_argument('--repeat', type=int, default=200)
+        parser.add_argument('--json', action='store_true', help='Print the report as JSON.')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            seed_dataset(20, 100, 10, 3, 2, prefix='bench')
+            payloads = self.payloads(options['page_size'])
+            transaction.set_rollback(True)
+        report = [self.measure(name, data, options['repeat']) for name, data in payloads]
+        if options['json']:
+            self.stdout.write(json.dumps({'orjson': fast_json_available(), 'results': report}, indent=2))
+            return
+        if not fast_json_available():
+            self.stdout.write(self.style.WARNING('orjson is not installed, FastJSONRenderer uses the stdlib.'))
+        for row in report:
+            self.stdout.write(
+                f"{row['payload']:<8} {row['bytes']:>8} bytes  stock {row['stock_per_sec']:>8.0f}/s  "
+                f"fast {row['fast_per_sec']:>8.0f}/s  x{row['speedup']:.2f}  identical: {row['identical']}"
+            )
+
+    def payloads(self, page_size):
+        context = {'request': Request(APIRequestFactory().get('/api/', HTTP_HOST=BENCHMARK_HOST))}
+        cases = [
+            ('offers', OfferValuesSerializer, Offer.objects.select_related('user')),
+            ('orders', OrderValuesSerializer, order_queryset()),
+            ('reviews', ReviewValuesSerializer, Review.objects.order_by('-updated_at')),
+        ]
+        return [
+            (name, {
+                'count': queryset.count(),
+                'next': None,
+                'previous': None,
+                'results': serializer_class(context).serialize(
+                    queryset.values(*serializer_class.columns())[:page_size]
+                ),
+            })
+            for name, serializer_class, queryset in cases
+        ]
+
+    def measure(self, name, data, repeat):
+        stock, fast = JSONRenderer(), FastJSONRenderer()
+        stock_seconds = self.best_of(repeat, lambda: stock.render(data))
+        fast_seconds = self.best_of(repeat, lambda: fast.render(data))
+        rendered = stock.render(data)
+        return {
+            'payload': name,
+            'bytes': len(rendered),
+            'stock_per_sec': 1 / stock_seconds,
+            'fast_per_sec': 1 / fast_seconds,
+            'speedup': stock_seconds / fast_seconds,
+            'identical': fast.render(data) == rendered,
+        }
+
+    def best_of(self, repeat, run):
+        """Fastest of `repeat` rounds of 10 renders, per render."""
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            for _ in range(10):
+                run()
+            timings.append((time.perf_counter() - start) / 10)
+        return min(timings)
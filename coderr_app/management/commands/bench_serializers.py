@@ -0,0 +1,80 @@
+import json
+import time
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+from coderr_app.api.fast_serializers import OfferValuesSerializer, OrderValuesSerializer, ReviewValuesSerializer
+from coderr_app.api.serializers import OfferSerializer, OrderSerializer, ReviewSerializer
+from coderr_app.api.views import order_queryset
+from coderr_app.benchmarking import BENCHMARK_HOST
+from coderr_app.models import Offer, Review
+from coderr_app.seeding import seed_dataset
+
+
+class Command(BaseCommand):
+    """
+    Microbenchmark of the list serializers: objects per second of the
+    ModelSerializer path (model instances) against the values() path, both
+    including the queries, on a dataset seeded inside a rolled-back
+    transaction.
+    """
+    help = 'Compare objects/sec of the model serializers and the values() serializers.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--business', type=int, default=50)
+        parser.add_argument('--customers', type=int, default=200)
+        parser.add_argument('--offers-per-business', type=int, default=20)
+        parser.add_argument('--orders-per-customer', type=int, default=5)
+        parser.add_argument('--reviews-per-customer', type=int, default=3)
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--json', action='store_true', help='Print the report as JSON.')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            seed_dataset(
+                options['business'], options['customers'], options['offers_per_business'],
+                options['orders_per_customer'], options['reviews_per_customer'], prefix='bench'
+            )
+            report = [self.measure(*case, options['repeat']) for case in self.cases()]
+            transaction.set_rollback(True)
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+        for row in report:
+            self.stdout.write(
+                f"{row['serializer']:<10} {row['objects']:>7} objects  "
+                f"model {row['model_per_sec']:>10.0f}/s  values {row['values_per_sec']:>10.0f}/s  "
+                f"x{row['speedup']:.2f}"
+            )
+
+    def cases(self):
+        return [
+            ('offers', OfferSerializer, OfferValuesSerializer,
+             Offer.objects.select_related('user').prefetch_related('details'), '/api/offers/'),
+            ('orders', OrderSerializer, OrderValuesSerializer, order_queryset(), '/api/orders/'),
+            ('reviews', ReviewSerializer, ReviewValuesSerializer, Review.objects.all(), '/api/reviews/'),
+        ]
+
+    def measure(self, name, serializer_class, values_serializer_class, queryset, path, repeat):
+        context = {'request': Request(APIRequestFactory().get(path, HTTP_HOST=BENCHMARK_HOST))}
+        objects = queryset.count()
+        model_seconds = self.best_of(repeat, lambda: serializer_class(queryset.all(), many=True, context=context).data)
+        values_seconds = self.best_of(repeat, lambda: values_serializer_class(context).serialize(
+            queryset.prefetch_related(None).values(*values_serializer_class.columns())
+        ))
+        return {
+            'serializer': name,
+            'objects': objects,
+            'model_per_sec': objects / model_seconds,
+            'values_per_sec': objects / values_seconds,
+            'speedup': model_seconds / values_seconds,
+        }
+
+    def best_of(self, repeat, run):
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            run()
+            timings.append(time.perf_counter() - start)
+        return min(timings)
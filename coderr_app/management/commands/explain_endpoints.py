@@ -0,0 +1,91 @@
+import json
+from django.apps import apps
+from django.db import connection, transaction
+from django.core.management.base import BaseCommand
+from coderr_app.benchmarking import api_client, explain_sql, full_scans, measure_endpoint, read_endpoints
+from coderr_app.response_cache import offer_list_cache
+from coderr_app.seeding import seed_dataset
+from coderr_app.stats import rebuild_order_counts, rebuild_stats
+
+
+class Command(BaseCommand):
+    """
+    Seed a realistic dataset inside a transaction, request every read endpoint
+    with cold response caches (see clear_response_caches), and report timings
+    plus the query plan of each SELECT it runs. With
+    --compare the same endpoints are measured again with the model indexes
+    dropped. Everything is rolled back at the end.
+    """
+    help = 'Report EXPLAIN plans and timings of the read endpoints on a seeded dataset.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--business', type=int, default=200)
+        parser.add_argument('--customers', type=int, default=1000)
+        parser.add_argument('--offers-per-business', type=int, default=20)
+        parser.add_argument('--orders-per-customer', type=int, default=5)
+        parser.add_argument('--reviews-per-customer', type=int, default=3)
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--compare', action='store_true', help='Also measure without the model indexes.')
+        parser.add_argument('--json', action='store_true', help='Print the report as JSON.')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            data = seed_dataset(
+                options['business'], options['customers'], options['offers_per_business'],
+                options['orders_per_customer'], options['reviews_per_customer'], prefix='explain'
+            )
+            rebuild_order_counts()
+            self.analyze()
+            report = {'indexed': self.measure(data, options['repeat'])}
+            if options['compare']:
+                self.drop_indexes()
+                self.analyze()
+                report['unindexed'] = self.measure(data, options['repeat'])
+            transaction.set_rollback(True)
+        # Drop what the measured requests cached from the rolled-back rows.
+        rebuild_stats()
+        offer_list_cache.clear()
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+        else:
+            self.print_report(report, options['verbosity'])
+
+    def endpoints(self, data):
+        return read_endpoints(data['business_users'][0], data['customers'][0], data['offers'][0])
+
+    def measure(self, data, repeat):
+        results = []
+        for name, user, url, params in self.endpoints(data):
+            result = measure_endpoint(api_client(user), url, params, repeat)
+            plans = [
+                {'sql': sql, 'plan': plan, 'full_scans': full_scans(plan)}
+                for sql in result.pop('queries') if sql.lstrip().upper().startswith('SELECT')
+                for plan in [explain_sql(sql)]
+            ]
+            results.append(dict(result, endpoint=name, url=url, params=params, plans=plans))
+        return results
+
+    def analyze(self):
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def drop_indexes(self):
+        with connection.cursor() as cursor:
+            for model in apps.get_models():
+                for index in model._meta.indexes:
+                    cursor.execute(f"DROP INDEX {connection.ops.quote_name(index.name)}")
+
+    def print_report(self, report, verbosity=1):
+        baseline = {row['endpoint']: row for row in report.get('unindexed', [])}
+        for row in report['indexed']:
+            line = f"{row['endpoint']:<26} {row['median_ms']:8.2f} ms  p95 {row['p95_ms']:8.2f} ms  {len(row['plans'])} queries"
+            if row['endpoint'] in baseline:
+                before = baseline[row['endpoint']]
+                line += f"  (unindexed {before['median_ms']:.2f} ms, p95 {before['p95_ms']:.2f} ms)"
+            self.stdout.write(line)
+            for plan in row['plans']:
+                if verbosity > 1:
+                    for step in plan['plan']:
+                        self.stdout.write(f"    {step}")
+                if plan['full_scans']:
+                    self.stdout.write(self.style.WARNING(f"    full scan: {', '.join(plan['full_scans'])}"))
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from coderr_app.search import get_search_backend
+
+
+class Command(BaseCommand):
+    """
+    Rebuild the offer full-text search index from the Offer table.
+    """
+    help = 'Rebuild the full-text search index used by /api/offers/?search='
+
+    def handle(self, *args, **options):
+        indexed = get_search_backend().rebuild()
+        self.stdout.write(self.style.SUCCESS(f'{indexed} offers indexed.'))
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from coderr_app.stats import rebuild_business_ratings, rebuild_order_counts, rebuild_stats
+
+
+class Command(BaseCommand):
+    """
+    Recompute the cached platform statistics, the per-business order
+    counters and the business rating aggregates from the database.
+    """
+    help = 'Rebuild the platform statistics, the per-business order counters and rating aggregates.'
+
+    def handle(self, *args, **options):
+        stats = rebuild_stats()
+        for field, value in stats.items():
+            self.stdout.write(f"{field}: {value}")
+        business_count = rebuild_order_counts()
+        self.stdout.write(f"order counters: {business_count} business users")
+        rated_count = rebuild_business_ratings()
+        self.stdout.write(f"rating aggregates: {rated_count} business users")
+        self.stdout.write(self.style.SUCCESS('Platform statistics rebuilt.'))
@@ -0,0 +1,141 @@
+import json
+import platform
+import subprocess
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+from coderr_app.benchmarking import LocalServer, api_client, read_endpoints, run_scenario
+from coderr_app.models import Offer, Order
+from coderr_app.response_cache import offer_list_cache
+from coderr_app.seeding import seed_dataset
+from coderr_app.stats import rebuild_order_counts, rebuild_stats
+
+
+class Command(BaseCommand):
+    """
+    Request every read endpoint through the real URLconf and report
+    throughput, p50/p95/p99 latency, query count, response size and peak
+    allocations per endpoint. The JSON report (--output) records the commit
+    and environment, and --baseline prints the change against an earlier
+    report. Runs against the data in the database (see seed_dataset) or,
+    with --seed, against a dataset seeded inside a rolled-back transaction.
+    Query counts are always taken with cold response caches; --cold also
+    times the requests without them.
+    """
+    help = 'Benchmark the read endpoints and write a JSON report.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=50)
+        parser.add_argument('--warmup', type=int, default=5)
+        parser.add_argument('--server', action='store_true',
+                            help='Send the requests over HTTP to a local WSGI server instead of in-process.')
+        parser.add_argument('--only', action='append', default=[],
+                            help='Only endpoints whose name contains this text (repeatable).')
+        parser.add_argument('--output', help='Write the JSON report to this file.')
+        parser.add_argument('--baseline', help='JSON report to compare against.')
+        parser.add_argument('--cold', action='store_true',
+                            help='Clear the offer list and stats caches before every timed request.')
+        parser.add_argument('--seed', action='store_true',
+                            help='Seed a dataset for this run only (in-process mode).')
+        parser.add_argument('--business', type=int, default=50)
+        parser.add_argument('--customers', type=int, default=200)
+        parser.add_argument('--offers-per-business', type=int, default=20)
+        parser.add_argument('--orders-per-customer', type=int, default=5)
+        parser.add_argument('--reviews-per-customer', type=int, default=3)
+
+    def handle(self, *args, **options):
+        if options['seed'] and options['server']:
+            raise CommandError('--seed data is not committed, so the server thread cannot see it; '
+                               'run seed_dataset first.')
+        if options['server']:
+            endpoints = self.endpoints(options['only'])
+            with LocalServer() as server:
+                results = self.measure(endpoints, server.client, options, in_process=False)
+        else:
+            with transaction.atomic():
+                if options['seed']:
+                    seed_dataset(
+                        options['business'], options['customers'], options['offers_per_business'],
+                        options['orders_per_customer'], options['reviews_per_customer'], prefix='bench'
+                    )
+                    rebuild_order_counts()
+                endpoints = self.endpoints(options['only'])
+                results = self.measure(endpoints, api_client, options, in_process=True)
+                transaction.set_rollback(True)
+            if options['seed']:
+                # Drop what the measured requests cached from the rolled-back rows.
+                rebuild_stats()
+                offer_list_cache.clear()
+        report = {'meta': self.meta(options), 'results': results}
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump(report, output, indent=2)
+        self.print_report(results, self.load_baseline(options['baseline']))
+
+    def endpoints(self, only):
+        offer = Offer.objects.filter(user__userprofile__type='business').order_by('id').first()
+        order = Order.objects.select_related('customer').order_by('id').first()
+        if offer is None or order is None:
+            raise CommandError('No offers or orders to benchmark; run seed_dataset first or pass --seed.')
+        endpoints = read_endpoints(offer.user, order.customer, offer)
+        if only:
+            endpoints = [endpoint for endpoint in endpoints if any(text in endpoint[0] for text in only)]
+        return endpoints
+
+    def measure(self, endpoints, make_client, options, in_process):
+        results = []
+        for name, user, url, params in endpoints:
+            result = run_scenario(
+                make_client(user), url, params, options['repeat'], options['warmup'], in_process, options['cold']
+            )
+            results.append(dict(result, endpoint=name, url=url, params=params))
+        return results
+
+    def meta(self, options):
+        try:
+            commit = subprocess.run(
+                ['git', 'rev-parse', 'HEAD'], cwd=settings.BASE_DIR, capture_output=True, text=True, check=True
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            commit = None
+        return {
+            'commit': commit,
+            'created_at': timezone.now().isoformat(),
+            'mode': 'wsgi' if options['server'] else 'in-process',
+            'repeat': options['repeat'],
+            'warmup': options['warmup'],
+            'cold': options['cold'],
+            'database': connection.vendor,
+            'python': platform.python_version(),
+            'django': django.get_version(),
+        }
+
+    def load_baseline(self, path):
+        if not path:
+            return {}
+        try:
+            with open(path) as baseline:
+                return {row['endpoint']: row for row in json.load(baseline)['results']}
+        except (OSError, ValueError, KeyError) as exc:
+            raise CommandError(f'Cannot read the baseline report {path}: {exc}')
+
+    def print_report(self, results, baseline):
+        for row in results:
+            line = (
+                f"{row['endpoint']:<26} {row['throughput_rps']:8.1f} req/s  p50 {row['p50_ms']:7.2f} ms  "
+                f"p95 {row['p95_ms']:7.2f} ms  p99 {row['p99_ms']:7.2f} ms"
+            )
+            if row['queries'] is not None:
+                line += f"  {row['queries']:>3} queries  {row['peak_alloc_kb']:8.1f} KiB peak"
+            before = baseline.get(row['endpoint'])
+            if before:
+                line += f"  (p50 {self.change(before['p50_ms'], row['p50_ms'])}, p95 {self.change(before['p95_ms'], row['p95_ms'])}"
+                if row['queries'] is not None and before.get('queries') is not None:
+                    line += f", queries {row['queries'] - before['queries']:+d}"
+                line += ')'
+            self.stdout.write(line)
+
+    def change(self, before, after):
+        return f"{(after - before) / before * 100:+.1f}%" if before else 'n/a'
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from coderr_app.seeding import seed_dataset
+from coderr_app.stats import rebuild_order_counts, rebuild_stats
+
+
+class Command(BaseCommand):
+    """
+    Seed a marketplace dataset that stays in the database, e.g. as the fixed
+    data set run_benchmarks measures against. The derived counters are
+    rebuilt afterwards.
+    """
+    help = 'Create business and customer users, offers with three tiers, orders and reviews.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--business', type=int, default=200)
+        parser.add_argument('--customers', type=int, default=1000)
+        parser.add_argument('--offers-per-business', type=int, default=20)
+        parser.add_argument('--orders-per-customer', type=int, default=5)
+        parser.add_argument('--reviews-per-customer', type=int, default=3)
+        parser.add_argument('--prefix', default='seed', help='Username prefix; must be unused.')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            data = seed_dataset(
+                options['business'], options['customers'], options['offers_per_business'],
+                options['orders_per_customer'], options['reviews_per_customer'], prefix=options['prefix']
+            )
+            rebuild_order_counts()
+        rebuild_stats()
+        for name, rows in data.items():
+            self.stdout.write(f"{name}: {len(rows)}")
+        self.stdout.write(self.style.SUCCESS('Dataset seeded.'))
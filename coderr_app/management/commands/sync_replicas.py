@@ -0,0 +1,40 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+from core.db_routing import copy_sqlite_database, replica_aliases
+
+
+class Command(BaseCommand):
+    """
+    Refresh the local SQLite replica stand-ins (REPLICA_DATABASES) from the
+    primary database. With --interval the copy repeats, so the replicas lag
+    behind the primary by up to that many seconds like real ones would.
+    Real replicas are kept up to date by the database server instead.
+    """
+    help = 'Copy the primary SQLite database to the replica databases.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', action='append', default=[],
+                            help='Only this replica alias (repeatable).')
+        parser.add_argument('--interval', type=float,
+                            help='Repeat the copy every this many seconds until interrupted.')
+
+    def handle(self, *args, **options):
+        aliases = options['database'] or replica_aliases()
+        if not aliases:
+            raise CommandError('No replica databases configured; set REPLICA_DATABASES.')
+        primary = connections[DEFAULT_DB_ALIAS]
+        for alias in aliases:
+            if alias not in replica_aliases():
+                raise CommandError(f'{alias} is not a replica database.')
+            if primary.vendor != 'sqlite' or connections[alias].vendor != 'sqlite':
+                raise CommandError(f'{alias}: only SQLite stand-ins can be synced; use database replication.')
+        while True:
+            for alias in aliases:
+                started = time.perf_counter()
+                connections[alias].close()
+                copy_sqlite_database(primary.settings_dict['NAME'], connections[alias].settings_dict['NAME'])
+                self.stdout.write(f'{alias}: synced in {(time.perf_counter() - started) * 1000:.1f} ms')
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.3 on 2026-10-18 01:27
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_order_counts(apps, schema_editor):
+    Order = apps.get_model('coderr_app', 'Order')
+    BusinessOrderCount = apps.get_model('coderr_app', 'BusinessOrderCount')
+    rows = Order.objects.values('offer_detail__offer__user').annotate(
+        in_progress=models.Count('id', filter=models.Q(status='in_progress')),
+        completed=models.Count('id', filter=models.Q(status='completed')),
+        cancelled=models.Count('id', filter=models.Q(status='cancelled')),
+    )
+    BusinessOrderCount.objects.bulk_create([
+        BusinessOrderCount(
+            business_user_id=row['offer_detail__offer__user'],
+            in_progress=row['in_progress'],
+            completed=row['completed'],
+            cancelled=row['cancelled'],
+        )
+        for row in rows
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('coderr_app', '0008_alter_offer_image'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BusinessOrderCount',
+            fields=[
+                ('business_user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='order_counts', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('in_progress', models.PositiveIntegerField(default=0)),
+                ('completed', models.PositiveIntegerField(default=0)),
+                ('cancelled', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(backfill_order_counts, migrations.RunPython.noop),
+    ]
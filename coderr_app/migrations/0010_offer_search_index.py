@@ -0,0 +1,44 @@
+from django.db import migrations
+
+
+FTS_TABLE = 'coderr_app_offer_fts'
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    Offer = apps.get_model('coderr_app', 'Offer')
+    OfferDetail = apps.get_model('coderr_app', 'OfferDetail')
+    schema_editor.execute(
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} "
+        "USING fts5(title, description, features, tokenize='unicode61 remove_diacritics 2')"
+    )
+    features = {}
+    for offer_id, detail_features in OfferDetail.objects.values_list('offer_id', 'features'):
+        if isinstance(detail_features, list):
+            features.setdefault(offer_id, []).extend(str(feature) for feature in detail_features)
+    with schema_editor.connection.cursor() as cursor:
+        cursor.executemany(
+            f"INSERT INTO {FTS_TABLE} (rowid, title, description, features) VALUES (%s, %s, %s, %s)",
+            [
+                (offer_id, title, description, ' '.join(features.get(offer_id, [])))
+                for offer_id, title, description in Offer.objects.values_list('id', 'title', 'description')
+            ]
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('coderr_app', '0009_businessordercount'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
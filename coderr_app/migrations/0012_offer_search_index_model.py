@@ -0,0 +1,25 @@
+# Generated by Django 5.2.3 on 2026-10-18 02:15
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('coderr_app', '0011_access_path_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OfferSearchIndex',
+            fields=[
+                ('offer', models.OneToOneField(db_column='rowid', db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='search_index', serialize=False, to='coderr_app.offer')),
+                ('document', models.TextField(db_column='coderr_app_offer_fts')),
+            ],
+            options={
+                'db_table': 'coderr_app_offer_fts',
+                'managed': False,
+            },
+        ),
+    ]
@@ -0,0 +1,40 @@
+from django.db import migrations
+
+
+# Must match coderr_app.search.offer_search_vector(), or PostgreSQL will not
+# use the index for the search match.
+INDEX_NAME = 'offer_search_vector_idx'
+SEARCH_CONFIG = 'simple'
+
+
+def search_vector_index():
+    from django.contrib.postgres.indexes import GinIndex
+    from django.contrib.postgres.search import SearchVector
+    return GinIndex(
+        SearchVector('title', weight='A', config=SEARCH_CONFIG)
+        + SearchVector('description', weight='B', config=SEARCH_CONFIG),
+        name=INDEX_NAME,
+    )
+
+
+def create_search_vector_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.add_index(apps.get_model('coderr_app', 'Offer'), search_vector_index())
+
+
+def drop_search_vector_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.remove_index(apps.get_model('coderr_app', 'Offer'), search_vector_index())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('coderr_app', '0012_offer_search_index_model'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_vector_index, drop_search_vector_index),
+    ]
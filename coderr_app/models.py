@@ -23,6 +23,13 @@ class Offer(models.Model):
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='offer_created_idx'),
+            models.Index(fields=['updated_at', 'id'], name='offer_updated_idx'),
+            models.Index(fields=['min_price', 'id'], name='offer_min_price_idx'),
+            models.Index(fields=['min_delivery_time', 'id'], name='offer_delivery_idx'),
+            models.Index(fields=['user', 'created_at'], name='offer_user_created_idx'),
+        ]
 
 
 class OfferDetail(models.Model):
@@ -49,6 +56,11 @@ class OfferDetail(models.Model):
     def __str__(self):
         return f"{self.offer.title} - {self.title}"
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['offer', 'offer_type'], name='offerdetail_offer_type_idx'),
+        ]
+
 
 class Order(models.Model):
     """
@@ -71,6 +83,13 @@ class Order(models.Model):
     
     def __str__(self):
         return f"Order {self.id} - {self.offer_detail.title}"
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['customer', 'created_at'], name='order_customer_created_idx'),
+            models.Index(fields=['offer_detail', 'status'], name='order_detail_status_idx'),
+            models.Index(fields=['created_at', 'id'], name='order_created_idx'),
+        ]
     
     
 class Review(models.Model):
@@ -90,4 +109,43 @@ class Review(models.Model):
     
     def __str__(self):
         return f"Review by {self.reviewer.username} for {self.business_user.username}"
-    
\ No newline at end of file
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['business_user', 'updated_at'], name='review_business_updated_idx'),
+            models.Index(fields=['reviewer', 'updated_at'], name='review_reviewer_updated_idx'),
+            models.Index(fields=['updated_at', 'id'], name='review_updated_idx'),
+            models.Index(fields=['rating', 'id'], name='review_rating_idx'),
+        ]
+    
+
+class BusinessOrderCount(models.Model):
+    """
+    Denormalized number of orders per status for a business user.
+    Kept current by the Order signals in the same transaction as the order write.
+    """
+    STATUS_FIELDS = ('in_progress', 'completed', 'cancelled')
+    business_user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='order_counts')
+    in_progress = models.PositiveIntegerField(default=0)
+    completed = models.PositiveIntegerField(default=0)
+    cancelled = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"Order counts for {self.business_user_id}"
+
+
+class OfferSearchIndex(models.Model):
+    """
+    Row of the SQLite FTS5 index of coderr_app.search (rowid = offer id), so
+    searches can join it once. `document` is the hidden column named like
+    the table, which MATCH and bm25() take. Only exists on SQLite.
+    """
+    offer = models.OneToOneField(
+        Offer, on_delete=models.DO_NOTHING, primary_key=True, db_column='rowid',
+        db_constraint=False, related_name='search_index'
+    )
+    document = models.TextField(db_column='coderr_app_offer_fts')
+
+    class Meta:
+        managed = False
+        db_table = 'coderr_app_offer_fts'
@@ -0,0 +1,149 @@
+import hashlib
+import threading
+import uuid
+from django.core.cache import caches
+from django.db import transaction
+from django.utils.http import urlencode
+
+
+OFFER_LIST_CACHE_ALIAS = 'offer_list'
+OFFER_LIST_KEY_PREFIX = 'coderr:offers:'
+OFFER_LIST_PARAMS = (
+    'creator_id', 'min_price', 'max_delivery_time', 'ordering', 'search', 'page', 'page_size', 'cursor'
+)
+
+
+def new_version():
+    return uuid.uuid4().hex
+
+
+class OfferListCache:
+    """
+    Versioned cache of offer list responses.
+    Entries are keyed on the host, the normalized list parameters and a
+    version token: the per-creator token for ?creator_id= requests, the
+    global token otherwise. Offer writes replace the global token and the
+    token of the creator with new random ones, which makes every affected key
+    unreachable without scanning keys; the stale entries expire with the
+    cache timeout. Replacing the token is a single set, so it is atomic on
+    every cache backend, and an evicted token never comes back at a value an
+    old entry was stored under.
+    """
+    def __init__(self, alias=OFFER_LIST_CACHE_ALIAS):
+        self.alias = alias
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def version_key(self, creator_id=None):
+        if creator_id is None:
+            return f"{OFFER_LIST_KEY_PREFIX}version"
+        return f"{OFFER_LIST_KEY_PREFIX}version:creator:{creator_id}"
+
+    def get_version(self, creator_id=None):
+        key = self.version_key(creator_id)
+        version = self.cache.get(key)
+        if version is None:
+            self.cache.add(key, new_version(), timeout=None)
+            version = self.cache.get(key)
+        return version
+
+    async def aget_version(self, creator_id=None):
+        key = self.version_key(creator_id)
+        version = await self.cache.aget(key)
+        if version is None:
+            await self.cache.aadd(key, new_version(), timeout=None)
+            version = await self.cache.aget(key)
+        return version
+
+    def bump(self, creator_ids):
+        """
+        Invalidate the global and the given creators' lists, right away and
+        again once the transaction commits, so responses that other requests
+        cached from the old rows while the transaction was open are dropped too.
+        """
+        keys = [self.version_key()] + [self.version_key(creator_id) for creator_id in set(creator_ids)]
+
+        def apply():
+            self.cache.set_many({key: new_version() for key in keys}, timeout=None)
+
+        apply()
+        transaction.on_commit(apply)
+
+    def key_parts(self, request):
+        """
+        (creator id, normalized parameters) of a list request, or None if the
+        request is not cacheable (parameters the key does not cover would
+        change the response links).
+        """
+        params = request.query_params
+        if any(name not in OFFER_LIST_PARAMS for name in params):
+            return None
+        normalized = sorted((name, value) for name in params for value in params.getlist(name))
+        creator_id = params.get('creator_id')
+        return (int(creator_id) if creator_id and creator_id.isdigit() else None), normalized
+
+    def make_key(self, request, version, normalized):
+        digest = hashlib.md5(
+            f"{request.get_host()}|{version}|{urlencode(normalized)}".encode(), usedforsecurity=False
+        ).hexdigest()
+        return f"{OFFER_LIST_KEY_PREFIX}list:{digest}"
+
+    def key(self, request):
+        """Cache key of a list request, or None if the request is not cacheable."""
+        parts = self.key_parts(request)
+        if parts is None:
+            return None
+        creator_id, normalized = parts
+        return self.make_key(request, self.get_version(creator_id), normalized)
+
+    async def akey(self, request):
+        parts = self.key_parts(request)
+        if parts is None:
+            return None
+        creator_id, normalized = parts
+        return self.make_key(request, await self.aget_version(creator_id), normalized)
+
+    def get(self, key):
+        return self.count(self.cache.get(key))
+
+    async def aget(self, key):
+        return self.count(await self.cache.aget(key))
+
+    def count(self, entry):
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return entry
+
+    def set(self, key, entry):
+        self.cache.set(key, entry)
+
+    async def aset(self, key, entry):
+        await self.cache.aset(key, entry)
+
+    def metrics(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / total, 3) if total else 0.0,
+            }
+
+    def clear(self):
+        """Drop every cached response and version, e.g. after data was rolled back."""
+        self.cache.clear()
+
+    def reset_metrics(self):
+        with self._lock:
+            self.hits = self.misses = 0
+
+
+offer_list_cache = OfferListCache()
@@ -0,0 +1,174 @@
+import re
+from django.db import connection, models
+from django.db.models import F, Func, Lookup, Value
+from coderr_app.models import Offer, OfferDetail, OfferSearchIndex
+
+
+FTS_TABLE = 'coderr_app_offer_fts'
+FTS_COLUMN_WEIGHTS = (10.0, 1.0, 2.0)
+# Text search configuration of the PostgreSQL vector; an index expression
+# needs an explicit one, and 'simple' does not stem, like the FTS5 tokenizer.
+PG_SEARCH_CONFIG = 'simple'
+PG_SEARCH_INDEX = 'offer_search_vector_idx'
+TOKEN_PATTERN = re.compile(r'\w+', re.UNICODE)
+
+
+def search_tokens(term):
+    """Split a raw search term into plain word tokens."""
+    return TOKEN_PATTERN.findall(term or '')
+
+
+def offer_documents(offer_ids=None):
+    """
+    Yield (id, title, description, features) for the given offers, or all
+    offers, with the features of every tier joined into one text column.
+    """
+    offers = Offer.objects.order_by().values_list('id', 'title', 'description')
+    details = OfferDetail.objects.order_by().values_list('offer_id', 'features')
+    if offer_ids is not None:
+        offers = offers.filter(id__in=offer_ids)
+        details = details.filter(offer_id__in=offer_ids)
+    features = {}
+    for offer_id, detail_features in details:
+        if isinstance(detail_features, list):
+            features.setdefault(offer_id, []).extend(str(feature) for feature in detail_features)
+    for offer_id, title, description in offers:
+        yield offer_id, title, description, ' '.join(features.get(offer_id, []))
+
+
+class Match(Lookup):
+    """`document MATCH query` on the FTS5 index."""
+    lookup_name = 'match'
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f"{lhs} MATCH {rhs}", [*lhs_params, *rhs_params]
+
+
+OfferSearchIndex._meta.get_field('document').register_lookup(Match)
+
+
+class BM25(Func):
+    """FTS5 bm25() rank of the matched row, lower is better."""
+    function = 'bm25'
+    output_field = models.FloatField()
+
+
+class LikeSearchBackend:
+    """
+    Fallback backend with the former SearchFilter behaviour (icontains on
+    title and description), used on databases without a full-text engine.
+    """
+
+    def search(self, queryset, term, rank=True):
+        for token in search_tokens(term):
+            queryset = queryset.filter(models.Q(title__icontains=token) | models.Q(description__icontains=token))
+        return queryset
+
+    def index_offers(self, offer_ids):
+        pass
+
+    def remove_offers(self, offer_ids):
+        pass
+
+    def rebuild(self):
+        return 0
+
+
+class SQLiteSearchBackend(LikeSearchBackend):
+    """
+    SQLite FTS5 backend. Offers are mirrored into the FTS_TABLE virtual table
+    (rowid = offer id) and ranked with bm25, title weighted highest.
+    """
+
+    def match_expression(self, term):
+        return ' '.join(f'"{token}"*' for token in search_tokens(term))
+
+    def search(self, queryset, term, rank=True):
+        match = self.match_expression(term)
+        if not match:
+            return queryset
+        # One join against the index, so MATCH runs once per query; the rank
+        # is only computed where the queryset is ordered by it (not in counts).
+        queryset = queryset.filter(search_index__document__match=match)
+        if not rank:
+            return queryset
+        return queryset.annotate(
+            search_rank=BM25(F('search_index__document'), *(Value(weight) for weight in FTS_COLUMN_WEIGHTS))
+        ).order_by('search_rank', '-created_at')
+
+    def index_offers(self, offer_ids):
+        offer_ids = list(offer_ids)
+        if not offer_ids:
+            return
+        self.remove_offers(offer_ids)
+        self.insert(offer_documents(offer_ids))
+
+    def remove_offers(self, offer_ids):
+        offer_ids = list(offer_ids)
+        if not offer_ids:
+            return
+        placeholders = ', '.join(['%s'] * len(offer_ids))
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid IN ({placeholders})", offer_ids)
+
+    def insert(self, documents):
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f"INSERT INTO {FTS_TABLE} (rowid, title, description, features) VALUES (%s, %s, %s, %s)",
+                list(documents)
+            )
+
+    def rebuild(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {FTS_TABLE}")
+        documents = list(offer_documents())
+        self.insert(documents)
+        return len(documents)
+
+
+def offer_search_vector():
+    """
+    Weighted tsvector over the offer title and description. Migration 0013
+    builds the GIN index PG_SEARCH_INDEX on this expression, so both must
+    stay the same for the match to use the index.
+    """
+    from django.contrib.postgres.search import SearchVector
+    return (
+        SearchVector('title', weight='A', config=PG_SEARCH_CONFIG)
+        + SearchVector('description', weight='B', config=PG_SEARCH_CONFIG)
+    )
+
+
+class PostgresSearchBackend(LikeSearchBackend):
+    """
+    PostgreSQL backend on tsvector/tsquery. The vector is computed from the
+    offer columns, so no index table has to be kept in sync; the GIN index
+    PG_SEARCH_INDEX on the same expression makes the match use the index.
+    """
+
+    def search(self, queryset, term, rank=True):
+        from django.contrib.postgres.search import SearchQuery, SearchRank
+        tokens = search_tokens(term)
+        if not tokens:
+            return queryset
+        vector = offer_search_vector()
+        query = SearchQuery(
+            ' & '.join(f"{token}:*" for token in tokens), search_type='raw', config=PG_SEARCH_CONFIG
+        )
+        queryset = queryset.annotate(search_vector=vector).filter(search_vector=query)
+        if not rank:
+            return queryset
+        return queryset.annotate(search_rank=SearchRank(vector, query)).order_by('-search_rank', '-created_at')
+
+
+SEARCH_BACKENDS = {
+    'sqlite': SQLiteSearchBackend,
+    'postgresql': PostgresSearchBackend,
+}
+
+
+def get_search_backend():
+    """Search backend matching the vendor of the default database."""
+    return SEARCH_BACKENDS.get(connection.vendor, LikeSearchBackend)()
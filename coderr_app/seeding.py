@@ -0,0 +1,115 @@
+from decimal import Decimal
+from django.contrib.auth.models import User
+from user_auth_app.models import UserProfile
+from coderr_app.models import Offer, OfferDetail, Order, Review
+from coderr_app.search import get_search_backend
+from coderr_app.stats import rebuild_business_ratings
+
+
+OFFER_TIERS = [
+    ('basic', Decimal('50.00'), 7),
+    ('standard', Decimal('100.00'), 5),
+    ('premium', Decimal('200.00'), 3),
+]
+
+
+def create_users(prefix, count, user_type):
+    """Create `count` users with a profile of the given type in bulk."""
+    users = User.objects.bulk_create([
+        User(username=f"{prefix}{i}", email=f"{prefix}{i}@example.com",
+             first_name=prefix.capitalize(), last_name=str(i))
+        for i in range(count)
+    ])
+    UserProfile.objects.bulk_create([UserProfile(user=user, type=user_type) for user in users])
+    return users
+
+
+def seed_offers(users, offers_per_user):
+    """Create offers with the three standard tiers for every given user."""
+    offers = Offer.objects.bulk_create([
+        Offer(
+            user=user,
+            title=f"Offer {n} by {user.username}",
+            description=f"Description of offer {n} by {user.username}",
+            min_price=OFFER_TIERS[0][1] + n,
+            min_delivery_time=OFFER_TIERS[-1][2],
+        )
+        for user in users
+        for n in range(offers_per_user)
+    ])
+    OfferDetail.objects.bulk_create([
+        OfferDetail(
+            offer=offer,
+            title=f"{offer_type.capitalize()} package",
+            revisions=index + 1,
+            delivery_time_in_days=delivery_time,
+            price=offer.min_price + price - OFFER_TIERS[0][1],
+            features=[f"Feature {index + 1}"],
+            offer_type=offer_type,
+        )
+        for offer in offers
+        for index, (offer_type, price, delivery_time) in enumerate(OFFER_TIERS)
+    ])
+    get_search_backend().index_offers(offer.id for offer in offers)
+    return offers
+
+
+def seed_orders(customers, offer_details, status='in_progress'):
+    """Create one order per customer for each of the given offer details."""
+    return Order.objects.bulk_create([
+        Order(customer=customer, offer_detail=offer_detail, status=status)
+        for customer in customers
+        for offer_detail in offer_details
+    ])
+
+
+def seed_reviews(business_users, customers, per_customer):
+    """Create `per_customer` reviews per customer, spread over the business users."""
+    if not business_users:
+        return []
+    reviews = Review.objects.bulk_create([
+        Review(
+            business_user=business_users[(index * per_customer + n) % len(business_users)],
+            reviewer=customer,
+            rating=(index + n) % 5 + 1,
+            description=f"Review {n} by {customer.username}",
+        )
+        for index, customer in enumerate(customers)
+        for n in range(min(per_customer, len(business_users)))
+    ])
+    rebuild_business_ratings()
+    return reviews
+
+
+def seed_dataset(business_count, customer_count, offers_per_business, orders_per_customer, reviews_per_customer,
+                 prefix='seed'):
+    """
+    Seed a marketplace: business and customer users, offers with three tiers,
+    orders spread round-robin over the tiers and reviews of the businesses.
+    """
+    businesses = create_users(f"{prefix}_business_", business_count, 'business')
+    customers = create_users(f"{prefix}_customer_", customer_count, 'customer')
+    offers = seed_offers(businesses, offers_per_business)
+    details = []
+    if offers:
+        details = list(OfferDetail.objects.filter(offer__id__range=(offers[0].id, offers[-1].id)).order_by('id'))
+    orders = []
+    if details:
+        statuses = [status for status, _ in Order.STATUS_CHOICES]
+        orders = Order.objects.bulk_create([
+            Order(
+                customer=customer,
+                offer_detail=details[(index * orders_per_customer + n) % len(details)],
+                status=statuses[(index + n) % len(statuses)],
+            )
+            for index, customer in enumerate(customers)
+            for n in range(orders_per_customer)
+        ])
+    reviews = seed_reviews(businesses, customers, reviews_per_customer)
+    return {
+        'business_users': businesses,
+        'customers': customers,
+        'offers': offers,
+        'orders': orders,
+        'reviews': reviews,
+    }
@@ -0,0 +1,141 @@
+from django.contrib.auth.models import User
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+from user_auth_app.models import UserProfile
+from coderr_app.models import Offer, OfferDetail, Order, Review
+from coderr_app.response_cache import offer_list_cache
+from coderr_app.search import get_search_backend
+from coderr_app.stats import (
+    adjust_order_count, adjust_stat, deleted_order_business_user_id, order_business_user_id,
+)
+
+
+@receiver(pre_save, sender=Review)
+def remember_review_rating(sender, instance, **kwargs):
+    """Keep the stored rating so an update can apply the difference."""
+    instance._stats_previous_rating = None
+    if instance.pk:
+        instance._stats_previous_rating = (
+            Review.objects.filter(pk=instance.pk).values_list('rating', flat=True).first()
+        )
+
+
+@receiver(post_save, sender=Review)
+def count_saved_review(sender, instance, created, **kwargs):
+    if created:
+        adjust_stat('review_count', 1)
+        adjust_stat('rating_sum', instance.rating)
+    elif instance._stats_previous_rating is not None:
+        adjust_stat('rating_sum', instance.rating - instance._stats_previous_rating)
+
+
+@receiver(post_delete, sender=Review)
+def count_deleted_review(sender, instance, **kwargs):
+    adjust_stat('review_count', -1)
+    adjust_stat('rating_sum', -instance.rating)
+
+
+@receiver(post_save, sender=Offer)
+def count_saved_offer(sender, instance, created, **kwargs):
+    if created:
+        adjust_stat('offer_count', 1)
+
+
+@receiver(post_delete, sender=Offer)
+def count_deleted_offer(sender, instance, **kwargs):
+    adjust_stat('offer_count', -1)
+
+
+@receiver(post_save, sender=Offer)
+def index_saved_offer(sender, instance, **kwargs):
+    get_search_backend().index_offers([instance.pk])
+
+
+@receiver(post_delete, sender=Offer)
+def unindex_deleted_offer(sender, instance, **kwargs):
+    get_search_backend().remove_offers([instance.pk])
+
+
+@receiver(post_save, sender=OfferDetail)
+@receiver(post_delete, sender=OfferDetail)
+def index_offer_features(sender, instance, **kwargs):
+    get_search_backend().index_offers([instance.offer_id])
+
+
+@receiver(post_save, sender=Offer)
+@receiver(post_delete, sender=Offer)
+def invalidate_offer_lists(sender, instance, **kwargs):
+    offer_list_cache.bump([instance.user_id])
+
+
+@receiver(post_save, sender=OfferDetail)
+@receiver(post_delete, sender=OfferDetail)
+def invalidate_offer_lists_of_detail(sender, instance, **kwargs):
+    user_id = instance.offer.user_id if type(instance).offer.is_cached(instance) else (
+        Offer.objects.filter(pk=instance.offer_id).values_list('user_id', flat=True).first()
+    )
+    offer_list_cache.bump([user_id] if user_id else [])
+
+
+@receiver(post_save, sender=User)
+def invalidate_offer_lists_of_user(sender, instance, update_fields=None, **kwargs):
+    """Offer lists embed the creator's names; logins only touch last_login."""
+    if update_fields is not None and set(update_fields) == {'last_login'}:
+        return
+    if Offer.objects.filter(user_id=instance.pk).exists():
+        offer_list_cache.bump([instance.pk])
+
+
+@receiver(pre_save, sender=UserProfile)
+def remember_profile_type(sender, instance, **kwargs):
+    """Keep the stored type so a type change moves the business count."""
+    instance._stats_previous_type = None
+    if instance.pk:
+        instance._stats_previous_type = (
+            UserProfile.objects.filter(pk=instance.pk).values_list('type', flat=True).first()
+        )
+
+
+@receiver(post_save, sender=UserProfile)
+def count_saved_profile(sender, instance, created, **kwargs):
+    was_business = not created and instance._stats_previous_type == 'business'
+    is_business = instance.type == 'business'
+    adjust_stat('business_profile_count', int(is_business) - int(was_business))
+
+
+@receiver(post_delete, sender=UserProfile)
+def count_deleted_profile(sender, instance, **kwargs):
+    if instance.type == 'business':
+        adjust_stat('business_profile_count', -1)
+
+
+@receiver(pre_save, sender=Order)
+def remember_order_status(sender, instance, **kwargs):
+    """Keep the stored status so a status change moves between counters."""
+    instance._counts_previous_status = None
+    if instance.pk:
+        instance._counts_previous_status = (
+            Order.objects.filter(pk=instance.pk).values_list('status', flat=True).first()
+        )
+
+
+@receiver(post_save, sender=Order)
+def count_saved_order(sender, instance, created, **kwargs):
+    previous_status = instance._counts_previous_status
+    if not created and previous_status == instance.status:
+        return
+    business_user_id = order_business_user_id(instance)
+    if not created:
+        adjust_order_count(business_user_id, previous_status, -1)
+    adjust_order_count(business_user_id, instance.status, 1)
+
+
+@receiver(pre_delete, sender=Order)
+def remember_order_business_user(sender, instance, origin=None, **kwargs):
+    """Resolve the business user while the offer rows still exist, once per cascade."""
+    instance._counts_business_user_id = deleted_order_business_user_id(instance, origin)
+
+
+@receiver(post_delete, sender=Order)
+def count_deleted_order(sender, instance, **kwargs):
+    adjust_order_count(instance._counts_business_user_id, instance.status, -1)
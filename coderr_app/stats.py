@@ -0,0 +1,237 @@
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.db import IntegrityError, models, transaction
+from django.db.models.functions import Greatest
+from django.utils import timezone
+from core.db_routing import read_from_primary
+from user_auth_app.models import UserProfile
+from coderr_app.models import BusinessOrderCount, Offer, OfferDetail, Order, Review
+
+
+STATS_CACHE_ALIAS = 'default'
+STATS_KEY_PREFIX = 'coderr:stats:'
+STATS_FIELDS = ('review_count', 'rating_sum', 'business_profile_count', 'offer_count')
+
+
+def _cache():
+    return caches[STATS_CACHE_ALIAS]
+
+
+def _key(field):
+    return f"{STATS_KEY_PREFIX}{field}"
+
+
+def compute_stats():
+    """Compute the platform counters from scratch with full-table aggregates."""
+    reviews = Review.objects.aggregate(count=models.Count('id'), rating_sum=models.Sum('rating'))
+    return {
+        'review_count': reviews['count'],
+        'rating_sum': reviews['rating_sum'] or 0,
+        'business_profile_count': UserProfile.objects.filter(type='business').count(),
+        'offer_count': Offer.objects.count(),
+    }
+
+
+def rebuild_stats():
+    """
+    Recompute the counters from the primary, so a lagging replica's counts
+    are not kept, and cache them for STATS_CACHE_TIMEOUT seconds.
+    """
+    read_from_primary()
+    stats = compute_stats()
+    _cache().set_many(
+        {_key(field): value for field, value in stats.items()},
+        timeout=getattr(settings, 'STATS_CACHE_TIMEOUT', 60),
+    )
+    return stats
+
+
+def clear_stats():
+    """Drop the cached counters, so the next read rebuilds them."""
+    _cache().delete_many([_key(field) for field in STATS_FIELDS])
+
+
+def get_stats():
+    """Return the cached counters, rebuilding them if any key is missing."""
+    keys = [_key(field) for field in STATS_FIELDS]
+    cached = _cache().get_many(keys)
+    if len(cached) != len(keys):
+        return rebuild_stats()
+    return {field: cached[_key(field)] for field in STATS_FIELDS}
+
+
+async def aget_stats():
+    """get_stats() for async views; the rare rebuild runs in a thread."""
+    keys = [_key(field) for field in STATS_FIELDS]
+    cached = await _cache().aget_many(keys)
+    if len(cached) != len(keys):
+        return await sync_to_async(rebuild_stats)()
+    return {field: cached[_key(field)] for field in STATS_FIELDS}
+
+
+def average_rating(stats):
+    """Average rating rounded to one decimal, 0 if there are no reviews."""
+    if not stats['review_count']:
+        return 0
+    return round(stats['rating_sum'] / stats['review_count'], 1)
+
+
+def moved(field, delta):
+    """Expression moving a counter column by `delta`, never below 0 should it have drifted."""
+    if delta < 0:
+        return Greatest(models.F(field) + delta, 0)
+    return models.F(field) + delta
+
+
+def adjust_stat(field, delta):
+    """
+    Apply a delta to a counter once the current transaction commits.
+    A missing key is left alone, the next read rebuilds it from the database,
+    and so is a counter that drifted below 0.
+    Only the cache this process sees is adjusted; with a per-process cache
+    the other workers catch up when their counters expire.
+    """
+    if not delta:
+        return
+
+    def apply():
+        try:
+            if _cache().incr(_key(field), delta) < 0:
+                _cache().delete(_key(field))
+        except ValueError:
+            pass
+
+    transaction.on_commit(apply)
+
+
+def order_business_user_id(order):
+    """Id of the business user owning the offer an order was placed on."""
+    if order.offer_detail_id is None:
+        return None
+    if Order.offer_detail.is_cached(order):
+        offer_detail = order.offer_detail
+        if type(offer_detail).offer.is_cached(offer_detail):
+            return offer_detail.offer.user_id
+    return Offer.objects.filter(details__id=order.offer_detail_id).values_list('user_id', flat=True).first()
+
+
+def cascade_order_filter(origin):
+    """Orders a delete of `origin` cascades to, or None when unknown."""
+    if isinstance(origin, User):
+        return models.Q(customer=origin) | models.Q(offer_detail__offer__user=origin)
+    if isinstance(origin, Offer):
+        return models.Q(offer_detail__offer=origin)
+    if isinstance(origin, OfferDetail):
+        return models.Q(offer_detail=origin)
+    if isinstance(origin, models.QuerySet) and origin.model is Order:
+        return models.Q(pk__in=origin.values('pk'))
+    return None
+
+
+def deleted_order_business_user_id(order, origin):
+    """
+    order_business_user_id for an order about to be deleted. The business
+    users of all orders a cascade from `origin` removes are looked up with
+    one query on the first order and kept on the origin for the others.
+    """
+    order_filter = cascade_order_filter(origin)
+    if order_filter is None:
+        return order_business_user_id(order)
+    business_users = getattr(origin, '_order_business_users', None)
+    if business_users is None:
+        business_users = dict(
+            Order.objects.filter(order_filter).values_list('pk', 'offer_detail__offer__user_id')
+        )
+        origin._order_business_users = business_users
+    if order.pk in business_users:
+        return business_users[order.pk]
+    return order_business_user_id(order)
+
+
+def adjust_order_count(business_user_id, order_status, delta):
+    """
+    Move the per-status order counter of a business user by `delta` inside
+    the current transaction. Statuses without a counter are ignored, and so
+    are decrements without a counter row (e.g. the business user is being
+    deleted and the cascade already removed it).
+    """
+    if business_user_id is None or order_status not in BusinessOrderCount.STATUS_FIELDS or not delta:
+        return
+    counters = BusinessOrderCount.objects.filter(business_user_id=business_user_id)
+    change = {order_status: moved(order_status, delta)}
+    if counters.update(**change) or delta < 0:
+        return
+    try:
+        with transaction.atomic():
+            BusinessOrderCount.objects.create(business_user_id=business_user_id, **{order_status: max(delta, 0)})
+    except IntegrityError:
+        counters.update(**change)
+
+
+def rebuild_order_counts():
+    """Recompute every business order counter with one grouped aggregate."""
+    rows = Order.objects.values('offer_detail__offer__user').annotate(**{
+        order_status: models.Count('id', filter=models.Q(status=order_status))
+        for order_status in BusinessOrderCount.STATUS_FIELDS
+    })
+    with transaction.atomic():
+        BusinessOrderCount.objects.all().delete()
+        BusinessOrderCount.objects.bulk_create([
+            BusinessOrderCount(
+                business_user_id=row['offer_detail__offer__user'],
+                **{order_status: row[order_status] for order_status in BusinessOrderCount.STATUS_FIELDS}
+            )
+            for row in rows
+        ])
+    return len(rows)
+
+
+def adjust_business_rating(business_user_id, added=None, removed=None, reviewed_at=None):
+    """
+    Move the rating aggregates on a business profile for one review rating
+    added and/or removed (an edit passes both) inside the current transaction.
+    `reviewed_at` advances last_review_at; a removal recomputes it from the
+    remaining reviews.
+    """
+    if added == removed and reviewed_at is None:
+        return
+    fields = UserProfile.RATING_HISTOGRAM_FIELDS
+    change = {'updated_at': timezone.now()}
+    count_delta = (added is not None) - (removed is not None)
+    if count_delta:
+        change['rating_count'] = moved('rating_count', count_delta)
+    if added != removed:
+        change['rating_sum'] = moved('rating_sum', (added or 0) - (removed or 0))
+        # Ratings outside 1..5 from before the serializer validated them have no histogram bucket.
+        if added in fields:
+            change[fields[added]] = models.F(fields[added]) + 1
+        if removed in fields:
+            change[fields[removed]] = moved(fields[removed], -1)
+    if reviewed_at is not None:
+        change['last_review_at'] = reviewed_at
+    elif removed is not None and added is None:
+        change['last_review_at'] = models.Subquery(
+            Review.objects.filter(business_user_id=business_user_id).order_by('-created_at').values('created_at')[:1]
+        )
+    UserProfile.objects.filter(user_id=business_user_id).update(**change)
+
+
+def rebuild_business_ratings():
+    """Recompute the rating aggregates of every business profile with one grouped aggregate."""
+    fields = UserProfile.RATING_HISTOGRAM_FIELDS
+    rows = Review.objects.values('business_user').annotate(
+        rating_count=models.Count('id'),
+        rating_sum=models.Sum('rating'),
+        last_review_at=models.Max('created_at'),
+        **{field: models.Count('id', filter=models.Q(rating=rating)) for rating, field in fields.items()}
+    )
+    with transaction.atomic():
+        UserProfile.objects.update(
+            rating_count=0, rating_sum=0, last_review_at=None, updated_at=timezone.now(),
+            **{field: 0 for field in fields.values()}
+        )
+        for row in rows:
+            UserProfile.objects.filter(user_id=row.pop('business_user')).update(**row)
+    return len(rows)
@@ -1,3 +1,1201 @@
-from django.test import TestCase
+import json
+import os
+import sqlite3
+import statistics
+import tempfile
+import time
+from contextlib import closing
+from datetime import date, datetime, timezone as dt_timezone
+from decimal import Decimal
+from importlib import import_module
+from io import BytesIO, StringIO
+from unittest import mock
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache, caches
+from django.core.cache.backends.db import DatabaseCache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection, router
+from django.test import AsyncClient, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve, reverse
+from django.utils import timezone
+from django.utils.translation import gettext_lazy
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.permissions import AllowAny
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient, APIRequestFactory
+from rest_framework.views import APIView
+from core.db_routing import (
+    STICKY_COOKIE, ReplicaMiddleware, ReplicaRouter, RoutingState, copy_sqlite_database, current_routing, replica_health,
+    replica_lag,
+)
+from core.performance import Profile, registry as performance_registry
+from core.renderers import FastJSONParser, FastJSONRenderer
+from coderr_app.api.fast_serializers import OfferValuesSerializer, OrderValuesSerializer, ReviewValuesSerializer
+from coderr_app.api.serializers import OfferSerializer, OrderSerializer, ReviewSerializer
+from coderr_app.api.views import BaseInfoView, OfferListView, order_queryset
+from coderr_app.api.async_views import AsyncReadView
+from coderr_app.benchmarking import async_read_views
+from coderr_app.models import BusinessOrderCount, Offer, OfferDetail, Order, Review
+from coderr_app.response_cache import OFFER_LIST_CACHE_ALIAS, offer_list_cache
+from coderr_app.search import PG_SEARCH_INDEX, offer_search_vector
+from coderr_app.seeding import create_users, seed_dataset, seed_offers, seed_orders, seed_reviews
+from coderr_app.stats import get_stats, rebuild_business_ratings, rebuild_order_counts
+from user_auth_app.models import UserProfile
 
-# Create your tests here.
+
+class OfferQueryBudgetTests(TestCase):
+    """
+    Regression benchmark for the offer endpoints: the number of queries per
+    request must not grow with the page size and p95 latency must stay
+    within budget on a catalog of a few thousand offers.
+    """
+    BUSINESS_USERS = 20
+    OFFERS_PER_USER = 100
+    LIST_QUERY_BUDGET = 3
+    DETAIL_QUERY_BUDGET = 2
+    P95_BUDGET_SECONDS = 0.5
+    SAMPLES = 20
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = create_users('business', cls.BUSINESS_USERS, 'business')
+        cls.offers = seed_offers(cls.users, cls.OFFERS_PER_USER)
+
+    def setUp(self):
+        caches[OFFER_LIST_CACHE_ALIAS].clear()
+        self.client = APIClient()
+
+    def p95(self, timings):
+        return statistics.quantiles(timings, n=20)[-1]
+
+    def test_offer_list_query_count_is_constant(self):
+        for page_size in (10, 50, 100):
+            with self.assertNumQueries(self.LIST_QUERY_BUDGET):
+                response = self.client.get(reverse('offer-list'), {'page_size': page_size})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(len(response.data['results']), page_size)
+
+    def test_offer_detail_query_count_is_constant(self):
+        self.client.force_authenticate(self.users[0])
+        with self.assertNumQueries(self.DETAIL_QUERY_BUDGET):
+            response = self.client.get(reverse('offer-detail', args=[self.offers[0].id]))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['details']), 3)
+
+    def test_offer_list_p95_latency(self):
+        timings = []
+        for _ in range(self.SAMPLES):
+            start = time.perf_counter()
+            response = self.client.get(reverse('offer-list'), {'page_size': 100})
+            timings.append(time.perf_counter() - start)
+            self.assertEqual(response.status_code, 200)
+        self.assertLess(self.p95(timings), self.P95_BUDGET_SECONDS)
+
+
+class OrderQueryBudgetTests(TestCase):
+    """
+    Order list and detail must load the offer detail/offer chain in one join.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.business = create_users('seller', 1, 'business')[0]
+        cls.customer = create_users('buyer', 1, 'customer')[0]
+        offers = seed_offers([cls.business], 10)
+        cls.orders = seed_orders([cls.customer], OfferDetail.objects.filter(offer__in=offers))
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def test_order_list_is_paginated_with_constant_queries(self):
+        for user in (self.customer, self.business):
+            self.client.force_authenticate(user)
+            with self.assertNumQueries(2):
+                response = self.client.get(reverse('order-list'), {'page_size': 20})
+            self.assertEqual(response.data['count'], 30)
+            self.assertEqual(len(response.data['results']), 20)
+            self.assertEqual(response.data['results'][0]['business_user'], self.business.id)
+
+    def test_order_detail_uses_single_query(self):
+        self.client.force_authenticate(self.customer)
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('order-detail', args=[self.orders[0].id]))
+        self.assertEqual(response.data['customer_user'], self.customer.id)
+        self.assertEqual(response.data['price'], '50.00')
+
+    def test_business_owner_can_update_status(self):
+        self.client.force_authenticate(self.business)
+        response = self.client.patch(
+            reverse('order-detail', args=[self.orders[0].id]), {'status': 'completed'}, format='json'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['status'], 'completed')
+
+
+class BaseInfoStatsTests(TestCase):
+    """
+    /api/base-info/ is served from incrementally maintained counters.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.business = create_users('seller', 2, 'business')
+        cls.customer = create_users('buyer', 1, 'customer')[0]
+        seed_offers(cls.business, 3)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def test_counters_follow_writes_without_aggregates(self):
+        self.client.get(reverse('base-info'))
+        with self.captureOnCommitCallbacks(execute=True):
+            review = Review.objects.create(
+                business_user=self.business[0], reviewer=self.customer, rating=4, description='ok'
+            )
+            Review.objects.create(
+                business_user=self.business[1], reviewer=self.customer, rating=5, description='good'
+            )
+        with self.captureOnCommitCallbacks(execute=True):
+            review.rating = 1
+            review.save()
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('base-info'))
+        self.assertEqual(response.data, {
+            'review_count': 2, 'average_rating': 3.0, 'business_profile_count': 2, 'offer_count': 6,
+        })
+        with self.captureOnCommitCallbacks(execute=True):
+            review.delete()
+            self.business[1].offers.first().delete()
+        response = self.client.get(reverse('base-info'))
+        self.assertEqual(response.data['review_count'], 1)
+        self.assertEqual(response.data['average_rating'], 5.0)
+        self.assertEqual(response.data['offer_count'], 5)
+
+
+    @override_settings(STATS_CACHE_TIMEOUT=60)
+    def test_counters_are_recomputed_after_the_timeout(self):
+        self.assertEqual(get_stats()['offer_count'], 6)
+        # Another worker deleted an offer: this process never saw the decrement.
+        cache.incr('coderr:stats:offer_count', 1)
+        self.assertEqual(get_stats()['offer_count'], 7)
+        with mock.patch('django.core.cache.backends.locmem.time.time', return_value=time.time() + 61):
+            self.assertEqual(get_stats()['offer_count'], 6)
+
+
+class BusinessOrderCountTests(TestCase):
+    """
+    Order count endpoints read the per-business counters kept by the order writes.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.business = create_users('seller', 1, 'business')[0]
+        cls.customer = create_users('buyer', 1, 'customer')[0]
+        offer = seed_offers([cls.business], 1)[0]
+        cls.detail_ids = list(offer.details.values_list('id', flat=True))
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def get_counts(self):
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('order-status-count', args=[self.business.id]))
+        return response.data
+
+    def test_counters_follow_order_create_and_status_patch(self):
+        self.client.force_authenticate(self.customer)
+        order_ids = [
+            self.client.post(reverse('order-list'), {'offer_detail_id': detail_id}, format='json').data['id']
+            for detail_id in self.detail_ids
+        ]
+        self.assertEqual(self.get_counts(), {
+            'order_count': 3, 'completed_order_count': 0, 'cancelled_order_count': 0,
+        })
+        self.client.force_authenticate(self.business)
+        self.client.patch(reverse('order-detail', args=[order_ids[0]]), {'status': 'completed'}, format='json')
+        self.client.patch(reverse('order-detail', args=[order_ids[1]]), {'status': 'cancelled'}, format='json')
+        self.assertEqual(self.get_counts(), {
+            'order_count': 1, 'completed_order_count': 1, 'cancelled_order_count': 1,
+        })
+        response = self.client.get(reverse('completed-order-count', args=[self.business.id]))
+        self.assertEqual(response.data, {'completed_order_count': 1})
+
+    def test_rebuild_matches_bulk_inserted_orders(self):
+        seed_orders([self.customer], OfferDetail.objects.filter(id__in=self.detail_ids))
+        rebuild_order_counts()
+        self.client.force_authenticate(self.customer)
+        self.assertEqual(self.get_counts()['order_count'], 3)
+
+    def test_deleting_users_with_orders(self):
+        other = create_users('other-seller', 1, 'business')[0]
+        other_detail = seed_offers([other], 1)[0].details.first()
+        self.client.force_authenticate(self.customer)
+        with self.captureOnCommitCallbacks(execute=True):
+            for detail_id in self.detail_ids + [other_detail.id]:
+                self.client.post(reverse('order-list'), {'offer_detail_id': detail_id}, format='json')
+        business_id = self.business.id
+        with CaptureQueriesContext(connection) as queries:
+            self.business.delete()
+        lookups = [query for query in queries if 'INNER JOIN "coderr_app_offer"' in query['sql']]
+        self.assertEqual(len(lookups), 1)
+        self.assertFalse(BusinessOrderCount.objects.filter(business_user_id=business_id).exists())
+        self.customer.delete()
+        self.assertEqual(BusinessOrderCount.objects.get(business_user=other).in_progress, 0)
+
+    def test_drifted_counters_do_not_fail_deletes(self):
+        self.client.force_authenticate(self.customer)
+        with self.captureOnCommitCallbacks(execute=True):
+            order_id = self.client.post(
+                reverse('order-list'), {'offer_detail_id': self.detail_ids[0]}, format='json'
+            ).data['id']
+        BusinessOrderCount.objects.filter(business_user=self.business).update(in_progress=0)
+        cache.set('coderr:stats:review_count', 0)
+        review = Review.objects.create(business_user=self.business, reviewer=self.customer, rating=4, description='ok')
+        UserProfile.objects.filter(user=self.business).update(rating_count=0, rating_sum=0, rating_4_count=0)
+        with self.captureOnCommitCallbacks(execute=True):
+            Order.objects.get(pk=order_id).delete()
+            self.assertEqual(self.client.delete(reverse('review-detail', args=[review.id])).status_code, 204)
+        self.assertEqual(BusinessOrderCount.objects.get(business_user=self.business).in_progress, 0)
+        profile = UserProfile.objects.get(user=self.business)
+        self.assertEqual((profile.rating_count, profile.rating_sum, profile.rating_4_count), (0, 0, 0))
+        self.assertIsNone(cache.get('coderr:stats:review_count'))
+
+    def test_non_business_user_is_rejected(self):
+        self.client.force_authenticate(self.customer)
+        response = self.client.get(reverse('order-count', args=[self.customer.id]))
+        self.assertEqual(response.status_code, 400)
+
+    def test_business_stats_for_several_businesses_in_one_query(self):
+        other = create_users('other-seller', 1, 'business')[0]
+        seed_orders([self.customer], OfferDetail.objects.filter(id__in=self.detail_ids))
+        Review.objects.create(business_user=self.business, reviewer=self.customer, rating=4, description='Good')
+        rebuild_order_counts()
+        rebuild_business_ratings()
+        self.client.force_authenticate(self.customer)
+        ids = f'{other.id},{self.business.id},{self.customer.id},{self.business.id}'
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('business-stats'), {'business_user_ids': ids})
+        self.assertEqual(response.data, {
+            'results': [
+                {
+                    'business_user_id': other.id, 'order_count': 0, 'completed_order_count': 0,
+                    'cancelled_order_count': 0, 'review_count': 0, 'average_rating': None,
+                },
+                {
+                    'business_user_id': self.business.id, 'order_count': 3, 'completed_order_count': 0,
+                    'cancelled_order_count': 0, 'review_count': 1, 'average_rating': 4.0,
+                },
+            ],
+            'not_found': [self.customer.id],
+        })
+        for ids in ('', 'a,b', ','.join(str(i) for i in range(1, 102))):
+            response = self.client.get(reverse('business-stats'), {'business_user_ids': ids})
+            self.assertEqual(response.status_code, 400)
+
+
+class OfferSearchTests(TestCase):
+    """
+    /api/offers/?search= runs on the full-text index and ranks by relevance.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.business = create_users('seller', 1, 'business')
+        seed_offers(cls.business, 20)
+        cls.in_description = Offer.objects.create(
+            user=cls.business[0], title='Website design', description='Includes a logo sketch'
+        )
+        cls.in_title = Offer.objects.create(
+            user=cls.business[0], title='Logo design', description='Vector artwork'
+        )
+        OfferDetail.objects.create(
+            offer=cls.in_title, title='Basic', delivery_time_in_days=3, price=10,
+            features=['Favicon export'], offer_type='basic'
+        )
+
+    def setUp(self):
+        caches[OFFER_LIST_CACHE_ALIAS].clear()
+
+    def search(self, **params):
+        response = APIClient().get(reverse('offer-list'), params)
+        return [offer['id'] for offer in response.data['results']]
+
+    def test_title_matches_rank_first(self):
+        self.assertEqual(self.search(search='logo'), [self.in_title.id, self.in_description.id])
+
+    def test_prefix_and_feature_matches(self):
+        self.assertEqual(self.search(search='favi'), [self.in_title.id])
+        self.assertEqual(self.search(search='design logos'), [])
+
+    def test_explicit_ordering_wins_over_rank(self):
+        self.assertEqual(
+            self.search(search='logo', ordering='updated_at'), [self.in_description.id, self.in_title.id]
+        )
+
+    def test_deleted_offer_leaves_the_index(self):
+        self.in_title.delete()
+        self.assertEqual(self.search(search='logo'), [self.in_description.id])
+
+    def test_match_runs_once_and_counts_skip_the_rank(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.search(search='logo')
+        searches = [query['sql'] for query in queries.captured_queries if 'MATCH' in query['sql']]
+        self.assertTrue(searches)
+        for sql in searches:
+            self.assertEqual(sql.count('MATCH'), 1)
+            self.assertEqual('bm25' in sql, 'COUNT' not in sql)
+
+    def test_postgres_index_covers_the_search_vector(self):
+        migration = import_module('coderr_app.migrations.0013_offer_search_vector_index')
+        index = migration.search_vector_index()
+        self.assertEqual(index.name, PG_SEARCH_INDEX)
+        self.assertEqual(index.expressions, (offer_search_vector(),))
+
+
+class KeysetPaginationTests(TestCase):
+    """
+    ?cursor= walks offers and reviews without COUNT or OFFSET.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.business = create_users('seller', 3, 'business')
+        cls.customers = create_users('buyer', 5, 'customer')
+        seed_offers(cls.business, 9)
+        Review.objects.bulk_create([
+            Review(business_user=business, reviewer=customer, rating=(i % 5) + 1, description='review')
+            for i, (business, customer) in enumerate(
+                (business, customer) for business in cls.business for customer in cls.customers
+            )
+        ])
+
+    def setUp(self):
+        caches[OFFER_LIST_CACHE_ALIAS].clear()
+
+    def walk(self, url, params):
+        ids, pages = [], 0
+        response = APIClient().get(url, params)
+        while True:
+            pages += 1
+            self.assertNotIn('count', response.data)
+            ids.extend(item['id'] for item in response.data['results'])
+            if not response.data['next']:
+                return ids, pages
+            response = APIClient().get(response.data['next'])
+
+    def test_offer_cursor_follows_each_ordering(self):
+        for ordering, expected_order in (
+            ('', ('-created_at', '-id')),
+            ('min_price', ('min_price', 'id')),
+            ('-min_price', ('-min_price', '-id')),
+            ('updated_at', ('updated_at', 'id')),
+        ):
+            ids, pages = self.walk(reverse('offer-list'), {'cursor': '', 'page_size': 4, 'ordering': ordering})
+            self.assertEqual(ids, list(Offer.objects.order_by(*expected_order).values_list('id', flat=True)))
+            self.assertEqual(pages, 7)
+
+    def test_next_page_runs_no_count_query(self):
+        response = APIClient().get(reverse('offer-list'), {'cursor': '', 'page_size': 20})
+        with self.assertNumQueries(2):
+            response = APIClient().get(response.data['next'])
+        self.assertEqual(len(response.data['results']), 7)
+
+    def test_review_cursor_is_opt_in(self):
+        client = APIClient()
+        client.force_authenticate(self.customers[0])
+        self.assertEqual(len(client.get(reverse('review-list')).data), 15)
+        response = client.get(reverse('review-list'), {'cursor': '', 'page_size': 10, 'ordering': 'rating'})
+        ratings = [review['rating'] for review in response.data['results']]
+        self.assertEqual(ratings, sorted(ratings))
+        response = client.get(response.data['next'])
+        self.assertEqual(len(response.data['results']), 5)
+        self.assertIsNone(response.data['next'])
+
+    def test_invalid_cursor_is_404(self):
+        response = APIClient().get(reverse('offer-list'), {'cursor': 'garbage'})
+        self.assertEqual(response.status_code, 404)
+
+
+class OfferWriteTests(TestCase):
+    """
+    Offer create, patch and batch import write tiers in bulk and compute min values in memory.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.business = create_users('seller', 1, 'business')[0]
+
+    def setUp(self):
+        caches[OFFER_LIST_CACHE_ALIAS].clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.business)
+
+    def offer_payload(self, title, base_price=100):
+        return {
+            'title': title,
+            'description': f'{title} description',
+            'details': [
+                {'title': offer_type, 'revisions': 1, 'delivery_time_in_days': days,
+                 'price': base_price * factor, 'features': [f'{offer_type} feature'], 'offer_type': offer_type}
+                for offer_type, days, factor in (('basic', 7, 1), ('standard', 5, 2), ('premium', 2, 3))
+            ],
+        }
+
+    def test_create_and_patch_offer(self):
+        response = self.client.post(reverse('offer-list'), self.offer_payload('Logo'), format='json')
+        self.assertEqual(response.status_code, 201)
+        offer = Offer.objects.get(id=response.data['id'])
+        self.assertEqual((offer.min_price, offer.min_delivery_time), (100, 2))
+        response = self.client.patch(reverse('offer-detail', args=[offer.id]), {
+            'details': [{'offer_type': 'basic', 'price': 40, 'delivery_time_in_days': 1}],
+        }, format='json')
+        self.assertEqual(response.status_code, 200)
+        basic = next(detail for detail in response.data['details'] if detail['offer_type'] == 'basic')
+        self.assertEqual(basic['price'], '40.00')
+        offer.refresh_from_db()
+        self.assertEqual((offer.min_price, offer.min_delivery_time), (40, 1))
+
+    def test_batch_import(self):
+        payload = [self.offer_payload(f'Batch {n}', base_price=10 + n) for n in range(5)]
+        response = self.client.post(reverse('offer-batch'), payload, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(response.data), 5)
+        self.assertEqual(len(response.data[0]['details']), 3)
+        offers = Offer.objects.filter(user=self.business).order_by('id')
+        self.assertEqual([offer.min_price for offer in offers], [10, 11, 12, 13, 14])
+        search = APIClient().get(reverse('offer-list'), {'search': 'standard batch'})
+        self.assertEqual(search.data['count'], 5)
+
+    def test_batch_rejects_invalid_items(self):
+        payload = [self.offer_payload('Good'), {'title': 'Bad', 'description': 'no tiers', 'details': []}]
+        response = self.client.post(reverse('offer-batch'), payload, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Offer.objects.exists())
+
+
+class ConditionalGetTests(TestCase):
+    """
+    ETag / Last-Modified let polling clients get a 304 without serialization.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.business = create_users('seller', 1, 'business')
+        cls.offers = seed_offers(cls.business, 15)
+
+    def setUp(self):
+        caches[OFFER_LIST_CACHE_ALIAS].clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.business[0])
+
+    def test_offer_list_etag(self):
+        url = reverse('offer-list')
+        etag = self.client.get(url, {'page_size': 5})['ETag']
+        with self.assertNumQueries(0):
+            response = self.client.get(url, {'page_size': 5}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        self.assertNotEqual(self.client.get(url, {'page_size': 6})['ETag'], etag)
+        self.offers[3].delete()
+        self.assertEqual(self.client.get(url, {'page_size': 5}, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_offer_list_etag_follows_creator_renames(self):
+        url = reverse('offer-list')
+        etag = self.client.get(url)['ETag']
+        self.business[0].first_name = 'Renamed'
+        self.business[0].save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['results'][0]['user_details']['first_name'], 'Renamed')
+
+    def test_review_list_filters_once(self):
+        customer = create_users('buyer', 1, 'customer')[0]
+        Review.objects.create(business_user=self.business[0], reviewer=customer, rating=4, description='ok')
+        # Filter value validation, ETag aggregate, page.
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse('review-list'), {'business_user_id': self.business[0].id})
+        self.assertEqual(len(response.data), 1)
+
+    def test_offer_detail_last_modified(self):
+        url = reverse('offer-detail', args=[self.offers[0].id])
+        response = self.client.get(url)
+        with self.assertNumQueries(2):
+            not_modified = self.client.get(url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(not_modified.status_code, 304)
+        self.client.patch(url, {'title': 'Renamed'}, format='json')
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 200)
+
+    def test_profile_detail_etag(self):
+        url = reverse('userprofile-detail', args=[self.business[0].userprofile.pk])
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.client.patch(url, {'location': 'Berlin'}, format='json')
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+class OfferListCacheTests(TestCase):
+    """
+    Offer list responses are cached per normalized query and invalidated by version bumps.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.business = create_users('seller', 2, 'business')
+        cls.offers = seed_offers(cls.business, 3)
+
+    def setUp(self):
+        caches[OFFER_LIST_CACHE_ALIAS].clear()
+        offer_list_cache.reset_metrics()
+        self.client = APIClient()
+
+    def test_repeated_query_is_served_from_cache(self):
+        url = reverse('offer-list')
+        first = self.client.get(url, {'page_size': 2, 'ordering': 'min_price'})
+        with self.assertNumQueries(0):
+            second = self.client.get(url, {'ordering': 'min_price', 'page_size': 2})
+        self.assertEqual(second.data, first.data)
+        self.assertEqual(second['ETag'], first['ETag'])
+        self.assertEqual(offer_list_cache.metrics(), {'hits': 1, 'misses': 1, 'hit_ratio': 0.5})
+
+    def test_writes_invalidate_by_creator(self):
+        url = reverse('offer-list')
+        other_id = self.business[1].id
+        before = self.client.get(url).data['results'][-1]
+        self.client.get(url, {'creator_id': other_id})
+        offer = Offer.objects.get(pk=before['id'])
+        offer.title = 'Renamed'
+        offer.save()
+        with self.assertNumQueries(0):
+            self.client.get(url, {'creator_id': other_id})
+        after = self.client.get(url).data['results'][-1]
+        self.assertEqual((after['id'], after['title']), (before['id'], 'Renamed'))
+        self.assertEqual(offer_list_cache.metrics()['misses'], 3)
+
+    def test_deletion_invalidates(self):
+        url = reverse('offer-list')
+        self.assertEqual(self.client.get(url).data['count'], 6)
+        self.offers[1].delete()
+        self.assertEqual(self.client.get(url).data['count'], 5)
+
+    def test_bump_replaces_the_version_on_the_file_backend(self):
+        with tempfile.TemporaryDirectory() as directory:
+            backend = {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': directory}
+            with override_settings(CACHES={'default': settings.CACHES['default'], OFFER_LIST_CACHE_ALIAS: backend}):
+                creator_id = self.business[0].id
+                versions = (offer_list_cache.get_version(), offer_list_cache.get_version(creator_id))
+                self.assertEqual(offer_list_cache.get_version(), versions[0])
+                offer_list_cache.bump([creator_id])
+                self.assertNotEqual(offer_list_cache.get_version(), versions[0])
+                self.assertNotEqual(offer_list_cache.get_version(creator_id), versions[1])
+                url = reverse('offer-list')
+                self.client.get(url)
+                with self.assertNumQueries(0):
+                    self.client.get(url)
+                self.offers[0].delete()
+                self.assertEqual(self.client.get(url).data['count'], 5)
+
+    def test_bump_is_seen_by_other_workers_on_a_shared_backend(self):
+        backend = {'BACKEND': 'django.core.cache.backends.db.DatabaseCache', 'LOCATION': 'test_offer_list_cache'}
+        with override_settings(CACHES={'default': settings.CACHES['default'], OFFER_LIST_CACHE_ALIAS: backend}):
+            call_command('createcachetable', stdout=StringIO())
+            other_worker = caches.create_connection(OFFER_LIST_CACHE_ALIAS)
+            version = offer_list_cache.get_version()
+            self.assertEqual(other_worker.get(offer_list_cache.version_key()), version)
+            offer_list_cache.bump([self.business[0].id])
+            self.assertNotEqual(other_worker.get(offer_list_cache.version_key()), version)
+            self.assertEqual(other_worker.get(offer_list_cache.version_key()), offer_list_cache.get_version())
+
+    def test_unknown_params_bypass_the_cache(self):
+        self.client.get(reverse('offer-list'), {'format': 'json'})
+        self.client.get(reverse('offer-list'), {'format': 'json'})
+        self.assertEqual(offer_list_cache.metrics()['hits'] + offer_list_cache.metrics()['misses'], 0)
+
+
+class BusinessRatingAggregateTests(TestCase):
+    """
+    Review writes keep the rating aggregates on the business profile current.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.business = create_users('seller', 2, 'business')
+        cls.customers = create_users('buyer', 3, 'customer')
+
+    def review(self, customer, rating, business=None):
+        client = APIClient()
+        client.force_authenticate(customer)
+        response = client.post(reverse('review-list'), {
+            'business_user': (business or self.business[0]).id, 'rating': rating, 'description': 'ok'
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        return client, response.data['id']
+
+    def profile(self, business=None):
+        client = APIClient()
+        client.force_authenticate(self.customers[0])
+        return client.get(reverse('userprofile-detail', args=[(business or self.business[0]).userprofile.pk])).data
+
+    def test_create_update_delete_move_the_aggregates(self):
+        self.review(self.customers[0], 5)
+        client, review_id = self.review(self.customers[1], 2)
+        self.review(self.customers[2], 4, business=self.business[1])
+        profile = self.profile()
+        self.assertEqual((profile['review_count'], profile['average_rating']), (2, 3.5))
+        self.assertEqual(profile['rating_histogram'], {'1': 0, '2': 1, '3': 0, '4': 0, '5': 1})
+        self.assertIsNotNone(profile['last_review_at'])
+
+        client.patch(reverse('review-detail', args=[review_id]), {'rating': 3}, format='json')
+        profile = self.profile()
+        self.assertEqual((profile['review_count'], profile['average_rating']), (2, 4.0))
+        self.assertEqual(profile['rating_histogram'], {'1': 0, '2': 0, '3': 1, '4': 0, '5': 1})
+
+        client.delete(reverse('review-detail', args=[review_id]))
+        profile = self.profile()
+        self.assertEqual((profile['review_count'], profile['rating_histogram']['3']), (1, 0))
+        self.assertEqual(self.profile(self.business[1])['review_count'], 1)
+
+    def test_out_of_range_ratings(self):
+        client = APIClient()
+        client.force_authenticate(self.customers[0])
+        for rating in (0, 7):
+            response = client.post(reverse('review-list'), {
+                'business_user': self.business[0].id, 'rating': rating, 'description': 'ok'
+            }, format='json')
+            self.assertEqual(response.status_code, 400)
+            self.assertIn('rating', response.data)
+        legacy = Review.objects.create(business_user=self.business[0], reviewer=self.customers[0], rating=7, description='old')
+        rebuild_business_ratings()
+        response = client.patch(reverse('review-detail', args=[legacy.id]), {'rating': 4}, format='json')
+        self.assertEqual(response.status_code, 200)
+        profile = self.profile()
+        self.assertEqual((profile['review_count'], profile['average_rating']), (1, 4.0))
+        self.assertEqual(profile['rating_histogram']['4'], 1)
+        self.assertEqual(client.delete(reverse('review-detail', args=[legacy.id])).status_code, 204)
+        self.assertEqual(self.profile()['review_count'], 0)
+
+    def test_last_review_falls_back_after_delete(self):
+        self.review(self.customers[0], 5)
+        first_review_at = self.profile()['last_review_at']
+        client, review_id = self.review(self.customers[1], 1)
+        self.assertNotEqual(self.profile()['last_review_at'], first_review_at)
+        client.delete(reverse('review-detail', args=[review_id]))
+        self.assertEqual(self.profile()['last_review_at'], first_review_at)
+
+    def test_business_list_matches_rebuild(self):
+        self.review(self.customers[0], 5)
+        self.review(self.customers[1], 3)
+        client = APIClient()
+        client.force_authenticate(self.customers[0])
+        before = {row['user']: row for row in client.get(reverse('userprofile-list-business')).data['results']}
+        rebuild_business_ratings()
+        after = {row['user']: row for row in client.get(reverse('userprofile-list-business')).data['results']}
+        self.assertEqual(before, after)
+        self.assertEqual(after[self.business[0].id]['average_rating'], 4.0)
+        self.assertIsNone(after[self.business[1].id]['average_rating'])
+
+
+class ExportTests(TestCase):
+    """
+    Order and review exports stream the same representation as the list endpoints.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.business = create_users('seller', 2, 'business')
+        cls.customer = create_users('buyer', 1, 'customer')[0]
+        offers = seed_offers(cls.business, 5)
+        seed_orders([cls.customer], OfferDetail.objects.filter(offer__in=offers))
+        seed_reviews(cls.business, [cls.customer], 2)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.customer)
+
+    def content(self, response):
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode()
+
+    def test_order_ndjson_matches_order_list(self):
+        with self.settings(EXPORT_CHUNK_SIZE=7):
+            response = self.client.get(reverse('order-export'))
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        rows = [json.loads(line) for line in self.content(response).splitlines()]
+        listed = self.client.get(reverse('order-list'), {'page_size': 100}).data['results']
+        self.assertEqual(rows, json.loads(json.dumps(listed)))
+        self.assertEqual(len(rows), 30)
+
+    def test_review_json_matches_review_list(self):
+        business_id = self.business[0].id
+        with self.settings(EXPORT_CHUNK_SIZE=1):
+            response = self.client.get(reverse('review-export'), {'output': 'json', 'business_user_id': business_id})
+        listed = self.client.get(reverse('review-list'), {'business_user_id': business_id}).data
+        self.assertEqual(self.content(response), json.dumps(listed, separators=(',', ':')))
+
+    def test_empty_and_invalid_requests(self):
+        business = APIClient()
+        business.force_authenticate(create_users('idle', 1, 'business')[0])
+        self.assertEqual(self.content(business.get(reverse('order-export'), {'output': 'json'})), '[]')
+        self.assertEqual(self.client.get(reverse('order-export'), {'output': 'xml'}).status_code, 400)
+        self.assertEqual(self.client.get(reverse('review-export'), {'reviewer_id': 'x'}).status_code, 400)
+
+
+class ValuesSerializerTests(TestCase):
+    """
+    The values() serializers of the list endpoints render byte-identical JSON to the model serializers.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.business = create_users('seller', 2, 'business')
+        cls.customer = create_users('buyer', 2, 'customer')
+        offers = seed_offers(cls.business, 3)
+        Offer.objects.filter(pk=offers[0].pk).update(image='offers/logo.png')
+        Offer.objects.create(user=cls.business[0], title='Draft', description='Ünïcode')
+        seed_orders(cls.customer, OfferDetail.objects.filter(offer__in=offers))
+        seed_reviews(cls.business, cls.customer, 2)
+
+    def request(self, path):
+        return Request(APIRequestFactory().get(path))
+
+    def assert_same_json(self, serializer_class, values_serializer_class, queryset, path):
+        context = {'request': self.request(path)}
+        expected = JSONRenderer().render(serializer_class(queryset, many=True, context=context).data)
+        rows = queryset.values(*values_serializer_class.columns())
+        self.assertEqual(JSONRenderer().render(values_serializer_class(context).serialize(rows)), expected)
+
+    def test_offers(self):
+        self.assert_same_json(
+            OfferSerializer, OfferValuesSerializer,
+            Offer.objects.select_related('user').prefetch_related('details'), '/api/offers/'
+        )
+
+    def test_orders(self):
+        self.assert_same_json(OrderSerializer, OrderValuesSerializer, order_queryset(), '/api/orders/')
+
+    def test_reviews(self):
+        self.assert_same_json(ReviewSerializer, ReviewValuesSerializer, Review.objects.all(), '/api/reviews/')
+
+
+class FastJSONTests(TestCase):
+    """
+    FastJSONRenderer/FastJSONParser behave like DRF's JSON classes, with and without orjson.
+    """
+    payload = {
+        'price': Decimal('12.50'),
+        'created_at': timezone.make_aware(datetime(2026, 1, 2, 3, 4, 5, 678901), dt_timezone.utc),
+        'day': date(2026, 1, 2),
+        'label': gettext_lazy('Invalid token.'),
+        'features': ['Logo', 'Ünïcode \u2028 line', '</script>', 'tab\t"quote"'],
+        'histogram': {1: 0, 5: 3},
+        'nested': [{'ok': True, 'none': None, 'rating': 4.5}],
+    }
+
+    def test_renders_like_drf(self):
+        expected = JSONRenderer().render(self.payload)
+        self.assertEqual(FastJSONRenderer().render(self.payload), expected)
+        with mock.patch('core.renderers.orjson', None):
+            self.assertEqual(FastJSONRenderer().render(self.payload), expected)
+        self.assertEqual(
+            FastJSONRenderer().render(self.payload, 'application/json; indent=2'),
+            JSONRenderer().render(self.payload, 'application/json; indent=2'),
+        )
+
+    def test_parses_like_drf(self):
+        body = '{"title": "Ünïcode", "details": [{"price": 10.5, "features": []}]}'.encode()
+        self.assertEqual(FastJSONParser().parse(BytesIO(body)), JSONParser().parse(BytesIO(body)))
+        with self.assertRaises(ParseError):
+            FastJSONParser().parse(BytesIO(b'{"title": NaN}'))
+        with self.assertRaises(ParseError):
+            FastJSONParser().parse(BytesIO(b'{"title": '))
+
+
+@override_settings(PERF_SAMPLE_RATE=1.0, PERF_SERVER_TIMING=True, PERF_DUPLICATE_QUERY_THRESHOLD=3)
+class PerformanceMiddlewareTests(TestCase):
+    """
+    Sampled requests get Server-Timing headers, per-view metrics and N+1 reports.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.business = create_users('seller', 4, 'business')
+        seed_offers(cls.business, 2)
+
+    def setUp(self):
+        caches[OFFER_LIST_CACHE_ALIAS].clear()
+        offer_list_cache.reset_metrics()
+        performance_registry.reset()
+        self.client = APIClient()
+
+    def test_server_timing_and_metrics(self):
+        response = self.client.get(reverse('offer-list'))
+        timing = response['Server-Timing']
+        for name in ('total;dur=', 'db;dur=', 'serialize;dur=', 'render;dur='):
+            self.assertIn(name, timing)
+        stats = performance_registry.snapshot()['OfferListView']
+        self.assertEqual(stats['requests'], 1)
+        self.assertGreater(stats['queries'], 0)
+        self.assertEqual(stats['response_bytes'], len(response.content))
+        self.client.force_login(User.objects.create_user('ops', is_staff=True))
+        metrics = self.client.get(reverse('metrics'))
+        self.assertEqual(metrics.status_code, 200)
+        text = metrics.content.decode()
+        self.assertIn('coderr_view_requests_total{view="OfferListView"} 1', text)
+        self.assertIn('coderr_view_duration_seconds_bucket{view="OfferListView",le="+Inf"} 1', text)
+        self.assertIn('coderr_offer_list_cache_misses_total 1', text)
+
+    def test_metrics_need_staff_or_the_token(self):
+        url = reverse('metrics')
+        self.assertEqual(self.client.get(url, REMOTE_ADDR='127.0.0.1').status_code, 403)
+        self.client.force_login(self.business[0])
+        self.assertEqual(self.client.get(url).status_code, 403)
+        self.client.logout()
+        with override_settings(PERF_METRICS_TOKEN='scrape-secret'):
+            self.assertEqual(self.client.get(url, HTTP_AUTHORIZATION='Bearer wrong').status_code, 403)
+            self.assertEqual(self.client.get(url, HTTP_AUTHORIZATION='Bearer scrape-secret').status_code, 200)
+
+    async def test_async_view_queries_are_counted(self):
+        with async_read_views(True):
+            response = await AsyncClient().get(reverse('offer-list'))
+        self.assertEqual(response.status_code, 200)
+        stats = next(iter(performance_registry.snapshot().values()))
+        self.assertGreater(stats['queries'], 0)
+        self.assertGreater(stats['serialize_seconds'], 0)
+        self.assertGreater(stats['render_seconds'], 0)
+
+    def test_repeated_queries_are_reported_with_stack(self):
+        profile = Profile()
+        with connection.execute_wrapper(profile):
+            for user in self.business:
+                Offer.objects.filter(user_id=user.id).count()
+        self.assertEqual(profile.queries, 4)
+        self.assertEqual(len(profile.duplicates), 1)
+        self.assertIn('"coderr_app_offer"."user_id" = %s', profile.duplicates[0]['sql'])
+        self.assertIn('test_repeated_queries_are_reported_with_stack', profile.duplicates[0]['stack'])
+
+    def test_unsampled_requests_are_not_recorded(self):
+        with override_settings(PERF_SAMPLE_RATE=0.0):
+            response = self.client.get(reverse('offer-list'))
+        self.assertNotIn('Server-Timing', response)
+        self.assertEqual(performance_registry.snapshot(), {})
+
+
+class BenchmarkRunnerTests(TestCase):
+    """
+    run_benchmarks writes a per-endpoint JSON report that can be compared with a baseline.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        seed_dataset(2, 3, 2, 2, 1, prefix='bench')
+
+    def test_report_and_baseline(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'report.json')
+            call_command('run_benchmarks', repeat=3, warmup=0, only=['orders'], output=path, stdout=StringIO())
+            with open(path) as report_file:
+                report = json.load(report_file)
+            self.assertEqual(report['meta']['mode'], 'in-process')
+            self.assertEqual([row['endpoint'] for row in report['results']], ['orders as customer', 'orders as business'])
+            for row in report['results']:
+                self.assertEqual((row['status'], row['requests'], row['queries']), (200, 3, 2))
+                self.assertLessEqual(row['p50_ms'], row['p99_ms'])
+                self.assertGreater(row['peak_alloc_kb'], 0)
+            out = StringIO()
+            call_command('run_benchmarks', repeat=3, warmup=0, only=['orders'], baseline=path, stdout=out)
+            self.assertIn('queries +0', out.getvalue())
+
+
+    def test_cached_endpoints_are_measured_on_the_database(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'report.json')
+            call_command('run_benchmarks', repeat=2, warmup=1, only=['offers', 'base info'], output=path,
+                         stdout=StringIO())
+            with open(path) as report_file:
+                report = json.load(report_file)
+        for row in report['results']:
+            self.assertGreater(row['queries'], 0, row['endpoint'])
+
+
+class SeededRunTests(TestCase):
+    """
+    Benchmarks on a rolled-back seeded dataset leave no cached responses of it behind.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        seed_offers(create_users('seller', 1, 'business'), 2)
+
+    def setUp(self):
+        cache.clear()
+        offer_list_cache.clear()
+
+    def test_seeded_runs_leave_no_cached_responses(self):
+        url = reverse('offer-list')
+        for command, options in (
+            ('run_benchmarks', {'seed': True, 'business': 2, 'customers': 2, 'offers_per_business': 2,
+                                'orders_per_customer': 1, 'reviews_per_customer': 1, 'repeat': 1, 'warmup': 0}),
+            ('explain_endpoints', {'business': 2, 'customers': 2, 'offers_per_business': 2,
+                                   'orders_per_customer': 1, 'reviews_per_customer': 1, 'repeat': 1}),
+        ):
+            self.client.get(url)
+            call_command(command, stdout=StringIO(), **options)
+            self.assertEqual(self.client.get(url).data['count'], Offer.objects.count())
+            self.assertEqual(self.client.get(reverse('base-info')).data['offer_count'], Offer.objects.count())
+
+    def test_explain_reports_the_offer_list_plans(self):
+        out = StringIO()
+        call_command('explain_endpoints', business=2, customers=2, offers_per_business=2, orders_per_customer=1,
+                     reviews_per_customer=1, repeat=2, json=True, stdout=out)
+        report = {row['endpoint']: row for row in json.loads(out.getvalue())['indexed']}
+        for endpoint in ('offers', 'offers search', 'offers cursor', 'base info'):
+            self.assertTrue(report[endpoint]['plans'], endpoint)
+            self.assertTrue(all(plan['plan'] for plan in report[endpoint]['plans']), endpoint)
+
+
+class AsyncReadViewTests(TestCase):
+    """
+    With ASYNC_READ_VIEWS the hot GET endpoints run as async views and answer like the sync views.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.business = create_users('seller', 2, 'business')
+        cls.customer = create_users('buyer', 1, 'customer')[0]
+        cls.offers = seed_offers(cls.business, 3)
+        seed_orders([cls.customer], OfferDetail.objects.filter(offer=cls.offers[0]))
+        seed_reviews(cls.business, [cls.customer], 2)
+        rebuild_order_counts()
+        cls.token = Token.objects.create(user=cls.customer)
+
+    def setUp(self):
+        caches[OFFER_LIST_CACHE_ALIAS].clear()
+        cache.clear()
+        self.enterContext(async_read_views(True))
+        self.headers = {'headers': {'Authorization': f'Token {self.token.key}'}}
+
+    def endpoints(self):
+        business_id = self.business[0].id
+        return [
+            (reverse('offer-list'), {}),
+            (reverse('offer-list'), {'creator_id': business_id, 'page_size': 2, 'page': 2}),
+            (reverse('offer-list'), {'cursor': '', 'ordering': 'min_price', 'page_size': 2}),
+            (reverse('offer-list'), {'search': 'Offer'}),
+            (reverse('offer-detail', args=[self.offers[0].id]), {}),
+            (reverse('review-list'), {'business_user_id': business_id}),
+            (reverse('review-list'), {'cursor': '', 'ordering': '-rating'}),
+            (reverse('order-count', args=[business_id]), {}),
+            (reverse('completed-order-count', args=[business_id]), {}),
+            (reverse('order-status-count', args=[business_id]), {}),
+            (reverse('order-status-count', args=[self.customer.id]), {}),
+            (reverse('base-info'), {}),
+        ]
+
+    def drop_cached_responses(self):
+        """Clear the cached offer lists but keep the version the list ETags include."""
+        versions = offer_list_cache.cache.get_many([offer_list_cache.version_key()])
+        offer_list_cache.clear()
+        offer_list_cache.cache.set_many(versions, timeout=None)
+
+    async def test_async_views_match_the_sync_views(self):
+        for url, params in await sync_to_async(self.endpoints)():
+            with self.subTest(url=url, params=params):
+                self.assertIs(resolve(url).func.view_class, AsyncReadView)
+                response = await self.async_client.get(url, params, **self.headers)
+                await sync_to_async(self.drop_cached_responses)()
+                with async_read_views(False):
+                    self.assertIsNot(resolve(url).func.view_class, AsyncReadView)
+                    expected = await sync_to_async(self.client.get)(url, params, **self.headers)
+                self.assertEqual(response.status_code, expected.status_code)
+                self.assertEqual(response.content, expected.content)
+                self.assertEqual(response.get('ETag'), expected.get('ETag'))
+
+    async def test_authentication_and_conditional_requests(self):
+        url = reverse('review-list')
+        self.assertEqual((await self.async_client.get(url)).status_code, 401)
+        invalid = await self.async_client.get(url, headers={'Authorization': 'Token invalid'})
+        self.assertEqual((invalid.status_code, invalid['WWW-Authenticate']), (401, 'Token'))
+        self.assertEqual(json.loads(invalid.content), {'detail': 'Invalid token.'})
+        first = await self.async_client.get(url, **self.headers)
+        again = await self.async_client.get(url, headers={**self.headers['headers'], 'If-None-Match': first['ETag']})
+        self.assertEqual(again.status_code, 304)
+        missing = await self.async_client.get(reverse('offer-detail', args=[0]), **self.headers)
+        self.assertEqual(missing.status_code, 404)
+
+    def test_writes_go_through_the_sync_view(self):
+        client = APIClient()
+        client.force_authenticate(self.business[0])
+        response = client.patch(
+            reverse('offer-detail', args=[self.offers[0].id]), {'title': 'Renamed'}, format='json'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Offer.objects.get(pk=self.offers[0].id).title, 'Renamed')
+        self.assertEqual(client.options(reverse('offer-list')).status_code, 200)
+
+
+class AsyncBenchmarkTests(TransactionTestCase):
+    """
+    bench_async drives the WSGI and ASGI handlers from concurrent clients; the data is committed for them.
+    """
+
+    def test_every_mode_answers_every_request(self):
+        seed_dataset(2, 2, 2, 1, 1, prefix='bench')
+        rebuild_order_counts()
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'report.json')
+            call_command('bench_async', clients=3, requests=2, client_delay=0, threads=2, output=path, stdout=StringIO())
+            with open(path) as report_file:
+                report = json.load(report_file)
+        self.assertEqual([row['mode'] for row in report['results']], ['wsgi', 'asgi-sync', 'asgi-async'])
+        for row in report['results']:
+            self.assertEqual((row['requests'], row['errors']), (6, 0))
+
+    def test_requires_data(self):
+        with self.assertRaises(CommandError):
+            call_command('bench_async', stdout=StringIO())
+
+
+@override_settings(DATABASE_REPLICAS=['replica1', 'replica2'], REPLICA_MAX_LAG=None)
+class ReplicaRoutingTests(TestCase):
+    """
+    Reads of replica_reads views go to one replica per request; writes, later reads and sticky clients use the primary.
+    """
+
+    class CatalogView(APIView):
+        authentication_classes = []
+        permission_classes = [AllowAny]
+        replica_reads = True
+
+        def get(self, request):
+            return Response({'databases': [router.db_for_read(Offer), router.db_for_read(Offer)]})
+
+        def post(self, request):
+            router.db_for_write(Offer)
+            return Response({'databases': [router.db_for_read(Offer)]})
+
+    def setUp(self):
+        cache.clear()
+        replica_health.reset()
+        self.factory = APIRequestFactory()
+
+    def dispatch(self, request, view_class=None):
+        view = (view_class or self.CatalogView).as_view()
+        middleware = None
+
+        def get_response(request):
+            middleware.process_view(request, view, (), {})
+            return view(request)
+
+        middleware = ReplicaMiddleware(get_response)
+        response = middleware(request)
+        response.render()
+        return response
+
+    def test_reads_use_one_replica_per_request(self):
+        databases = self.dispatch(self.factory.get('/')).data['databases']
+        self.assertIn(databases[0], ['replica1', 'replica2'])
+        self.assertEqual(databases[0], databases[1])
+        self.assertEqual(router.db_for_read(Offer), 'default')
+        self.assertEqual(router.db_for_read(Token), 'default')
+
+    def test_views_without_the_flag_read_the_primary(self):
+        class PrimaryView(self.CatalogView):
+            replica_reads = False
+        self.assertEqual(self.dispatch(self.factory.get('/'), PrimaryView).data['databases'], ['default', 'default'])
+
+    def test_write_pins_the_client_to_the_primary(self):
+        headers = {'HTTP_AUTHORIZATION': 'Token abc'}
+        response = self.dispatch(self.factory.post('/', **headers))
+        self.assertEqual(response.data['databases'], ['default'])
+        self.assertIn(STICKY_COOKIE, response.cookies)
+        self.assertEqual(self.dispatch(self.factory.get('/', **headers)).data['databases'][0], 'default')
+        request = self.factory.get('/')
+        request.COOKIES[STICKY_COOKIE] = response.cookies[STICKY_COOKIE].value
+        self.assertEqual(self.dispatch(request).data['databases'][0], 'default')
+        self.assertNotEqual(self.dispatch(self.factory.get('/')).data['databases'][0], 'default')
+
+    @override_settings(REPLICA_MAX_LAG=5)
+    def test_lagging_replicas_are_skipped(self):
+        with mock.patch('core.db_routing.replica_lag', side_effect=lambda alias: 60 if alias == 'replica1' else 0):
+            with self.assertLogs('core.db_routing', 'WARNING'):
+                self.assertEqual(self.dispatch(self.factory.get('/')).data['databases'][0], 'replica2')
+        replica_health.reset()
+        with mock.patch('core.db_routing.replica_lag', return_value=60):
+            with self.assertLogs('core.db_routing', 'WARNING'):
+                self.assertEqual(self.dispatch(self.factory.get('/')).data['databases'][0], 'default')
+
+    def test_database_cache_entries_are_read_from_the_primary(self):
+        state = RoutingState()
+        state.replica_ok = True
+        token = current_routing.set(state)
+        try:
+            self.assertEqual(router.db_for_read(DatabaseCache('entries', {}).cache_model_class), 'default')
+            self.assertIn(router.db_for_read(Offer), ['replica1', 'replica2'])
+        finally:
+            current_routing.reset(token)
+
+    def read_databases(self, request, view_class):
+        """Databases the reads of one dispatched request went to."""
+        databases = []
+        db_for_read = ReplicaRouter.db_for_read
+
+        def record(router_self, model, **hints):
+            databases.append(db_for_read(router_self, model, **hints))
+            return databases[-1]
+
+        with mock.patch.object(ReplicaRouter, 'db_for_read', record):
+            response = self.dispatch(request, view_class)
+        self.assertEqual(response.status_code, 200)
+        return databases
+
+    def test_offer_list_cache_is_filled_from_the_primary(self):
+        seed_offers(create_users('seller', 1, 'business'), 2)
+        offer_list_cache.cache.clear()
+        request = lambda: self.factory.get(reverse('offer-list'))
+        databases = self.read_databases(request(), OfferListView)
+        self.assertTrue(databases)
+        self.assertEqual(set(databases), {'default'})
+        self.assertEqual(self.read_databases(request(), OfferListView), [])
+
+    def test_stats_are_rebuilt_from_the_primary(self):
+        databases = self.read_databases(self.factory.get(reverse('base-info')), BaseInfoView)
+        self.assertTrue(databases)
+        self.assertEqual(set(databases), {'default'})
+        self.assertEqual(self.read_databases(self.factory.get(reverse('base-info')), BaseInfoView), [])
+
+    def test_sqlite_lag_is_the_age_of_a_stale_replica(self):
+        with tempfile.TemporaryDirectory() as directory:
+            paths = {alias: os.path.join(directory, f'{alias}.sqlite3') for alias in ('default', 'replica1')}
+            fake_connections = {}
+            for alias, path in paths.items():
+                open(path, 'wb').close()
+                fake_connections[alias] = mock.Mock(
+                    vendor='sqlite', settings_dict={'NAME': path}, **{'is_in_memory_db.return_value': False}
+                )
+            now = time.time()
+            # Synced an hour ago, the primary written once since.
+            os.utime(paths['replica1'], (now - 3600, now - 3600))
+            os.utime(paths['default'], (now - 10, now - 10))
+            with mock.patch('core.db_routing.connections', fake_connections):
+                self.assertGreaterEqual(replica_lag('replica1'), 3600)
+                os.utime(paths['replica1'], (now, now))
+                self.assertEqual(replica_lag('replica1'), 0.0)
+
+    def test_copy_sqlite_database(self):
+        with tempfile.TemporaryDirectory() as directory:
+            source, target = os.path.join(directory, 'primary.sqlite3'), os.path.join(directory, 'replica.sqlite3')
+            with closing(sqlite3.connect(source)) as primary:
+                primary.execute('CREATE TABLE item (name TEXT)')
+                primary.execute("INSERT INTO item VALUES ('copied')")
+                primary.commit()
+            copy_sqlite_database(source, target)
+            with closing(sqlite3.connect(target)) as replica:
+                self.assertEqual(replica.execute('SELECT name FROM item').fetchall(), [('copied',)])
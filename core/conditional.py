@@ -0,0 +1,139 @@
+"""
+Conditional GET (ETag / Last-Modified) for the REST API views.
+
+Validators are computed from the `updated_at` column: an aggregate (row
+count and latest change) for lists and the loaded object for details, so a
+request that matches is answered with 304 before anything is serialized.
+"""
+import hashlib
+from asgiref.sync import sync_to_async
+from django.db.models import Count, Max
+from django.shortcuts import aget_object_or_404
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from rest_framework.response import Response
+
+
+def make_etag(*parts):
+    """Weak ETag over the given parts."""
+    digest = hashlib.md5('|'.join(str(part) for part in parts).encode(), usedforsecurity=False).hexdigest()
+    return f'W/"{digest}"'
+
+
+def not_modified_response(request, etag=None, last_modified=None):
+    """304/412 response if the request preconditions match the validators, else None."""
+    # HTTP dates have second precision, so compare whole seconds.
+    response = get_conditional_response(
+        request, etag=etag, last_modified=last_modified and int(last_modified.timestamp())
+    )
+    if response is not None and etag:
+        response['ETag'] = etag
+    return response
+
+
+def set_validators(response, etag=None, last_modified=None):
+    """Add ETag and Last-Modified headers to a successful response."""
+    if etag and response.status_code == 200:
+        response['ETag'] = etag
+    if last_modified and response.status_code == 200:
+        response['Last-Modified'] = http_date(last_modified.timestamp())
+    return response
+
+
+class ConditionalGetMixin:
+    """
+    Adds conditional GET to generic list and retrieve views.
+    Lists get an ETag from (URL, row count, latest updated_at) of the filtered
+    queryset, plus list_version() for data the rows' updated_at does not
+    cover. The count is handed to the paginator as `list_count`, so the
+    aggregate replaces its COUNT query, and the filtered queryset to the list
+    as `list_queryset`, so filters run once. Lists send no Last-Modified because
+    deletions do not move it, and cursor pages skip validators altogether
+    since they avoid counting on purpose.
+    Objects get an ETag and Last-Modified from their updated_at.
+    alist() and aretrieve() are the same for async views.
+    """
+    conditional_field = 'updated_at'
+    list_count = None
+    list_queryset = None
+
+    def list_version(self):
+        """Extra part of the list ETag, e.g. a version of related rows the list embeds."""
+        return None
+
+    async def alist_version(self):
+        return self.list_version()
+
+    def list_etag(self, queryset):
+        state = queryset.order_by().aggregate(count=Count('pk'), latest=Max(self.conditional_field))
+        self.list_count = state['count']
+        return make_etag(
+            self.request.get_host(), self.request.get_full_path(), state['count'], state['latest'],
+            self.list_version()
+        )
+
+    async def afilter_queryset(self, queryset):
+        # Filter fields may validate their values with queries (ModelChoiceFilter).
+        return await sync_to_async(self.filter_queryset)(queryset)
+
+    async def alist_etag(self, queryset):
+        state = await queryset.order_by().aaggregate(count=Count('pk'), latest=Max(self.conditional_field))
+        self.list_count = state['count']
+        return make_etag(
+            self.request.get_host(), self.request.get_full_path(), state['count'], state['latest'],
+            await self.alist_version()
+        )
+
+    def object_etag(self, instance):
+        last_modified = getattr(instance, self.conditional_field)
+        return make_etag(self.request.get_host(), self.request.path, last_modified.isoformat()), last_modified
+
+    def uses_cursor(self, request):
+        cursor_query_param = getattr(self.paginator, 'cursor_query_param', None)
+        return cursor_query_param is not None and cursor_query_param in request.query_params
+
+    def list(self, request, *args, **kwargs):
+        if self.uses_cursor(request):
+            return super().list(request, *args, **kwargs)
+        self.list_queryset = self.filter_queryset(self.get_queryset())
+        etag = self.list_etag(self.list_queryset)
+        not_modified = not_modified_response(request, etag=etag)
+        if not_modified is not None:
+            return not_modified
+        return set_validators(super().list(request, *args, **kwargs), etag=etag)
+
+    def retrieve(self, request, *args, **kwargs):
+        instance = self.get_object()
+        etag, last_modified = self.object_etag(instance)
+        not_modified = not_modified_response(request, etag=etag, last_modified=last_modified)
+        if not_modified is not None:
+            return not_modified
+        serializer = self.get_serializer(instance)
+        return set_validators(Response(serializer.data), etag=etag, last_modified=last_modified)
+
+    async def alist(self, request, *args, **kwargs):
+        if self.uses_cursor(request):
+            return await super().alist(request, *args, **kwargs)
+        self.list_queryset = await self.afilter_queryset(self.get_queryset())
+        etag = await self.alist_etag(self.list_queryset)
+        not_modified = not_modified_response(request, etag=etag)
+        if not_modified is not None:
+            return not_modified
+        return set_validators(await super().alist(request, *args, **kwargs), etag=etag)
+
+    async def aget_object(self):
+        """get_object() on the async ORM."""
+        queryset = await self.afilter_queryset(self.get_queryset())
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        instance = await aget_object_or_404(queryset, **{self.lookup_field: self.kwargs[lookup_url_kwarg]})
+        self.check_object_permissions(self.request, instance)
+        return instance
+
+    async def aretrieve(self, request, *args, **kwargs):
+        instance = await self.aget_object()
+        etag, last_modified = self.object_etag(instance)
+        not_modified = not_modified_response(request, etag=etag, last_modified=last_modified)
+        if not_modified is not None:
+            return not_modified
+        serializer = self.get_serializer(instance)
+        return set_validators(Response(serializer.data), etag=etag, last_modified=last_modified)
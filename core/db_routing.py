@@ -0,0 +1,253 @@
+"""
+Read-replica routing.
+
+ReplicaMiddleware lets a request read from a replica when it is a GET or
+HEAD for a view with `replica_reads = True` and the client has not written
+recently. ReplicaRouter then sends the reads of that request to one of
+DATABASE_REPLICAS, picked once per request among those lagging less than
+REPLICA_MAX_LAG seconds. Writes, every other request, and the reads after
+a write or read_from_primary() in the same request use the primary.
+
+After a write the client is pinned to the primary for REPLICA_STICKY_SECONDS,
+so it reads its own writes while the replicas catch up: browsers through a
+cookie, token clients through a cache entry keyed by their Authorization
+header (in the 'default' cache, so per process unless that is shared).
+
+Lag is the replay delay on PostgreSQL replicas and, for the SQLite
+stand-ins refreshed by `manage.py sync_replicas`, the time since the
+replica file was synced if the primary was written after that.
+"""
+import hashlib
+import logging
+import os
+import random
+import sqlite3
+import threading
+import time
+from contextvars import ContextVar
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+
+logger = logging.getLogger(__name__)
+
+STICKY_COOKIE = 'primary_until'
+STICKY_KEY_PREFIX = 'replica:sticky:'
+SAFE_METHODS = ('GET', 'HEAD')
+
+current_routing = ContextVar('current_routing', default=None)
+
+
+class RoutingState:
+    """Replica decision of one request."""
+
+    def __init__(self):
+        self.replica_ok = False
+        self.replica = None
+        self.wrote = False
+
+
+def replica_aliases():
+    return list(getattr(settings, 'DATABASE_REPLICAS', []))
+
+
+def replica_lag(alias):
+    """Seconds the replica is behind the primary (0 when unknown)."""
+    connection = connections[alias]
+    if connection.vendor == 'sqlite':
+        primary = connections[DEFAULT_DB_ALIAS].settings_dict['NAME']
+        if connection.is_in_memory_db() or connection.settings_dict['NAME'] == primary:
+            # Test mirrors share the primary's database.
+            return 0.0
+        replica_mtime = os.stat(connection.settings_dict['NAME']).st_mtime
+        if os.stat(primary).st_mtime <= replica_mtime:
+            return 0.0
+        # The replica misses every write since its last sync, however long ago that was.
+        return max(0.0, time.time() - replica_mtime)
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT CASE WHEN pg_is_in_recovery() THEN "
+                "COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) ELSE 0 END"
+            )
+            return float(cursor.fetchone()[0])
+    return 0.0
+
+
+class ReplicaHealth:
+    """Replicas within REPLICA_MAX_LAG, re-checked every REPLICA_CHECK_INTERVAL seconds."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._checked = {}
+
+    def reset(self):
+        with self._lock:
+            self._checked = {}
+
+    def healthy(self, alias):
+        max_lag = getattr(settings, 'REPLICA_MAX_LAG', None)
+        if max_lag is None:
+            return True
+        now = time.monotonic()
+        with self._lock:
+            checked = self._checked.get(alias)
+            if checked is not None and now - checked[0] < getattr(settings, 'REPLICA_CHECK_INTERVAL', 1):
+                return checked[1]
+        try:
+            lag = replica_lag(alias)
+            healthy = lag <= max_lag
+            if not healthy:
+                logger.warning("Replica %s lags %.1f s behind the primary, reading from the primary", alias, lag)
+        except (DatabaseError, OSError):
+            logger.exception("Checking replica %s failed, reading from the primary", alias)
+            healthy = False
+        with self._lock:
+            self._checked[alias] = (now, healthy)
+        return healthy
+
+    def choose(self):
+        """A random healthy replica, or None."""
+        candidates = [alias for alias in replica_aliases() if self.healthy(alias)]
+        return random.choice(candidates) if candidates else None
+
+
+replica_health = ReplicaHealth()
+
+
+class ReplicaRouter:
+    """Database router for ReplicaMiddleware; see the module docstring."""
+    # Credentials are always read from the primary: a token issued at login
+    # must work on the very next request, before any stickiness applies.
+    # So are database cache entries, e.g. the offer list versions.
+    primary_models = {'authtoken.token', 'sessions.session', 'django_cache.cacheentry'}
+
+    def db_for_read(self, model, **hints):
+        state = current_routing.get()
+        # Not label_lower: the database cache's model only has app_label and model_name.
+        label = f'{model._meta.app_label}.{model._meta.model_name}'
+        if state is None or not state.replica_ok or state.wrote or label in self.primary_models:
+            return DEFAULT_DB_ALIAS
+        if state.replica is None:
+            state.replica = replica_health.choose() or DEFAULT_DB_ALIAS
+        return state.replica
+
+    def db_for_write(self, model, **hints):
+        state = current_routing.get()
+        if state is not None:
+            state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same data as the primary.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas get their schema from the primary (replication or sync_replicas).
+        return db not in replica_aliases()
+
+
+def read_from_primary():
+    """
+    Send the remaining reads of the current request to the primary. Used
+    before results are stored in a shared cache, which must not serve
+    replica data to everyone for the whole cache timeout.
+    """
+    state = current_routing.get()
+    if state is not None:
+        state.replica_ok = False
+
+
+def replica_reads(view_func):
+    """Whether a resolved view allows replica reads (`replica_reads` on the function or its class)."""
+    allowed = getattr(view_func, 'replica_reads', None)
+    if allowed is None:
+        view_class = getattr(view_func, 'view_class', None) or getattr(view_func, 'cls', None)
+        allowed = getattr(view_class, 'replica_reads', False)
+    return allowed
+
+
+def sticky_key(request):
+    authorization = request.headers.get('Authorization')
+    if not authorization:
+        return None
+    return STICKY_KEY_PREFIX + hashlib.sha256(authorization.encode()).hexdigest()[:32]
+
+
+def is_sticky(request):
+    """Whether the client wrote within the last REPLICA_STICKY_SECONDS."""
+    try:
+        if float(request.COOKIES.get(STICKY_COOKIE, 0)) > time.time():
+            return True
+    except ValueError:
+        pass
+    key = sticky_key(request)
+    return key is not None and caches['default'].get(key) is not None
+
+
+def stick_to_primary(request, response):
+    seconds = getattr(settings, 'REPLICA_STICKY_SECONDS', 10)
+    response.set_cookie(STICKY_COOKIE, str(int(time.time() + seconds)), max_age=seconds, httponly=True, samesite='Lax')
+    key = sticky_key(request)
+    if key is not None:
+        caches['default'].set(key, True, timeout=seconds)
+
+
+class ReplicaMiddleware:
+    """Sets up the routing state of a request; see the module docstring. Runs sync and async."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        if not replica_aliases():
+            return self.get_response(request)
+        state = RoutingState()
+        token = current_routing.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            current_routing.reset(token)
+        return self.finish(request, response, state)
+
+    async def __acall__(self, request):
+        if not replica_aliases():
+            return await self.get_response(request)
+        state = RoutingState()
+        token = current_routing.set(state)
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_routing.reset(token)
+        return self.finish(request, response, state)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        state = current_routing.get()
+        if state is not None:
+            state.replica_ok = request.method in SAFE_METHODS and replica_reads(view_func) and not is_sticky(request)
+
+    def finish(self, request, response, state):
+        if state.wrote:
+            stick_to_primary(request, response)
+        return response
+
+
+def copy_sqlite_database(source, target):
+    """Copy a SQLite database file consistently with the online backup API."""
+    source_connection = sqlite3.connect(source)
+    target_connection = sqlite3.connect(target)
+    try:
+        with target_connection:
+            source_connection.backup(target_connection)
+    finally:
+        target_connection.close()
+        source_connection.close()
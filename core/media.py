@@ -0,0 +1,160 @@
+"""
+Serving of the files under MEDIA_ROOT.
+
+Replaces django.conf.urls.static: responses carry ETag/Last-Modified and
+answer conditional requests with 304, single byte ranges with 206, and
+content-addressed blobs (upload_app.storage) are cached as immutable since
+their name changes with their content. Whole files go out as FileResponse,
+which WSGI servers send with sendfile(); with MEDIA_ACCEL set the response
+only names the file and nginx (X-Accel-Redirect) or Apache/lighttpd
+(X-Sendfile) sends it, including ranges.
+Hidden paths such as the upload session parts are never served.
+"""
+import mimetypes
+import os
+import re
+import stat
+from datetime import datetime, timezone
+from django.conf import settings
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
+from django.utils._os import safe_join
+from django.utils.http import http_date, parse_http_date_safe
+from django.views.decorators.http import require_safe
+from core.conditional import not_modified_response
+
+
+IMMUTABLE_PREFIX = 'blobs/'
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+RANGE_PATTERN = re.compile(r'^bytes=(\d*)-(\d*)$')
+STREAM_BLOCK_SIZE = 64 * 1024
+ENCODING_CONTENT_TYPES = {
+    'br': 'application/x-brotli',
+    'bzip2': 'application/x-bzip',
+    'compress': 'application/x-compress',
+    'gzip': 'application/gzip',
+    'xz': 'application/x-xz',
+}
+
+
+def media_path(path):
+    """Absolute path of a media file, or Http404 for hidden, escaping or missing paths."""
+    parts = path.split('/')
+    if any(not part or part.startswith('.') for part in parts) or path.startswith(f'{IMMUTABLE_PREFIX}tmp/'):
+        raise Http404
+    try:
+        fullpath = safe_join(settings.MEDIA_ROOT, path)
+        stat_result = os.stat(fullpath)
+    except (ValueError, OSError):
+        raise Http404
+    if not stat.S_ISREG(stat_result.st_mode):
+        raise Http404
+    return fullpath, stat_result
+
+
+def media_etag(path, stat_result):
+    if path.startswith(IMMUTABLE_PREFIX):
+        return f'"{os.path.splitext(os.path.basename(path))[0]}"'
+    return f'"{stat_result.st_mtime_ns:x}-{stat_result.st_size:x}"'
+
+
+def media_content_type(fullpath):
+    """
+    Content type of a media file. Compressed files (e.g. .tar.gz) are stored
+    as they were uploaded and go out as the compressed type, like
+    FileResponse does, never with a Content-Encoding the client would undo.
+    """
+    content_type, encoding = mimetypes.guess_type(fullpath)
+    return ENCODING_CONTENT_TYPES.get(encoding, content_type) or 'application/octet-stream'
+
+
+def parse_range(header, size):
+    """
+    (start, end) of a single-range Range header, end inclusive; None to send
+    the whole file (no, malformed or multiple ranges) and ValueError when the
+    range lies outside the file.
+    """
+    match = RANGE_PATTERN.match(header or '')
+    if match is None or match.groups() == ('', ''):
+        return None
+    first, last = match.groups()
+    if first == '':
+        start, end = max(size - int(last), 0), size - 1
+    else:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+    if start > end or start >= size:
+        raise ValueError
+    return start, end
+
+
+def range_applies(request, etag, last_modified):
+    """If-Range: a range is only served if the client's copy is still current."""
+    if_range = request.headers.get('If-Range')
+    if not if_range:
+        return True
+    if if_range.startswith('"') or if_range.startswith('W/'):
+        return if_range == etag
+    return parse_http_date_safe(if_range) == int(last_modified.timestamp())
+
+
+def read_range(path, start, length):
+    with open(path, 'rb') as source:
+        source.seek(start)
+        while length > 0:
+            block = source.read(min(STREAM_BLOCK_SIZE, length))
+            if not block:
+                break
+            length -= len(block)
+            yield block
+
+
+def accel_response(path, fullpath):
+    accel = getattr(settings, 'MEDIA_ACCEL', None)
+    if accel == 'nginx':
+        response = HttpResponse()
+        response['X-Accel-Redirect'] = getattr(settings, 'MEDIA_ACCEL_PREFIX', '/protected-media/') + path
+        return response
+    if accel == 'sendfile':
+        response = HttpResponse()
+        response['X-Sendfile'] = fullpath
+        return response
+    return None
+
+
+@require_safe
+def serve_media(request, path):
+    fullpath, stat_result = media_path(path)
+    size = stat_result.st_size
+    etag = media_etag(path, stat_result)
+    last_modified = datetime.fromtimestamp(stat_result.st_mtime, tz=timezone.utc)
+    response = not_modified_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        response = accel_response(path, fullpath)
+    if response is None:
+        try:
+            byte_range = parse_range(request.headers.get('Range'), size)
+        except ValueError:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+            return response
+        if byte_range is not None and not range_applies(request, etag, last_modified):
+            byte_range = None
+        if request.method == 'HEAD':
+            response = HttpResponse()
+            response['Content-Length'] = size
+        elif byte_range is None:
+            response = FileResponse(open(fullpath, 'rb'))
+        else:
+            start, end = byte_range
+            response = StreamingHttpResponse(read_range(fullpath, start, end - start + 1), status=206)
+            response['Content-Range'] = f'bytes {start}-{end}/{size}'
+            response['Content-Length'] = end - start + 1
+        response['Accept-Ranges'] = 'bytes'
+    if response.status_code in (200, 206):
+        response['Content-Type'] = media_content_type(fullpath)
+        response['Last-Modified'] = http_date(stat_result.st_mtime)
+    response['ETag'] = etag
+    response['Cache-Control'] = IMMUTABLE_CACHE_CONTROL if path.startswith(IMMUTABLE_PREFIX) else (
+        f"public, max-age={getattr(settings, 'MEDIA_MAX_AGE', 3600)}"
+    )
+    return response
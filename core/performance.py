@@ -0,0 +1,319 @@
+"""
+Per-view performance instrumentation.
+
+PerformanceMiddleware profiles a PERF_SAMPLE_RATE share of the requests:
+wall time, number and duration of the SQL queries, time spent serializing
+and rendering, and the response size. Queries are counted by an execute
+wrapper every database connection gets when it is opened, which records
+them on the profile of the current context, so the queries async views run
+in sync_to_async threads are counted too. Serializing is timed by
+TimedSerializerMixin and the `timed` methods of the values serializers,
+rendering by core.renderers.FastJSONRenderer. Queries are grouped by their SQL with literals and
+IN-lists collapsed; a statement repeated PERF_DUPLICATE_QUERY_THRESHOLD
+times in one request is reported as a probable N+1 together with the stack
+that issued it.
+
+Sampled requests are aggregated per view into an in-process registry that
+metrics_view exposes in the Prometheus text format to staff users and to
+scrapers sending PERF_METRICS_TOKEN, and with PERF_SERVER_TIMING they carry
+a Server-Timing header for the browser's developer tools. Every worker
+process keeps its own registry.
+"""
+import logging
+import random
+import re
+import threading
+import time
+import traceback
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.http import HttpResponse, HttpResponseForbidden
+from django.utils.crypto import constant_time_compare
+
+
+logger = logging.getLogger(__name__)
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+IN_LIST_PATTERN = re.compile(r'\((?:\s*%s\s*,)+\s*%s\s*\)')
+LITERAL_PATTERN = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+STACK_LIMIT = 8
+
+current_profile = ContextVar('current_profile', default=None)
+
+
+def normalize_sql(sql):
+    """SQL with literal values and IN-lists replaced, so repeated statements group together."""
+    return IN_LIST_PATTERN.sub('(...)', LITERAL_PATTERN.sub('?', sql))
+
+
+def app_stack():
+    """The innermost project frames of the current stack, outside Django and third-party code."""
+    base_dir = str(settings.BASE_DIR)
+    frames = [
+        frame for frame in traceback.extract_stack()[:-2]
+        if frame.filename.startswith(base_dir) and 'site-packages' not in frame.filename
+        and frame.filename != __file__
+    ]
+    return ''.join(traceback.format_list(frames[-STACK_LIMIT:]))
+
+
+class Profile:
+    """Timings of one sampled request."""
+
+    def __init__(self):
+        self.view = None
+        self.queries = 0
+        self.sql_time = 0.0
+        self.serialize_time = 0.0
+        self.render_time = 0.0
+        self.statements = {}
+        self.duplicates = []
+        self.depth = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        # Database execute wrapper
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql_time += time.perf_counter() - started
+            self.queries += 1
+            statement = normalize_sql(sql)
+            count = self.statements.get(statement, 0) + 1
+            self.statements[statement] = count
+            if count == getattr(settings, 'PERF_DUPLICATE_QUERY_THRESHOLD', 5):
+                self.duplicates.append({'sql': statement, 'stack': app_stack()})
+
+    @contextmanager
+    def activate(self):
+        """Make this the profile the queries and timings of the current context are recorded on."""
+        for connection in connections.all(initialized_only=True):
+            profile_connection(connection)
+        token = current_profile.set(self)
+        try:
+            yield self
+        finally:
+            current_profile.reset(token)
+
+    def server_timing(self, total):
+        entries = [
+            ('total', total, None),
+            ('db', self.sql_time, f'{self.queries} queries'),
+            ('serialize', self.serialize_time, None),
+            ('render', self.render_time, None),
+        ]
+        return ', '.join(
+            f'{name};dur={duration * 1000:.1f}' + (f';desc="{desc}"' if desc else '')
+            for name, duration, desc in entries
+        )
+
+
+def timed(attribute):
+    """Decorator adding the duration of the outermost call to the current profile."""
+    def decorator(function):
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            profile = current_profile.get()
+            if profile is None or profile.depth:
+                return function(*args, **kwargs)
+            profile.depth += 1
+            started = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                setattr(profile, attribute, getattr(profile, attribute) + time.perf_counter() - started)
+                profile.depth -= 1
+        return wrapper
+    return decorator
+
+
+def profile_query(execute, sql, params, many, context):
+    """Execute wrapper recording the query on the current profile, if any."""
+    profile = current_profile.get()
+    if profile is None:
+        return execute(sql, params, many, context)
+    return profile(execute, sql, params, many, context)
+
+
+def profile_connection(connection, **kwargs):
+    """Add profile_query to a connection's execute wrappers; a connection_created receiver."""
+    if profile_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(profile_query)
+
+
+class TimedSerializerMixin:
+    """Serializer mixin adding the time spent in to_representation() to the current profile."""
+
+    @timed('serialize_time')
+    def to_representation(self, instance):
+        return super().to_representation(instance)
+
+
+class MetricsRegistry:
+    """Per-view counters and histograms of the sampled requests."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.views = {}
+
+    def reset(self):
+        with self._lock:
+            self.views = {}
+
+    def record(self, view, status_code, total, profile, size):
+        with self._lock:
+            stats = self.views.setdefault(view, {
+                'requests': 0, 'errors': 0, 'seconds': 0.0, 'queries': 0, 'sql_seconds': 0.0,
+                'serialize_seconds': 0.0, 'render_seconds': 0.0, 'response_bytes': 0,
+                'duplicate_queries': 0, 'buckets': [0] * len(DURATION_BUCKETS),
+            })
+            stats['requests'] += 1
+            stats['errors'] += status_code >= 500
+            stats['seconds'] += total
+            stats['queries'] += profile.queries
+            stats['sql_seconds'] += profile.sql_time
+            stats['serialize_seconds'] += profile.serialize_time
+            stats['render_seconds'] += profile.render_time
+            stats['response_bytes'] += size
+            stats['duplicate_queries'] += len(profile.duplicates)
+            for index, bound in enumerate(DURATION_BUCKETS):
+                if total <= bound:
+                    stats['buckets'][index] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {view: {**stats, 'buckets': list(stats['buckets'])} for view, stats in self.views.items()}
+
+
+registry = MetricsRegistry()
+
+
+def view_name(view_func):
+    view_class = getattr(view_func, 'view_class', None) or getattr(view_func, 'cls', None)
+    return (view_class or view_func).__name__
+
+
+def response_size(response):
+    if response.streaming:
+        return int(response.get('Content-Length') or 0)
+    return len(response.content)
+
+
+class PerformanceMiddleware:
+    """Profiles a sample of the requests; see the module docstring. Runs sync and async."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        if not self.sampled():
+            return self.get_response(request)
+        profile, started = self.start(request)
+        with profile.activate():
+            response = self.get_response(request)
+        return self.finish(request, response, profile, started)
+
+    async def __acall__(self, request):
+        if not self.sampled():
+            return await self.get_response(request)
+        profile, started = self.start(request)
+        with profile.activate():
+            response = await self.get_response(request)
+        return self.finish(request, response, profile, started)
+
+    def sampled(self):
+        return random.random() < getattr(settings, 'PERF_SAMPLE_RATE', 0.0)
+
+    def start(self, request):
+        profile = Profile()
+        request._performance_profile = profile
+        return profile, time.perf_counter()
+
+    def finish(self, request, response, profile, started):
+        total = time.perf_counter() - started
+        view = profile.view or 'unresolved'
+        registry.record(view, response.status_code, total, profile, response_size(response))
+        for duplicate in profile.duplicates:
+            logger.warning(
+                "Repeated query in %s (%s %s), probable N+1:\n%s\n%s",
+                view, request.method, request.path, duplicate['sql'], duplicate['stack']
+            )
+        if getattr(settings, 'PERF_SERVER_TIMING', False):
+            response['Server-Timing'] = profile.server_timing(total)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        profile = getattr(request, '_performance_profile', None)
+        if profile is not None:
+            profile.view = view_name(view_func)
+
+
+def metric_lines(name, kind, help_text, samples):
+    yield f'# HELP {name} {help_text}'
+    yield f'# TYPE {name} {kind}'
+    for labels, value in samples:
+        label_text = ','.join(f'{key}="{label}"' for key, label in labels.items())
+        yield f'{name}{{{label_text}}} {value}' if label_text else f'{name} {value}'
+
+
+def render_metrics():
+    """The registry and the offer list cache counters in the Prometheus text format."""
+    from coderr_app.response_cache import offer_list_cache
+    views = sorted(registry.snapshot().items())
+    lines = []
+    counters = [
+        ('requests', 'Sampled requests'),
+        ('errors', 'Sampled requests answered with a 5xx status'),
+        ('queries', 'SQL queries of the sampled requests'),
+        ('sql_seconds', 'Time spent in SQL queries'),
+        ('serialize_seconds', 'Time spent serializing'),
+        ('render_seconds', 'Time spent rendering responses'),
+        ('response_bytes', 'Response body bytes'),
+        ('duplicate_queries', 'Statements repeated often enough in one request to suggest N+1 queries'),
+    ]
+    for field, help_text in counters:
+        lines.extend(metric_lines(
+            f'coderr_view_{field}_total', 'counter', help_text,
+            [({'view': view}, stats[field]) for view, stats in views]
+        ))
+    histogram = [
+        '# HELP coderr_view_duration_seconds Wall time of the sampled requests',
+        '# TYPE coderr_view_duration_seconds histogram',
+    ]
+    for view, stats in views:
+        for bound, count in zip(DURATION_BUCKETS, stats['buckets']):
+            histogram.append(f'coderr_view_duration_seconds_bucket{{view="{view}",le="{bound}"}} {count}')
+        histogram.append(f'coderr_view_duration_seconds_bucket{{view="{view}",le="+Inf"}} {stats["requests"]}')
+        histogram.append(f'coderr_view_duration_seconds_sum{{view="{view}"}} {stats["seconds"]}')
+        histogram.append(f'coderr_view_duration_seconds_count{{view="{view}"}} {stats["requests"]}')
+    lines.extend(histogram)
+    cache = offer_list_cache.metrics()
+    lines.extend(metric_lines('coderr_offer_list_cache_hits_total', 'counter', 'Offer list cache hits', [({}, cache['hits'])]))
+    lines.extend(metric_lines('coderr_offer_list_cache_misses_total', 'counter', 'Offer list cache misses', [({}, cache['misses'])]))
+    return '\n'.join(lines) + '\n'
+
+
+def metrics_allowed(request):
+    """Staff users, and with PERF_METRICS_TOKEN set, requests sending `Authorization: Bearer <token>`."""
+    token = getattr(settings, 'PERF_METRICS_TOKEN', None)
+    if token and constant_time_compare(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        return True
+    return request.user.is_active and request.user.is_staff
+
+
+def metrics_view(request):
+    """GET: the metrics of this process, see metrics_allowed()."""
+    if not metrics_allowed(request):
+        return HttpResponseForbidden()
+    return HttpResponse(render_metrics(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -54,6 +54,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.performance.PerformanceMiddleware',
+    'core.db_routing.ReplicaMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -107,6 +109,85 @@ DATABASES = {
     }
 }
 
+# Read replicas for the catalog GETs (see core/db_routing.py). REPLICA_DATABASES=N
+# adds N SQLite stand-ins next to db.sqlite3, refreshed with `manage.py
+# sync_replicas`; real replicas (e.g. PostgreSQL streaming replicas) are added
+# to DATABASES instead. Every database besides 'default' is a replica.
+for index in range(1, int(os.environ.get('REPLICA_DATABASES', 0)) + 1):
+    DATABASES[f'replica{index}'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / f'db.replica{index}.sqlite3',
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != 'default']
+DATABASE_ROUTERS = ['core.db_routing.ReplicaRouter']
+REPLICA_STICKY_SECONDS = 10
+REPLICA_MAX_LAG = 5
+REPLICA_CHECK_INTERVAL = 1
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+
+# Response cache of GET /api/offers/, selected with OFFER_LIST_CACHE_BACKEND:
+# 'locmem' (per process, the default), 'file' (shared by the processes on one
+# host), 'database' (shared by every server using the database; create the
+# table with `manage.py createcachetable`) or 'redis' (shared through any
+# server speaking the Redis protocol at OFFER_LIST_CACHE_URL; needs
+# `pip install redis`). Use a shared one with several workers, so an offer
+# write invalidates the cached pages of all of them.
+OFFER_LIST_CACHE_BACKENDS = {
+    'locmem': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'coderr-offer-list',
+    },
+    'file': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.path.join(BASE_DIR, 'cache', 'offer-list'),
+    },
+    'database': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'coderr_offer_list_cache',
+    },
+    'redis': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.environ.get('OFFER_LIST_CACHE_URL', 'redis://127.0.0.1:6379/1'),
+    },
+}
+
+# The 'default' cache, selected with DEFAULT_CACHE_BACKEND like the offer list
+# cache: it holds the token versions, the base info counters and the replica
+# stickiness, which all workers should share.
+DEFAULT_CACHE_BACKENDS = {
+    'locmem': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'coderr-default',
+    },
+    'database': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'coderr_default_cache',
+    },
+    'redis': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.environ.get('DEFAULT_CACHE_URL', 'redis://127.0.0.1:6379/0'),
+    },
+}
+
+CACHES = {
+    'default': DEFAULT_CACHE_BACKENDS[os.environ.get('DEFAULT_CACHE_BACKEND', 'locmem')],
+    'offer_list': dict(
+        OFFER_LIST_CACHE_BACKENDS[os.environ.get('OFFER_LIST_CACHE_BACKEND', 'locmem')],
+        TIMEOUT=300,
+    ),
+}
+
+# Seconds the /api/base-info/ counters (coderr_app/stats.py) live in the
+# 'default' cache before they are recomputed from the database. Writes only
+# adjust the counters of the process that made them, so with a per-process
+# cache other workers are off by at most this long.
+STATS_CACHE_TIMEOUT = 60
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -156,12 +237,68 @@ REST_FRAMEWORK = {
         'rest_framework.permissions.IsAuthenticated',
     ],
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'user_auth_app.api.authentication.CachedTokenAuthentication',
     ],
+    # orjson when installed, stdlib json otherwise (see core/renderers.py)
     'DEFAULT_RENDERER_CLASSES': [
-        'rest_framework.renderers.JSONRenderer',
+        'core.renderers.FastJSONRenderer',
     ],
     'DEFAULT_PARSER_CLASSES': [
-        'rest_framework.parsers.JSONParser',
+        'core.renderers.FastJSONParser',
     ]
-}
\ No newline at end of file
+}
+
+# Per-process cache of authenticated tokens (entries, seconds). Hits are
+# checked against the user's token version in TOKEN_VERSION_CACHE_ALIAS, so
+# a revoked token stops working in every process sharing that cache.
+TOKEN_CACHE_SIZE = 1024
+TOKEN_CACHE_TTL = 300
+TOKEN_VERSION_CACHE_ALIAS = 'default'
+
+# Maximum number of offers accepted by POST /api/offers/batch/
+OFFER_BATCH_MAX_SIZE = 100
+# Rows fetched per database round trip and written per chunk by the export endpoints
+EXPORT_CHUNK_SIZE = 2000
+
+# Background image variants (upload_app/images.py): name -> longest side in px
+IMAGE_VARIANTS = {'thumb': 320, 'medium': 1280}
+IMAGE_WORKERS = 2
+# Seconds until another process looks for variants it found missing
+IMAGE_VARIANT_RECHECK = 30
+
+# Chunked upload sessions (upload_app/chunked.py)
+UPLOAD_MAX_SIZE = 100 * 1024 * 1024
+UPLOAD_CLAIM_TIMEOUT = 300
+
+# Content-addressed media storage (upload_app/storage.py): each distinct file
+# is stored once under blobs/; unreferenced blobs are deleted after the grace
+# period by `manage.py sweep_blobs` or, when an interval is set, a background thread
+STORAGES = {
+    'default': {'BACKEND': 'upload_app.storage.ContentAddressedStorage'},
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+}
+BLOB_SWEEP_GRACE = 3600
+BLOB_SWEEP_INTERVAL = None
+
+# Media serving (core/media.py). Names under blobs/ are cached as immutable,
+# everything else for MEDIA_MAX_AGE seconds. MEDIA_ACCEL hands the file to
+# the front server: 'nginx' (X-Accel-Redirect to MEDIA_ACCEL_PREFIX, an
+# internal location aliased to MEDIA_ROOT) or 'sendfile' (X-Sendfile, Apache/lighttpd)
+MEDIA_MAX_AGE = 3600
+MEDIA_ACCEL = None
+MEDIA_ACCEL_PREFIX = '/protected-media/'
+
+# Request instrumentation (core/performance.py): share of requests profiled,
+# repetitions of one statement reported as N+1, Server-Timing headers, and
+# the bearer token a Prometheus scraper sends to read /metrics (without it
+# only staff users can)
+PERF_SAMPLE_RATE = 0.1
+PERF_DUPLICATE_QUERY_THRESHOLD = 5
+PERF_SERVER_TIMING = DEBUG
+PERF_METRICS_TOKEN = os.environ.get('PERF_METRICS_TOKEN')
+
+# Serve the hot read endpoints (offer list/detail, reviews, order counts,
+# base-info) with the async views of coderr_app/api/async_views.py. Enable
+# when deploying with an ASGI server (core.asgi:application); under WSGI
+# the sync views avoid the per-request event loop.
+ASYNC_READ_VIEWS = False
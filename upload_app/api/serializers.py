@@ -1,7 +1,11 @@
+import os
+from django.conf import settings
+from django.utils.text import get_valid_filename
 from rest_framework import serializers
-from upload_app.models import FileUpload
+from core.performance import TimedSerializerMixin
+from upload_app.models import FileUpload, UploadSession
 
-class FileUploadSerializer(serializers.ModelSerializer):
+class FileUploadSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """
     Serializer for file uploads.
     Args:
@@ -9,4 +13,35 @@ class FileUploadSerializer(serializers.ModelSerializer):
     """
     class Meta:
         model = FileUpload
-        fields = ['file', 'uploaded_at']
\ No newline at end of file
+        fields = ['file', 'uploaded_at']
+
+
+class UploadSessionSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    """
+    Serializer for chunked upload sessions. `sha256` is optional on create;
+    when given, completion checks the uploaded content against it.
+    """
+    upload = FileUploadSerializer(read_only=True)
+
+    class Meta:
+        model = UploadSession
+        fields = ['id', 'filename', 'size', 'received', 'sha256', 'status', 'upload', 'created_at']
+        read_only_fields = ['id', 'received', 'status', 'upload', 'created_at']
+
+    def validate_filename(self, value):
+        filename = get_valid_filename(os.path.basename(value))
+        if not filename:
+            raise serializers.ValidationError("Invalid file name.")
+        return filename
+
+    def validate_size(self, value):
+        max_size = getattr(settings, 'UPLOAD_MAX_SIZE', 100 * 1024 * 1024)
+        if not 0 < value <= max_size:
+            raise serializers.ValidationError(f"Size must be between 1 and {max_size} bytes.")
+        return value
+
+    def validate_sha256(self, value):
+        value = value.lower()
+        if value and (len(value) != 64 or any(char not in '0123456789abcdef' for char in value)):
+            raise serializers.ValidationError("Expected a hex SHA-256 digest.")
+        return value
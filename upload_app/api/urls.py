@@ -1,6 +1,9 @@
 from django.urls import path
-from .views import FileUploadView
+from .views import FileUploadView, UploadSessionCompleteView, UploadSessionDetailView, UploadSessionListView
 
 urlpatterns = [
     path('upload/', FileUploadView.as_view(), name='file-upload'),
-]
\ No newline at end of file
+    path('uploads/', UploadSessionListView.as_view(), name='upload-session-list'),
+    path('uploads/<uuid:pk>/', UploadSessionDetailView.as_view(), name='upload-session-detail'),
+    path('uploads/<uuid:pk>/complete/', UploadSessionCompleteView.as_view(), name='upload-session-complete'),
+]
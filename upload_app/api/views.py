@@ -1,16 +1,149 @@
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from rest_framework import generics
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
-from upload_app.models import FileUpload
-from .serializers import FileUploadSerializer
+from rest_framework.parsers import FormParser, MultiPartParser
+from rest_framework.permissions import IsAuthenticated
+from upload_app.chunked import ChunkError, PartFile, file_sha256, parse_content_range, part_path, remove_part, write_chunk
+from upload_app.models import FileUpload, UploadSession
+from .serializers import FileUploadSerializer, UploadSessionSerializer
 
 class FileUploadView(APIView):
     """
     API view for handling file uploads.
+    Image variants are created in the background after the upload is saved.
     """
+    parser_classes = [MultiPartParser, FormParser]
+
     def post(self, request, format=None):
         serializer = FileUploadSerializer(data=request.data)
         if serializer.is_valid():
             serializer.save()
             return Response(serializer.data, status=status.HTTP_201_CREATED)
-        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
\ No newline at end of file
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
+class UploadSessionMixin:
+    """
+    Upload sessions of the requesting user, and the claim that serializes
+    writes to one session across workers.
+    """
+    serializer_class = UploadSessionSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        return UploadSession.objects.filter(user=self.request.user)
+
+    def claim(self, session):
+        """Mark the session as being written unless another request holds a fresh claim."""
+        stale = timezone.now() - timedelta(seconds=getattr(settings, 'UPLOAD_CLAIM_TIMEOUT', 300))
+        return UploadSession.objects.filter(
+            Q(claimed_at__isnull=True) | Q(claimed_at__lt=stale),
+            pk=session.pk, received=session.received, status='open'
+        ).update(claimed_at=timezone.now())
+
+    def release(self, session):
+        UploadSession.objects.filter(pk=session.pk).update(claimed_at=None)
+
+
+class UploadSessionListView(UploadSessionMixin, generics.CreateAPIView):
+    """
+    POST: start a chunked upload with filename, size and optional sha256
+    """
+
+    def perform_create(self, serializer):
+        serializer.save(user=self.request.user)
+
+
+class UploadSessionDetailView(UploadSessionMixin, generics.RetrieveDestroyAPIView):
+    """
+    GET: state of an upload session, resume from `received`
+    PUT: store the chunk given by Content-Range, which must start at `received`
+    DELETE: abort the upload
+    """
+
+    def put(self, request, *args, **kwargs):
+        session = self.get_object()
+        if session.status != 'open':
+            return Response({'error': 'This upload is already complete.'}, status=status.HTTP_409_CONFLICT)
+        try:
+            start, end = parse_content_range(request.headers.get('Content-Range'), session.size)
+        except ChunkError as exc:
+            return Response({'error': str(exc)}, status=exc.status)
+        if start != session.received:
+            return Response(
+                {'error': f'Expected the chunk at offset {session.received}.', 'received': session.received},
+                status=status.HTTP_409_CONFLICT
+            )
+        length = end - start + 1
+        if request.META.get('CONTENT_LENGTH') != str(length):
+            return Response({'error': 'Content-Length must match the Content-Range.'}, status=status.HTTP_400_BAD_REQUEST)
+        if not self.claim(session):
+            return Response({'error': 'Another chunk of this upload is being written.'}, status=status.HTTP_409_CONFLICT)
+        try:
+            write_chunk(session, request.stream, start, length)
+        except ChunkError as exc:
+            self.release(session)
+            return Response({'error': str(exc)}, status=exc.status)
+        except BaseException:
+            self.release(session)
+            raise
+        session.received = end + 1
+        UploadSession.objects.filter(pk=session.pk).update(
+            received=session.received, claimed_at=None, updated_at=timezone.now()
+        )
+        return Response(self.get_serializer(session).data, status=status.HTTP_200_OK)
+
+    def perform_destroy(self, instance):
+        remove_part(instance)
+        instance.delete()
+
+
+class UploadSessionCompleteView(UploadSessionMixin, generics.GenericAPIView):
+    """
+    POST: finish an upload once all bytes are received. The content is
+    hashed; an existing upload with the same SHA-256 is reused (200),
+    otherwise the part file is moved into storage as a new FileUpload (201).
+    """
+
+    def post(self, request, *args, **kwargs):
+        session = self.get_object()
+        if session.status == 'complete':
+            return Response(self.get_serializer(session).data, status=status.HTTP_200_OK)
+        if session.received != session.size:
+            return Response(
+                {'error': f'Only {session.received} of {session.size} bytes were received.'},
+                status=status.HTTP_409_CONFLICT
+            )
+        if not self.claim(session):
+            return Response({'error': 'This upload is being written.'}, status=status.HTTP_409_CONFLICT)
+        try:
+            digest = file_sha256(part_path(session))
+            if session.sha256 and digest != session.sha256:
+                return Response({'error': 'The uploaded content does not match sha256.'}, status=status.HTTP_400_BAD_REQUEST)
+            with transaction.atomic():
+                upload = FileUpload.objects.filter(sha256=digest).exclude(file='').first()
+                created = upload is None
+                if created:
+                    upload = FileUpload(sha256=digest)
+                    with open(part_path(session), 'rb') as part:
+                        upload.file.save(session.filename, PartFile(part), save=False)
+                    upload.save()
+                else:
+                    remove_part(session)
+                session.status = 'complete'
+                session.sha256 = digest
+                session.upload = upload
+                session.claimed_at = None
+                session.save()
+        finally:
+            self.release(session)
+        return Response(
+            self.get_serializer(session).data,
+            status=status.HTTP_201_CREATED if created else status.HTTP_200_OK
+        )
@@ -1,6 +1,16 @@
 from django.apps import AppConfig
+from django.conf import settings
 
 
 class UploadAppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'upload_app'
+
+    def ready(self):
+        from . import signals
+        signals.connect_blob_refs()
+        interval = getattr(settings, 'BLOB_SWEEP_INTERVAL', None)
+        if interval:
+            from django.core.files.storage import default_storage
+            from .storage import start_sweeper
+            start_sweeper(default_storage, interval)
@@ -0,0 +1,89 @@
+"""
+File handling of chunked upload sessions.
+
+Each session writes into one part file under UPLOAD_SESSION_ROOT (by
+default MEDIA_ROOT/.upload_sessions, on the same filesystem as the media
+files so completion is a rename). Request bodies are copied into the part
+file in CHUNK_READ_SIZE blocks, so memory stays bounded whatever the chunk
+size, and the finished file is moved into storage instead of copied.
+"""
+import hashlib
+import os
+import re
+from django.conf import settings
+from django.core.files import File
+
+
+CHUNK_READ_SIZE = 64 * 1024
+CONTENT_RANGE_PATTERN = re.compile(r'^bytes (\d+)-(\d+)/(\d+|\*)$')
+
+
+class ChunkError(Exception):
+    """A chunk that cannot be stored; `status` is the HTTP status to answer with."""
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+class PartFile(File):
+    """
+    The finished part file. Storages move files that expose
+    temporary_file_path() instead of reading and writing them again.
+    """
+    def temporary_file_path(self):
+        return self.file.name
+
+
+def session_root():
+    return getattr(settings, 'UPLOAD_SESSION_ROOT', None) or os.path.join(settings.MEDIA_ROOT, '.upload_sessions')
+
+
+def part_path(session):
+    return os.path.join(session_root(), f"{session.pk}.part")
+
+
+def parse_content_range(header, size):
+    """Return (start, end) of a 'bytes start-end/total' header, end inclusive."""
+    match = CONTENT_RANGE_PATTERN.match(header or '')
+    if match is None:
+        raise ChunkError('Content-Range must look like "bytes start-end/total".')
+    start, end, total = match.groups()
+    start, end = int(start), int(end)
+    if end < start or end >= size or (total != '*' and int(total) != size):
+        raise ChunkError(f'The range does not fit into the {size} bytes of this upload.', status=416)
+    return start, end
+
+
+def write_chunk(session, stream, start, length):
+    """
+    Write `length` bytes from `stream` at `start` of the part file and cut off
+    anything after them, so a retried chunk replaces a partially written one.
+    """
+    path = part_path(session)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'r+b' if os.path.exists(path) else 'w+b') as part:
+        part.seek(start)
+        remaining = length
+        while remaining:
+            block = stream.read(min(CHUNK_READ_SIZE, remaining))
+            if not block:
+                part.truncate(start)
+                raise ChunkError(f'Expected {length} bytes, the request body ended early.')
+            part.write(block)
+            remaining -= len(block)
+        part.truncate()
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as part:
+        for block in iter(lambda: part.read(CHUNK_READ_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def remove_part(session):
+    try:
+        os.remove(part_path(session))
+    except FileNotFoundError:
+        pass
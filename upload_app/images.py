@@ -0,0 +1,173 @@
+"""
+Background image variants for uploaded files.
+
+After an upload is committed its original is handed to a thread pool that
+writes a resized WebP file per IMAGE_VARIANTS entry into a separate
+storage under MEDIA_ROOT/variants/. Variant names are derived from the
+original name, so serializers can pick the variant for list or detail
+views without a database lookup; until the variants exist they return the
+original. Whether they exist is recorded in the 'default' cache when they
+are written or deleted, so serializing a page does not stat a file per row.
+Other processes (with a per-process cache) check the files once and then
+again every IMAGE_VARIANT_RECHECK seconds while the variants are missing.
+"""
+import hashlib
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+from io import BytesIO
+from django.conf import settings
+from django.core.cache import caches
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage, default_storage
+from django.db import transaction
+from django.utils.functional import cached_property
+from PIL import Image, ImageOps
+
+
+logger = logging.getLogger(__name__)
+
+LIST_VARIANT = 'thumb'
+DETAIL_VARIANT = 'medium'
+DEFAULT_IMAGE_VARIANTS = {LIST_VARIANT: 320, DETAIL_VARIANT: 1280}
+VARIANTS_CACHE_ALIAS = 'default'
+VARIANTS_KEY_PREFIX = 'images:variants:'
+
+
+def image_variants():
+    """Variant name -> longest side in pixels."""
+    return getattr(settings, 'IMAGE_VARIANTS', DEFAULT_IMAGE_VARIANTS)
+
+
+class VariantStorage(FileSystemStorage):
+    """
+    FileSystemStorage for image variants in MEDIA_ROOT/variants/, following
+    MEDIA_ROOT and MEDIA_URL when they change.
+    """
+    directory = 'variants'
+
+    @cached_property
+    def base_location(self):
+        return os.path.join(settings.MEDIA_ROOT, self.directory)
+
+    @cached_property
+    def base_url(self):
+        return f"{settings.MEDIA_URL.rstrip('/')}/{self.directory}/"
+
+
+variant_storage = VariantStorage()
+
+_executor = None
+_executor_lock = threading.Lock()
+_pending = set()
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'IMAGE_WORKERS', 2), thread_name_prefix='image-variants'
+            )
+        return _executor
+
+
+def variant_name(name, variant):
+    root, _ = os.path.splitext(name)
+    return f"{root}.{variant}.webp"
+
+
+def has_variants(name):
+    return all(variant_storage.exists(variant_name(name, variant)) for variant in image_variants())
+
+
+def _variants_key(name):
+    return VARIANTS_KEY_PREFIX + hashlib.sha256(name.encode()).hexdigest()[:32]
+
+
+def record_variants(name, ready):
+    """Remember whether the variants of `name` exist; missing ones are checked again later."""
+    timeout = None if ready else getattr(settings, 'IMAGE_VARIANT_RECHECK', 30)
+    caches[VARIANTS_CACHE_ALIAS].set(_variants_key(name), ready, timeout=timeout)
+
+
+def variants_ready(name):
+    """has_variants() as recorded in the cache; the files are only checked on a miss."""
+    ready = caches[VARIANTS_CACHE_ALIAS].get(_variants_key(name))
+    if ready is None:
+        ready = has_variants(name)
+        record_variants(name, ready)
+    return ready
+
+
+def delete_variants(name):
+    for variant in image_variants():
+        variant_storage.delete(variant_name(name, variant))
+    record_variants(name, False)
+
+
+def make_variants(name, storage=default_storage):
+    """
+    Write every variant of the stored image `name`. Files that are not
+    images (or are too large to decode safely) are skipped.
+    """
+    try:
+        with storage.open(name, 'rb') as source:
+            image = Image.open(source)
+            image = ImageOps.exif_transpose(image)
+            image.load()
+    except (OSError, Image.DecompressionBombError) as exc:
+        logger.info("No image variants for %s: %s", name, exc)
+        record_variants(name, False)
+        return []
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if 'A' in image.getbands() or 'transparency' in image.info else 'RGB')
+    created = []
+    for variant, size in image_variants().items():
+        resized = image.copy()
+        resized.thumbnail((size, size), Image.Resampling.LANCZOS)
+        buffer = BytesIO()
+        resized.save(buffer, 'WEBP', quality=getattr(settings, 'IMAGE_VARIANT_QUALITY', 80), method=4)
+        target = variant_name(name, variant)
+        variant_storage.delete(target)
+        created.append(variant_storage.save(target, ContentFile(buffer.getvalue())))
+    record_variants(name, True)
+    return created
+
+
+def _run(name):
+    try:
+        return make_variants(name)
+    except Exception:
+        logger.exception("Creating image variants for %s failed", name)
+        return []
+
+
+def schedule_variants(name):
+    """Create the variants of `name` in the worker pool once the current transaction commits."""
+    if not name:
+        return
+
+    def submit():
+        future = get_executor().submit(_run, name)
+        _pending.add(future)
+        future.add_done_callback(_pending.discard)
+
+    transaction.on_commit(submit)
+
+
+def wait_for_variants(timeout=None):
+    """Block until the scheduled variants are written (tests, management commands)."""
+    wait(list(_pending), timeout=timeout)
+
+
+def variant_url(name, variant, request=None):
+    """
+    URL of a variant of the stored image `name`, or of the original while the
+    variants do not exist (yet). Absolute when a request is given.
+    """
+    if not name:
+        return None
+    url = variant_storage.url(variant_name(name, variant)) if variants_ready(name) else default_storage.url(name)
+    return request.build_absolute_uri(url) if request is not None else url
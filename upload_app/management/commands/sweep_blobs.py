@@ -0,0 +1,24 @@
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from upload_app.storage import recount_blob_refs, sweep_blobs
+
+
+class Command(BaseCommand):
+    """
+    Delete the stored blobs that have been unreferenced for longer than the
+    grace period, optionally recounting the references first.
+    """
+    help = 'Delete unreferenced content-addressed blobs.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--grace', type=int, default=None,
+                            help='Seconds a blob must be unreferenced (default: BLOB_SWEEP_GRACE).')
+        parser.add_argument('--recount', action='store_true',
+                            help='Recompute the reference counts from the file fields first.')
+
+    def handle(self, *args, **options):
+        if options['recount']:
+            changed = recount_blob_refs()
+            self.stdout.write(f"recounted: {changed} blobs changed")
+        deleted = sweep_blobs(default_storage, grace=options['grace'])
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} unreferenced blobs."))
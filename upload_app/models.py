@@ -1,5 +1,50 @@
+import uuid
+from django.contrib.auth.models import User
 from django.db import models
 
 class FileUpload(models.Model):
     file = models.FileField(upload_to='uploads/', blank=True, null=True, default="")
     uploaded_at = models.DateTimeField(auto_now_add=True)
+    sha256 = models.CharField(max_length=64, blank=True, default="", db_index=True)
+
+
+class UploadSession(models.Model):
+    """
+    A chunked upload in progress. Chunks are written to a part file at their
+    offset; `received` is the number of contiguous bytes stored so far, so an
+    interrupted upload resumes from there. `claimed_at` marks a chunk being
+    written, so concurrent PUTs to the same session cannot interleave.
+    """
+    STATUS_CHOICES = [
+        ('open', 'Open'),
+        ('complete', 'Complete'),
+    ]
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='upload_sessions')
+    filename = models.CharField(max_length=255)
+    size = models.PositiveBigIntegerField()
+    received = models.PositiveBigIntegerField(default=0)
+    sha256 = models.CharField(max_length=64, blank=True, default="")
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='open')
+    upload = models.ForeignKey(FileUpload, on_delete=models.SET_NULL, blank=True, null=True)
+    claimed_at = models.DateTimeField(blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+
+class Blob(models.Model):
+    """
+    A file stored once by ContentAddressedStorage under its SHA-256 digest.
+    `refcount` counts the file fields pointing at it; unreferenced blobs are
+    removed by the sweep once they have been unreferenced for a grace period.
+    """
+    name = models.CharField(max_length=255, primary_key=True)
+    size = models.PositiveBigIntegerField()
+    refcount = models.IntegerField(default=0)
+    unreferenced_since = models.DateTimeField(blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['refcount', 'unreferenced_since'], name='blob_sweep_idx'),
+        ]
@@ -0,0 +1,77 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from user_auth_app.models import UserProfile
+from coderr_app.models import Offer
+from upload_app.images import has_variants, schedule_variants
+from upload_app.models import FileUpload
+from upload_app.storage import adjust_blob_refs, blob_fields
+
+
+def schedule_if_missing(file):
+    if file and file.name and not has_variants(file.name):
+        schedule_variants(file.name)
+
+
+@receiver(post_save, sender=Offer)
+def offer_image_variants(sender, instance, **kwargs):
+    schedule_if_missing(instance.image)
+
+
+@receiver(post_save, sender=UserProfile)
+def profile_file_variants(sender, instance, **kwargs):
+    schedule_if_missing(instance.file)
+
+
+@receiver(post_save, sender=FileUpload)
+def upload_variants(sender, instance, **kwargs):
+    schedule_if_missing(instance.file)
+
+
+def stored_names(instance, attnames):
+    """Current file names of the instance; deferred fields are not loaded."""
+    names = {}
+    for attname in attnames:
+        if attname in instance.__dict__:
+            value = instance.__dict__[attname]
+            names[attname] = getattr(value, 'name', value) or ''
+    return names
+
+
+def connect_blob_refs():
+    """
+    Track the blob reference counts of every model with content-addressed
+    file fields: before an instance is saved the names stored in the database
+    are read, after the save they are compared with the saved ones, and
+    deleting an instance releases its blobs.
+    """
+    attnames = {}
+    for model, field in blob_fields():
+        attnames.setdefault(model, []).append(field.attname)
+
+    def saved_attnames(sender, update_fields):
+        if update_fields is None:
+            return attnames[sender]
+        return [name for name in attnames[sender] if name in update_fields]
+
+    def saving(sender, instance, using, update_fields=None, **kwargs):
+        # Only names the save writes are read; a new instance has none stored yet.
+        names = list(stored_names(instance, saved_attnames(sender, update_fields)))
+        before = None
+        if names and instance.pk is not None:
+            before = sender._base_manager.using(using).filter(pk=instance.pk).values(*names).first()
+        instance._blob_names = {attname: name or '' for attname, name in (before or {}).items()}
+
+    def saved(sender, instance, created, update_fields=None, **kwargs):
+        before = {} if created else instance.__dict__.pop('_blob_names', {})
+        after = stored_names(instance, saved_attnames(sender, update_fields))
+        added = [name for attname, name in after.items() if before.get(attname) != name]
+        removed = [before[attname] for attname, name in after.items() if attname in before and before[attname] != name]
+        adjust_blob_refs(added, removed)
+
+    def deleted(sender, instance, **kwargs):
+        adjust_blob_refs(removed=stored_names(instance, attnames[sender]).values())
+
+    for model in attnames:
+        pre_save.connect(saving, sender=model, weak=False, dispatch_uid=f'blob_refs_pre_save_{model._meta.label}')
+        post_save.connect(saved, sender=model, weak=False, dispatch_uid=f'blob_refs_save_{model._meta.label}')
+        post_delete.connect(deleted, sender=model, weak=False, dispatch_uid=f'blob_refs_delete_{model._meta.label}')
@@ -0,0 +1,178 @@
+"""
+Content-addressed, deduplicated file storage.
+
+ContentAddressedStorage hashes a file while writing it to a temporary file
+next to the blobs, then stores it as blobs/<ab>/<cd>/<sha256><ext>. A file
+whose content is already stored is dropped and the existing blob reused.
+Every blob has a Blob row; the refcount signals in upload_app.signals move
+its reference count with the model file fields, and sweep_blobs() deletes
+blobs that stayed unreferenced for BLOB_SWEEP_GRACE seconds.
+"""
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+from datetime import timedelta
+from django.apps import apps
+from django.conf import settings
+from django.core.files.move import file_move_safe
+from django.core.files.storage import FileSystemStorage
+from django.db.models import Count, F, FileField
+from django.utils import timezone
+from upload_app.images import delete_variants
+
+
+logger = logging.getLogger(__name__)
+
+BLOB_PREFIX = 'blobs'
+HASH_READ_SIZE = 64 * 1024
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """FileSystemStorage that stores each distinct content once under its digest."""
+
+    def blob_name(self, digest, name):
+        extension = os.path.splitext(name)[1].lower()[:16]
+        return f"{BLOB_PREFIX}/{digest[:2]}/{digest[2:4]}/{digest}{extension}"
+
+    def get_available_name(self, name, max_length=None):
+        # Names are derived from the content in _save; equal names mean equal content.
+        return name
+
+    def _save(self, name, content):
+        from upload_app.models import Blob
+        if hasattr(content, 'temporary_file_path'):
+            source = content.temporary_file_path()
+            digest, size = self.hash_file(source)
+        else:
+            source, digest, size = self.spool(content)
+        blob = self.blob_name(digest, name)
+        target = self.path(blob)
+        if os.path.exists(target):
+            # Same content is stored already; drop the copy like a move would.
+            os.remove(source)
+        else:
+            self.makedirs(os.path.dirname(target))
+            file_move_safe(source, target, allow_overwrite=True)
+            if self.file_permissions_mode is not None:
+                os.chmod(target, self.file_permissions_mode)
+        _, created = Blob.objects.get_or_create(name=blob, defaults={'size': size, 'unreferenced_since': timezone.now()})
+        if not created:
+            # Restart the grace period so a concurrent sweep keeps the blob.
+            Blob.objects.filter(name=blob, refcount__lte=0).update(unreferenced_since=timezone.now())
+        return blob
+
+    def hash_file(self, path):
+        digest, size = hashlib.sha256(), 0
+        with open(path, 'rb') as source:
+            for block in iter(lambda: source.read(HASH_READ_SIZE), b''):
+                digest.update(block)
+                size += len(block)
+        return digest.hexdigest(), size
+
+    def spool(self, content):
+        """Write the content to a temporary file in the storage while hashing it."""
+        directory = self.path(os.path.join(BLOB_PREFIX, 'tmp'))
+        self.makedirs(directory)
+        digest, size = hashlib.sha256(), 0
+        with tempfile.NamedTemporaryFile(dir=directory, delete=False) as spooled:
+            try:
+                for chunk in content.chunks():
+                    if isinstance(chunk, str):
+                        chunk = chunk.encode()
+                    digest.update(chunk)
+                    size += len(chunk)
+                    spooled.write(chunk)
+            except BaseException:
+                spooled.close()
+                os.remove(spooled.name)
+                raise
+        return spooled.name, digest.hexdigest(), size
+
+    def makedirs(self, directory):
+        if self.directory_permissions_mode is not None:
+            old_umask = os.umask(0o777 & ~self.directory_permissions_mode)
+            try:
+                os.makedirs(directory, self.directory_permissions_mode, exist_ok=True)
+            finally:
+                os.umask(old_umask)
+        else:
+            os.makedirs(directory, exist_ok=True)
+
+
+def blob_fields():
+    """(model, field) of every file field stored by a ContentAddressedStorage."""
+    for model in apps.get_models():
+        for field in model._meta.get_fields():
+            if isinstance(field, FileField) and isinstance(field.storage, ContentAddressedStorage):
+                yield model, field
+
+
+def adjust_blob_refs(added=(), removed=()):
+    """Move the reference counts of the given blob names (non-blob names are ignored)."""
+    from upload_app.models import Blob
+    added, removed = [name for name in added if name], [name for name in removed if name]
+    if added:
+        Blob.objects.filter(name__in=added).update(refcount=F('refcount') + 1, unreferenced_since=None)
+    if removed:
+        Blob.objects.filter(name__in=removed).update(refcount=F('refcount') - 1)
+        Blob.objects.filter(name__in=removed, refcount__lte=0, unreferenced_since__isnull=True).update(
+            unreferenced_since=timezone.now()
+        )
+
+
+def recount_blob_refs():
+    """Recompute every refcount from the file fields, e.g. after queryset updates."""
+    from upload_app.models import Blob
+    counts = {}
+    for model, field in blob_fields():
+        rows = model._default_manager.filter(**{f'{field.attname}__startswith': f'{BLOB_PREFIX}/'})
+        for row in rows.values(field.attname).annotate(count=Count('pk')):
+            counts[row[field.attname]] = counts.get(row[field.attname], 0) + row['count']
+    now = timezone.now()
+    changed = 0
+    for blob in Blob.objects.iterator():
+        refcount = counts.get(blob.name, 0)
+        if refcount != blob.refcount:
+            blob.refcount = refcount
+            blob.unreferenced_since = None if refcount > 0 else (blob.unreferenced_since or now)
+            blob.save(update_fields=['refcount', 'unreferenced_since'])
+            changed += 1
+    return changed
+
+
+def sweep_blobs(storage, grace=None):
+    """
+    Delete the blobs unreferenced for longer than `grace` seconds. The row is
+    deleted first with the same condition, so a blob referenced again in the
+    meantime is kept. Returns the number of deleted blobs.
+    """
+    from upload_app.models import Blob
+    grace = getattr(settings, 'BLOB_SWEEP_GRACE', 3600) if grace is None else grace
+    cutoff = timezone.now() - timedelta(seconds=grace)
+    candidates = Blob.objects.filter(refcount__lte=0, unreferenced_since__lte=cutoff)
+    deleted = 0
+    for name in candidates.values_list('name', flat=True).iterator():
+        if Blob.objects.filter(name=name, refcount__lte=0, unreferenced_since__lte=cutoff).delete()[0]:
+            storage.delete(name)
+            delete_variants(name)
+            deleted += 1
+    return deleted
+
+
+def start_sweeper(storage, interval):
+    """Run sweep_blobs every `interval` seconds in a daemon thread."""
+    stop = threading.Event()
+
+    def run():
+        while not stop.wait(interval):
+            try:
+                deleted = sweep_blobs(storage)
+                if deleted:
+                    logger.info("Swept %s unreferenced blobs", deleted)
+            except Exception:
+                logger.exception("Blob sweep failed")
+
+    threading.Thread(target=run, name='blob-sweeper', daemon=True).start()
+    return stop
@@ -1,3 +1,288 @@
-from django.test import TestCase
+import hashlib
+import os
+import shutil
+import tempfile
+from io import BytesIO, StringIO
+from unittest import mock
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db.models.signals import post_init
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+from rest_framework.test import APIClient
+from coderr_app.models import Offer
+from coderr_app.seeding import create_users
+from upload_app.images import (
+    delete_variants, has_variants, variant_name, variant_storage, variant_url, wait_for_variants,
+)
+from upload_app.models import Blob, FileUpload
+from upload_app.storage import sweep_blobs
 
-# Create your tests here.
+
+def png_upload(name='logo.png', size=(2000, 1000)):
+    buffer = BytesIO()
+    Image.new('RGB', size, (200, 30, 30)).save(buffer, 'PNG')
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/png')
+
+
+class ImageVariantTests(TestCase):
+    """
+    Uploaded images get WebP variants in the background; list views serve the thumbnail.
+    """
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        self.settings_override.enable()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        self.addCleanup(self.settings_override.disable)
+        cache.clear()
+
+    def upload(self, file):
+        client = APIClient()
+        client.force_authenticate(create_users('uploader', 1, 'customer')[0])
+        with self.captureOnCommitCallbacks(execute=True):
+            response = client.post(reverse('file-upload'), {'file': file}, format='multipart')
+        wait_for_variants(timeout=10)
+        return response
+
+    def test_upload_creates_resized_webp_variants(self):
+        response = self.upload(png_upload())
+        self.assertEqual(response.status_code, 201)
+        name = response.data['file'].split('/media/', 1)[1]
+        self.assertTrue(has_variants(name))
+        with variant_storage.open(variant_name(name, 'thumb')) as thumb:
+            image = Image.open(thumb)
+            self.assertEqual((image.format, image.size), ('WEBP', (320, 160)))
+
+    def test_non_images_are_stored_without_variants(self):
+        response = self.upload(SimpleUploadedFile('notes.txt', b'plain text', content_type='text/plain'))
+        self.assertEqual(response.status_code, 201)
+        self.assertFalse(has_variants(response.data['file'].split('/media/', 1)[1]))
+
+    def test_variant_urls_read_the_recorded_state(self):
+        name = self.upload(png_upload()).data['file'].split('/media/', 1)[1]
+        with mock.patch.object(variant_storage, 'exists', side_effect=AssertionError('stat')):
+            self.assertTrue(variant_url(name, 'thumb').endswith(variant_name(name, 'thumb')))
+            delete_variants(name)
+            self.assertTrue(variant_url(name, 'thumb').endswith(name))
+        cache.clear()
+        self.assertTrue(variant_url(name, 'thumb').endswith(name))
+
+    def test_offer_list_uses_thumbnail_and_detail_medium(self):
+        business = create_users('seller', 1, 'business')[0]
+        with self.captureOnCommitCallbacks(execute=True):
+            offer = Offer.objects.create(user=business, title='Logo', description='Design', image=png_upload())
+        client = APIClient()
+        client.force_authenticate(business)
+        self.assertTrue(client.get(reverse('offer-list')).data['results'][0]['image'].endswith(offer.image.name))
+        wait_for_variants(timeout=10)
+        listed = client.get(reverse('offer-list'), {'page_size': 5}).data['results'][0]['image']
+        detail = client.get(reverse('offer-detail', args=[offer.id])).data['image']
+        self.assertTrue(listed.endswith(variant_name(offer.image.name, 'thumb')))
+        self.assertTrue(detail.endswith(variant_name(offer.image.name, 'medium')))
+
+
+class ChunkedUploadTests(TestCase):
+    """
+    Upload sessions take byte ranges in order, resume after interruptions and deduplicate by SHA-256.
+    """
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        self.settings_override.enable()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        self.addCleanup(self.settings_override.disable)
+        self.client = APIClient()
+        self.client.force_authenticate(create_users('uploader', 1, 'customer')[0])
+        self.content = bytes(range(256)) * 1000
+
+    def start(self, content=None, **extra):
+        content = self.content if content is None else content
+        response = self.client.post(
+            reverse('upload-session-list'), {'filename': '../brief.pdf', 'size': len(content), **extra}, format='json'
+        )
+        self.assertEqual(response.status_code, 201)
+        return response.data['id']
+
+    def put(self, session_id, content, start, end=None):
+        end = len(content) - 1 if end is None else end
+        return self.client.generic(
+            'PUT', reverse('upload-session-detail', args=[session_id]), content[start:end + 1],
+            content_type='application/octet-stream',
+            HTTP_CONTENT_RANGE=f'bytes {start}-{end}/{len(content)}'
+        )
+
+    def complete(self, session_id):
+        return self.client.post(reverse('upload-session-complete', args=[session_id]))
+
+    def test_chunks_resume_and_complete(self):
+        session_id = self.start(sha256=hashlib.sha256(self.content).hexdigest())
+        self.assertEqual(self.put(session_id, self.content, 0, 99_999).data['received'], 100_000)
+        self.assertEqual(self.put(session_id, self.content, 50_000, 149_999).status_code, 409)
+        self.assertEqual(self.complete(session_id).status_code, 409)
+        state = self.client.get(reverse('upload-session-detail', args=[session_id])).data
+        self.assertEqual(self.put(session_id, self.content, state['received']).data['received'], len(self.content))
+        response = self.complete(session_id)
+        self.assertEqual(response.status_code, 201)
+        upload = FileUpload.objects.get()
+        digest = hashlib.sha256(self.content).hexdigest()
+        self.assertEqual(upload.file.name, f'blobs/{digest[:2]}/{digest[2:4]}/{digest}.pdf')
+        with upload.file.open('rb') as stored:
+            self.assertEqual(stored.read(), self.content)
+        self.assertEqual(self.complete(session_id).status_code, 200)
+
+    def test_identical_content_is_deduplicated(self):
+        first = self.start()
+        self.put(first, self.content, 0)
+        self.complete(first)
+        second = self.start()
+        self.put(second, self.content, 0)
+        response = self.complete(second)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(FileUpload.objects.count(), 1)
+        self.assertEqual(response.data['upload']['file'], self.complete(first).data['upload']['file'])
+
+    def test_invalid_ranges_and_digests_are_rejected(self):
+        session_id = self.start(sha256='0' * 64)
+        self.assertEqual(self.put(session_id, self.content + b'x', 0).status_code, 416)
+        response = self.client.generic(
+            'PUT', reverse('upload-session-detail', args=[session_id]), b'abc',
+            content_type='application/octet-stream', HTTP_CONTENT_RANGE='bytes=0-2'
+        )
+        self.assertEqual(response.status_code, 400)
+        self.put(session_id, self.content, 0)
+        self.assertEqual(self.complete(session_id).status_code, 400)
+        self.assertEqual(self.client.delete(reverse('upload-session-detail', args=[session_id])).status_code, 204)
+        self.assertFalse(FileUpload.objects.exists())
+
+
+class ContentAddressedStorageTests(TestCase):
+    """
+    Equal files are stored once; reference counts follow the file fields and the sweep removes unreferenced blobs.
+    """
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        self.settings_override.enable()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        self.addCleanup(self.settings_override.disable)
+
+    def test_equal_content_is_stored_once(self):
+        first = FileUpload.objects.create(file=ContentFile(b'same bytes', name='a.txt'))
+        second = FileUpload.objects.create(file=ContentFile(b'same bytes', name='b.TXT'))
+        other = FileUpload.objects.create(file=ContentFile(b'other bytes', name='c.txt'))
+        self.assertEqual(first.file.name, second.file.name)
+        self.assertTrue(first.file.name.startswith('blobs/') and first.file.name.endswith('.txt'))
+        self.assertNotEqual(first.file.name, other.file.name)
+        self.assertEqual(Blob.objects.get(name=first.file.name).refcount, 2)
+        self.assertEqual(Blob.objects.get(name=first.file.name).size, len(b'same bytes'))
+        with default_storage.open(first.file.name) as stored:
+            self.assertEqual(stored.read(), b'same bytes')
+
+    def test_refcounts_follow_updates_and_deletes(self):
+        upload = FileUpload.objects.create(file=ContentFile(b'first', name='a.txt'))
+        old_name = upload.file.name
+        upload = FileUpload.objects.get(pk=upload.pk)
+        upload.file = ContentFile(b'second', name='a.txt')
+        upload.save()
+        self.assertEqual(Blob.objects.get(name=old_name).refcount, 0)
+        self.assertIsNotNone(Blob.objects.get(name=old_name).unreferenced_since)
+        self.assertEqual(Blob.objects.get(name=upload.file.name).refcount, 1)
+        upload.delete()
+        self.assertEqual(Blob.objects.get(name=upload.file.name).refcount, 0)
+
+    def test_names_are_read_on_save_not_on_load(self):
+        self.assertFalse(post_init.has_listeners(FileUpload))
+        first = FileUpload.objects.create(file=ContentFile(b'first', name='a.txt'))
+        second = FileUpload.objects.create(file=ContentFile(b'second', name='b.txt'))
+        # An instance that was never loaded still releases the name stored before.
+        FileUpload(pk=first.pk, file=second.file.name, uploaded_at=first.uploaded_at).save()
+        self.assertEqual(Blob.objects.get(name=first.file.name).refcount, 0)
+        self.assertEqual(Blob.objects.get(name=second.file.name).refcount, 2)
+
+    def test_sweep_deletes_unreferenced_blobs_after_grace(self):
+        kept = FileUpload.objects.create(file=ContentFile(b'kept', name='a.txt'))
+        dropped = FileUpload.objects.create(file=ContentFile(b'dropped', name='b.txt'))
+        dropped_name = dropped.file.name
+        dropped.delete()
+        self.assertEqual(sweep_blobs(default_storage), 0)
+        self.assertTrue(default_storage.exists(dropped_name))
+        self.assertEqual(sweep_blobs(default_storage, grace=0), 1)
+        self.assertFalse(default_storage.exists(dropped_name))
+        self.assertFalse(Blob.objects.filter(name=dropped_name).exists())
+        self.assertTrue(default_storage.exists(kept.file.name))
+
+    def test_sweep_command_recounts_references(self):
+        upload = FileUpload.objects.create(file=ContentFile(b'counted', name='a.txt'))
+        Blob.objects.filter(name=upload.file.name).update(refcount=0)
+        call_command('sweep_blobs', grace=0, recount=True, stdout=StringIO())
+        self.assertEqual(Blob.objects.get(name=upload.file.name).refcount, 1)
+        self.assertTrue(default_storage.exists(upload.file.name))
+
+
+class MediaServingTests(TestCase):
+    """
+    Media files are served with validators, byte ranges and immutable caching for blobs.
+    """
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        self.settings_override.enable()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        self.addCleanup(self.settings_override.disable)
+        self.content = bytes(range(256)) * 40
+        self.name = default_storage.save('clip.bin', ContentFile(self.content))
+        self.url = default_storage.url(self.name)
+
+    def test_blobs_are_served_with_immutable_validators(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), self.content)
+        self.assertEqual(response['Cache-Control'], 'public, max-age=31536000, immutable')
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertEqual(response['ETag'], f'"{hashlib.sha256(self.content).hexdigest()}"')
+        not_modified = self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(not_modified.status_code, 304)
+
+    def test_byte_ranges(self):
+        response = self.client.get(self.url, HTTP_RANGE='bytes=100-199')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], f'bytes 100-199/{len(self.content)}')
+        self.assertEqual(b''.join(response.streaming_content), self.content[100:200])
+        suffix = self.client.get(self.url, HTTP_RANGE='bytes=-10')
+        self.assertEqual(b''.join(suffix.streaming_content), self.content[-10:])
+        stale = self.client.get(self.url, HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE='"outdated"')
+        self.assertEqual(stale.status_code, 200)
+        self.assertEqual(self.client.get(self.url, HTTP_RANGE=f'bytes={len(self.content)}-').status_code, 416)
+
+    def test_compressed_files_keep_their_encoding(self):
+        url = default_storage.url(default_storage.save('backup.tar.gz', ContentFile(self.content)))
+        for response in (
+            self.client.get(url), self.client.get(url, HTTP_RANGE='bytes=0-9'), self.client.head(url),
+        ):
+            self.assertEqual(response['Content-Type'], 'application/gzip')
+            self.assertFalse(response.has_header('Content-Encoding'))
+
+    def test_hidden_and_missing_paths_are_not_served(self):
+        os.makedirs(os.path.join(self.media_root, '.upload_sessions'))
+        with open(os.path.join(self.media_root, '.upload_sessions', 'x.part'), 'wb') as part:
+            part.write(b'partial')
+        self.assertEqual(self.client.get('/media/.upload_sessions/x.part').status_code, 404)
+        self.assertEqual(self.client.get('/media/blobs/').status_code, 404)
+        self.assertEqual(self.client.get('/media/../manage.py').status_code, 404)
+        self.assertEqual(self.client.get('/media/missing.png').status_code, 404)
+
+    @override_settings(MEDIA_ACCEL='nginx', MEDIA_ACCEL_PREFIX='/protected-media/')
+    def test_front_server_handoff(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['X-Accel-Redirect'], f'/protected-media/{self.name}')
+        self.assertEqual(response.content, b'')
@@ -0,0 +1,186 @@
+import copy
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication, get_authorization_header
+from rest_framework.authtoken.models import Token
+from user_auth_app.models import UserProfile
+
+
+class TTLCache:
+    """
+    Thread-safe LRU cache whose entries expire `ttl` seconds after they were set.
+    """
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def delete_where(self, predicate):
+        """Drop every entry whose value matches the predicate."""
+        with self._lock:
+            for key in [key for key, (_, value) in self._entries.items() if predicate(value)]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+token_cache = TTLCache(
+    maxsize=getattr(settings, 'TOKEN_CACHE_SIZE', 1024),
+    ttl=getattr(settings, 'TOKEN_CACHE_TTL', 300),
+)
+
+TOKEN_VERSION_KEY_PREFIX = 'auth:tokens:user:'
+
+
+def _versions():
+    return caches[getattr(settings, 'TOKEN_VERSION_CACHE_ALIAS', 'default')]
+
+
+def _version_key(user_id):
+    return f"{TOKEN_VERSION_KEY_PREFIX}{user_id}"
+
+
+def user_token_version(user_id):
+    """Version of a user's cached tokens in the shared cache, created on first use."""
+    key = _version_key(user_id)
+    version = _versions().get(key)
+    if version is None:
+        _versions().add(key, uuid.uuid4().hex, timeout=None)
+        version = _versions().get(key)
+    return version
+
+
+async def auser_token_version(user_id):
+    key = _version_key(user_id)
+    version = await _versions().aget(key)
+    if version is None:
+        await _versions().aadd(key, uuid.uuid4().hex, timeout=None)
+        version = await _versions().aget(key)
+    return version
+
+
+def invalidate_user(user_id):
+    """
+    Forget the cached tokens of a user after the user, token or profile
+    changed: here right away, in other processes through a new version.
+    """
+    _versions().set(_version_key(user_id), uuid.uuid4().hex, timeout=None)
+    token_cache.delete_where(lambda entry: entry[1].user_id == user_id)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    Token authentication that loads token, user and profile in one query and
+    keeps hot tokens in a per-process LRU/TTL cache. Every entry carries the
+    user's token version from the shared cache (TOKEN_VERSION_CACHE_ALIAS),
+    which the user_auth_app signals replace when a token, user or profile
+    changes, so a hit is only used while its version is current, whichever
+    process made the change.
+    aauthenticate() is the same for async views, on the async ORM.
+    """
+    def token_key(self, request):
+        """Key of the Authorization header, or None if it names another scheme."""
+        auth = get_authorization_header(request).split()
+        if not auth or auth[0].lower() != self.keyword.lower().encode():
+            return None
+        if len(auth) == 1:
+            raise exceptions.AuthenticationFailed(_('Invalid token header. No credentials provided.'))
+        elif len(auth) > 2:
+            raise exceptions.AuthenticationFailed(_('Invalid token header. Token string should not contain spaces.'))
+        try:
+            return auth[1].decode()
+        except UnicodeError:
+            raise exceptions.AuthenticationFailed(
+                _('Invalid token header. Token string should not contain invalid characters.')
+            )
+
+    def authenticate(self, request):
+        key = self.token_key(request)
+        return None if key is None else self.authenticate_credentials(key)
+
+    async def aauthenticate(self, request):
+        key = self.token_key(request)
+        return None if key is None else await self.aauthenticate_credentials(key)
+
+    def authenticate_credentials(self, key):
+        entry = token_cache.get(key)
+        if entry is not None and entry[0] == user_token_version(entry[1].user_id):
+            token = entry[1]
+        else:
+            try:
+                token = Token.objects.select_related('user', 'user__userprofile').get(key=key)
+            except Token.DoesNotExist:
+                token_cache.delete(key)
+                raise exceptions.AuthenticationFailed(_('Invalid token.'))
+            token = self.remember(key, token, user_token_version(token.user_id))
+        return (copy.copy(token.user), token)
+
+    async def aauthenticate_credentials(self, key):
+        entry = token_cache.get(key)
+        if entry is not None and entry[0] == await auser_token_version(entry[1].user_id):
+            token = entry[1]
+        else:
+            try:
+                token = await Token.objects.select_related('user', 'user__userprofile').aget(key=key)
+            except Token.DoesNotExist:
+                token_cache.delete(key)
+                raise exceptions.AuthenticationFailed(_('Invalid token.'))
+            token = self.remember(key, token, await auser_token_version(token.user_id))
+        return (copy.copy(token.user), token)
+
+    def remember(self, key, token, version):
+        if not token.user.is_active:
+            raise exceptions.AuthenticationFailed(_('User inactive or deleted.'))
+        token_cache.set(key, (version, token))
+        return token
+
+
+def get_user_profile(request):
+    """
+    UserProfile of the requesting user, resolved at most once per request.
+    Returns None for anonymous users and users without a profile.
+    """
+    if not hasattr(request, '_user_profile'):
+        profile = None
+        if request.user.is_authenticated:
+            try:
+                profile = request.user.userprofile
+            except UserProfile.DoesNotExist:
+                profile = None
+        request._user_profile = profile
+    return request._user_profile
@@ -1,5 +1,5 @@
 from rest_framework.permissions import BasePermission
-from ..models import UserProfile
+from .authentication import get_user_profile
 
 class IsOwnerProfile(BasePermission):
     """_summary_
@@ -18,11 +18,8 @@ class IsBusinessUser(BasePermission):
     """
     def has_permission(self, request, view):
         if request.method == 'POST':
-            try:
-                profile = UserProfile.objects.get(user=request.user)
-                return profile.type == 'business'
-            except UserProfile.DoesNotExist:
-                return False
+            profile = get_user_profile(request)
+            return profile is not None and profile.type == 'business'
         return True
     
 class IsOfferOwner(BasePermission):
@@ -39,11 +36,8 @@ class IsCustomerUser(BasePermission):
     """
     def has_permission(self, request, view):
         if request.method == 'POST':
-            try:
-                profile = UserProfile.objects.get(user=request.user)
-                return profile.type == 'customer'
-            except UserProfile.DoesNotExist:
-                return False
+            profile = get_user_profile(request)
+            return profile is not None and profile.type == 'customer'
         return True
     
 class IsOrderBusinessOwner(BasePermission):
@@ -51,7 +45,7 @@ class IsOrderBusinessOwner(BasePermission):
     allows only the business user of the offer to modify the order.
     """
     def has_object_permission(self, request, view, obj):
-        return obj.offer_detail.offer.user == request.user
+        return obj.offer_detail.offer.user_id == request.user.id
 
 class IsStaffOrAdmin(BasePermission):
     """
@@ -1,9 +1,11 @@
 from rest_framework import serializers
 from user_auth_app.models import UserProfile
 from django.contrib.auth.models import User
+from upload_app.images import DETAIL_VARIANT, variant_url
+from core.performance import TimedSerializerMixin
 
 
-class UserProfileSerializer(serializers.ModelSerializer):
+class UserProfileSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """
     UserProfileSerializer is a serializer for the UserProfile model.
     Returns:
@@ -19,21 +21,24 @@ class UserProfileSerializer(serializers.ModelSerializer):
     working_hours = serializers.CharField(allow_blank=True, default="")
     file = serializers.SerializerMethodField(allow_null=True, required=False, default="")
     type = serializers.ChoiceField(choices=[('business', 'business'), ('customer', 'customer')], allow_blank=True, default="")
+    review_count = serializers.IntegerField(source='rating_count', read_only=True)
+    average_rating = serializers.FloatField(read_only=True)
+    rating_histogram = serializers.DictField(child=serializers.IntegerField(), read_only=True)
 
     class Meta:
         model = UserProfile
         fields = [
             'user', 'username', 'first_name', 'last_name', 'file', 'location',
-            'tel', 'description', 'working_hours', 'type', 'email', 'created_at'
+            'tel', 'description', 'working_hours', 'type', 'email', 'created_at',
+            'review_count', 'average_rating', 'rating_histogram', 'last_review_at'
         ]
-        read_only_fields = ['user', 'username', 'created_at', 'file']
+        read_only_fields = ['user', 'username', 'created_at', 'file', 'last_review_at']
         
     def get_file(self, obj):
+        """URL of the image variant the view asks for (image_variant), the detail variant by default."""
         if obj.file:
-            request = self.context.get('request')
-            if request:
-                return request.build_absolute_uri(obj.file.url)
-            return obj.file.url
+            variant = getattr(self.context.get('view'), 'image_variant', DETAIL_VARIANT)
+            return variant_url(obj.file.name, variant, self.context.get('request'))
         return ""
 
     def update(self, instance, validated_data):
@@ -49,7 +54,20 @@ class UserProfileSerializer(serializers.ModelSerializer):
         return instance
     
     
-class CustomerProfileSerializer(serializers.ModelSerializer):
+class BusinessProfileStatsSerializer(UserProfileSerializer):
+    """
+    UserProfileSerializer plus the aggregates UserProfileList annotates
+    with ?with_stats=1.
+    """
+    offer_count = serializers.IntegerField(read_only=True)
+    min_offer_price = serializers.DecimalField(max_digits=10, decimal_places=2, read_only=True)
+    order_count = serializers.IntegerField(read_only=True)
+
+    class Meta(UserProfileSerializer.Meta):
+        fields = UserProfileSerializer.Meta.fields + ['offer_count', 'min_offer_price', 'order_count']
+
+
+class CustomerProfileSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """
     Serializer for customer profiles.
     Args:
@@ -69,7 +87,7 @@ class CustomerProfileSerializer(serializers.ModelSerializer):
         read_only_fields = ['file']
 
 
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """
     UserSerializer is a serializer for the User model.
     Returns:
@@ -85,7 +103,7 @@ class UserSerializer(serializers.ModelSerializer):
         return f"{obj.first_name} {obj.last_name}"
 
 
-class RegistrationSerializer(serializers.ModelSerializer):
+class RegistrationSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """_summary_
     RegistrationSerializer is a serializer for user registration.
     Returns:
@@ -1,4 +1,6 @@
 from django.contrib.auth.models import User
+from django.db.models import Count, Min, OuterRef, Subquery
+from django.db.models.functions import Coalesce
 from rest_framework import generics, status
 from rest_framework.views import APIView
 from rest_framework.permissions import AllowAny, IsAuthenticated
@@ -6,23 +8,50 @@ from rest_framework.authtoken.models import Token
 from rest_framework.response import Response
 from rest_framework.authtoken.views import ObtainAuthToken
 from rest_framework.parsers import JSONParser
+from coderr_app.api.paginations import ProfilePagination
+from coderr_app.models import Offer
+from core.conditional import ConditionalGetMixin
+from upload_app.images import LIST_VARIANT
 from user_auth_app.models import UserProfile
 from user_auth_app.api.permissions import IsOwnerProfile
-from .serializers import UserProfileSerializer, RegistrationSerializer, CustomerProfileSerializer
+from .serializers import BusinessProfileStatsSerializer, UserProfileSerializer, RegistrationSerializer, CustomerProfileSerializer
 
 
 class UserProfileList(generics.ListCreateAPIView):
     """_summary_
     UserProfileList is a custom view that handles the listing and creation of user profiles.
+    Lists the business profiles with their users joined in the same query,
+    in pages of 10 (?page=, ?page_size= up to 100) or keyset paginated with
+    ?cursor=. ?with_stats=1 adds each business's offer
+    count, lowest offer price and in-progress order count to the same query.
     Returns:
     _type_: _description_
     """
     queryset = UserProfile.objects.all()
     serializer_class = UserProfileSerializer
     permission_classes = [IsAuthenticated]
+    replica_reads = True
+    pagination_class = ProfilePagination
+    image_variant = LIST_VARIANT
+
+    def with_stats(self):
+        return self.request.query_params.get('with_stats', '').lower() in ('1', 'true')
 
     def get_queryset(self):
-        return UserProfile.objects.filter(type='business')
+        queryset = UserProfile.objects.filter(type='business').select_related('user').order_by('-created_at', '-id')
+        if self.request.method == 'GET' and self.with_stats():
+            offers = Offer.objects.filter(user=OuterRef('user')).order_by().values('user')
+            queryset = queryset.annotate(
+                offer_count=Coalesce(Subquery(offers.annotate(count=Count('id')).values('count')), 0),
+                min_offer_price=Subquery(offers.annotate(price=Min('min_price')).values('price')),
+                order_count=Coalesce('user__order_counts__in_progress', 0),
+            )
+        return queryset
+
+    def get_serializer_class(self):
+        if self.request.method == 'GET' and self.with_stats():
+            return BusinessProfileStatsSerializer
+        return super().get_serializer_class()
     
     
 class CustomerProfileList(generics.ListAPIView):
@@ -34,9 +63,10 @@ class CustomerProfileList(generics.ListAPIView):
     queryset = UserProfile.objects.filter(type='customer')
     serializer_class = CustomerProfileSerializer
     permission_classes = [IsAuthenticated]
+    replica_reads = True
     
 
-class UserProfileDetail(generics.RetrieveUpdateDestroyAPIView):
+class UserProfileDetail(ConditionalGetMixin, generics.RetrieveUpdateDestroyAPIView):
     """_summary_
     UserProfileDetail is a custom view that handles the retrieval, update, and deletion of user profiles.
     Returns:
@@ -46,16 +76,6 @@ class UserProfileDetail(generics.RetrieveUpdateDestroyAPIView):
     serializer_class = UserProfileSerializer
     permission_classes = [IsAuthenticated]
     
-    def get(self, request, *args, **kwargs):
-        try:
-            instance = self.get_object()
-        except UserProfile.DoesNotExist:
-            return Response({'detail': 'The Profile was not found.'}, status=status.HTTP_404_NOT_FOUND)
-        if not request.user.is_authenticated:
-            return Response({'detail': 'User is not authenticated.'}, status=status.HTTP_401_UNAUTHORIZED)
-        serializer = self.get_serializer(instance)
-        return Response(serializer.data, status=status.HTTP_200_OK)
-    
     def patch(self, request, *args, **kwargs):
         try:
             instance = self.get_object()
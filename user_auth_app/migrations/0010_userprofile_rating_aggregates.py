@@ -0,0 +1,68 @@
+# Generated by Django 5.2.3 on 2026-10-18 01:39
+
+from django.db import migrations, models
+
+
+def backfill_rating_aggregates(apps, schema_editor):
+    Review = apps.get_model('coderr_app', 'Review')
+    UserProfile = apps.get_model('user_auth_app', 'UserProfile')
+    rows = Review.objects.values('business_user').annotate(
+        rating_count=models.Count('id'),
+        rating_sum=models.Sum('rating'),
+        last_review_at=models.Max('created_at'),
+        **{f'rating_{rating}_count': models.Count('id', filter=models.Q(rating=rating)) for rating in range(1, 6)}
+    )
+    for row in rows:
+        UserProfile.objects.filter(user_id=row.pop('business_user')).update(**row)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('coderr_app', '0011_access_path_indexes'),
+        ('user_auth_app', '0009_userprofile_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userprofile',
+            name='last_review_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='userprofile',
+            name='rating_1_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='userprofile',
+            name='rating_2_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='userprofile',
+            name='rating_3_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='userprofile',
+            name='rating_4_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='userprofile',
+            name='rating_5_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='userprofile',
+            name='rating_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='userprofile',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_rating_aggregates, migrations.RunPython.noop),
+    ]
@@ -23,6 +23,34 @@ class UserProfile(models.Model):
     ]
     type = models.CharField(choices=TYPE_CHOICES, blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    # Rating aggregates of the reviews received as a business user
+    rating_count = models.PositiveIntegerField(default=0)
+    rating_sum = models.PositiveIntegerField(default=0)
+    rating_1_count = models.PositiveIntegerField(default=0)
+    rating_2_count = models.PositiveIntegerField(default=0)
+    rating_3_count = models.PositiveIntegerField(default=0)
+    rating_4_count = models.PositiveIntegerField(default=0)
+    rating_5_count = models.PositiveIntegerField(default=0)
+    last_review_at = models.DateTimeField(blank=True, null=True)
+
+    RATING_HISTOGRAM_FIELDS = {rating: f'rating_{rating}_count' for rating in range(1, 6)}
 
     def __str__(self):
         return self.user.username
+
+    @property
+    def average_rating(self):
+        """Average received rating rounded to one decimal, None without reviews."""
+        if not self.rating_count:
+            return None
+        return round(self.rating_sum / self.rating_count, 1)
+
+    @property
+    def rating_histogram(self):
+        return {str(rating): getattr(self, field) for rating, field in self.RATING_HISTOGRAM_FIELDS.items()}
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['type', 'created_at'], name='userprofile_type_created_idx'),
+        ]
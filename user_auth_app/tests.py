@@ -1,3 +1,124 @@
+from unittest import mock
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+from coderr_app.models import Offer, OfferDetail, Order
+from coderr_app.seeding import create_users, seed_offers, seed_orders
+from coderr_app.stats import rebuild_order_counts
+from user_auth_app.api.authentication import token_cache
 
-# Create your tests here.
+
+class CachedTokenAuthenticationTests(TestCase):
+    """
+    Token, user and profile are resolved once and then served from the token cache.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.business = create_users('seller', 1, 'business')[0]
+        cls.customer = create_users('buyer', 1, 'customer')[0]
+        cls.offer = seed_offers([cls.business], 1)[0]
+
+    def setUp(self):
+        token_cache.clear()
+        self.token = Token.objects.create(user=self.customer)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {self.token.key}")
+
+    def test_hot_token_skips_the_lookup(self):
+        url = reverse('order-status-count', args=[self.business.id])
+        with self.assertNumQueries(2):
+            self.client.get(url)
+        with self.assertNumQueries(1):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+
+    def test_order_post_does_not_reload_the_profile(self):
+        self.client.get(reverse('order-list'))
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(
+                reverse('order-list'), {'offer_detail_id': self.offer.details.first().id}, format='json'
+            )
+        self.assertEqual(response.status_code, 201)
+        tables = ' '.join(query['sql'] for query in queries.captured_queries)
+        self.assertNotIn('authtoken_token', tables)
+        self.assertNotIn('user_auth_app_userprofile', tables)
+
+    def test_deleted_token_is_rejected(self):
+        url = reverse('order-status-count', args=[self.business.id])
+        self.assertEqual(self.client.get(url).status_code, 200)
+        self.token.delete()
+        self.assertEqual(self.client.get(url).status_code, 401)
+
+    def test_token_deleted_by_another_worker_is_rejected(self):
+        url = reverse('order-status-count', args=[self.business.id])
+        self.assertEqual(self.client.get(url).status_code, 200)
+        key = self.token.key
+        # Another worker's signals cannot touch this process's token cache.
+        with mock.patch.object(token_cache, 'delete'), mock.patch.object(token_cache, 'delete_where'):
+            self.token.delete()
+        self.assertIsNotNone(token_cache.get(key))
+        self.assertEqual(self.client.get(url).status_code, 401)
+
+    def test_profile_change_is_seen(self):
+        url = reverse('order-list')
+        self.client.get(url)
+        profile = self.customer.userprofile
+        profile.type = 'business'
+        profile.save()
+        response = self.client.post(url, {'offer_detail_id': self.offer.details.first().id}, format='json')
+        self.assertEqual(response.status_code, 403)
+
+
+class BusinessProfileListTests(TestCase):
+    """
+    The business profile list joins the users, pages with ?cursor= and annotates aggregates with ?with_stats=1.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.business = create_users('seller', 3, 'business')
+        cls.customer = create_users('buyer', 1, 'customer')[0]
+        offers = seed_offers(cls.business[:1], 2)
+        seed_orders([cls.customer], OfferDetail.objects.filter(offer=offers[0]))
+        rebuild_order_counts()
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.customer)
+
+    def test_list_is_paged_in_two_queries(self):
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('userprofile-list-business'), {'page_size': 2})
+        self.assertEqual(response.data['count'], 3)
+        self.assertEqual(len(response.data['results']), 2)
+        self.assertIsNotNone(response.data['next'])
+        self.assertEqual(response.data['results'][0]['username'], self.business[-1].username)
+        self.assertNotIn('offer_count', response.data['results'][0])
+        self.assertEqual(len(self.client.get(reverse('userprofile-list-business')).data['results']), 3)
+
+    def test_cursor_pages(self):
+        url = reverse('userprofile-list-business')
+        first = self.client.get(url, {'cursor': '', 'page_size': 2}).data
+        second = self.client.get(first['next']).data
+        self.assertEqual(
+            [row['user'] for row in first['results'] + second['results']],
+            [user.id for user in reversed(self.business)]
+        )
+        self.assertIsNone(second['next'])
+
+    def test_with_stats_adds_no_queries(self):
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('userprofile-list-business'), {'with_stats': '1'})
+        stats = {
+            row['user']: (row['offer_count'], row['min_offer_price'], row['order_count'])
+            for row in response.data['results']
+        }
+        offers = Offer.objects.filter(user=self.business[0])
+        self.assertEqual(stats[self.business[0].id], (
+            2, str(min(offer.min_price for offer in offers)), Order.objects.count()
+        ))
+        self.assertEqual(stats[self.business[1].id], (0, None, 0))